@@ -18,6 +18,7 @@ INTERIM_DATA_DIR = DATA_DIR / "interim"
 PROCESSED_DATA_DIR = DATA_DIR / "processed"
 EXTERNAL_DATA_DIR = DATA_DIR / "external"
 MODELS_DIR = PROJ_ROOT / "models"
+FEATURE_CACHE_DIR = PROCESSED_DATA_DIR / "cache"
 
 # Original project data directories; likely not relevant for future use but kept for reproducibility
 ONEDRIVE_DIR = os.environ.get("ONEDRIVE_DIR", "OneDrive")
@@ -25,6 +26,12 @@ PILOT_DATA_DIR = RAW_DATA_DIR / ONEDRIVE_DIR / "LISA 1 Pilot Data/Pilot 1/120724
 LABELLED_TEST_DATA_DIR = RAW_DATA_DIR / ONEDRIVE_DIR / "LISA 1 Pilot Data/P1_1608/160824_IMU_DC"
 MAIN_DATA_DIR = RAW_DATA_DIR / ONEDRIVE_DIR / "Main Data Collection"
 
+# Columns of the processed and feature data that are labels or identifiers, rather than model inputs
+NON_FEATURE_COLUMNS = ["ACTIVITY", "INCLINE", "SPEED", "TRIAL", "TIME", "PARTICIPANT"]
+
+# Activities with no speed or incline
+NON_LOCOMOTION_ACTIVITIES = ["jump"]
+
 # Common Regex Patterns
 IMU_PATTERN = r"^(.*?)_(.*?)_(.*?)\.(.*?)$"
 FOOT_SENSOR_PATTERN = r"^(.*?)_(left foot sensor|right foot sensor)\..*$"
@@ -1,6 +1,12 @@
+import hashlib
+import json
 import os
 import re
+import shutil
+from collections import defaultdict
+from collections.abc import Iterator
 from pathlib import Path
+from typing import Literal
 
 import ezc3d
 import numpy as np
@@ -9,6 +15,14 @@ from ezc3d import c3d
 from loguru import logger
 from tqdm import tqdm
 
+from lisa.parallel import ordered_map
+
+# Name of the ingestion manifest stored alongside a partitioned dataset
+MANIFEST_FILENAME = "manifest.json"
+
+# Polars data types of the floating point precision options
+FLOAT_DTYPES = {"float32": pl.Float32, "float64": pl.Float64}
+
 
 def create_synthetic_c3d_file(save_path: Path | str) -> None:
     """
@@ -162,6 +176,7 @@ def process_c3d(
     measures: list[str] = ["global angle", "highg", "accel", "gyro", "mag"],
     locations: list[str] = ["foot_", "foot sensor", "shank", "thigh", "pelvis"],
     dimensions: list[str] = ["x", "y", "z"],
+    precision: Literal["float32", "float64"] = "float64",
 ) -> pl.DataFrame | None:
     """
     Process a single c3d file and return a DataFrame.
@@ -181,14 +196,15 @@ def process_c3d(
             Default is ["foot_", "foot sensor", "shank", "thigh", "pelvis"].
         dimensions (list[str]): List of dimensions to include in the DataFrame.
             Default is ["x", "y", "z"].
+        precision (Literal["float32", "float64"]): Floating point precision of the signal columns.
+            'float32' halves the memory and storage of the data. Default is 'float64'.
 
     Returns:
         pl.DataFrame | None: The processed data or None if no data found.
     """
-    analogs = c3d_contents["data"]["analogs"]
-    df = pl.DataFrame(analogs[0].T)
+    analogs = c3d_contents["data"]["analogs"][0]
 
-    if df.is_empty():
+    if analogs.size == 0:
         return
 
     columns = c3d_contents["parameters"]["ANALOG"]["LABELS"]["value"]
@@ -205,22 +221,26 @@ def process_c3d(
             new_columns.append(col)
         columns = new_columns
 
-    df.columns = columns
-
     # Account for foot sensor label having no 'measure' or 'dimension'
     if "foot sensor" in locations:
-        measures.append("sensor")
-        dimensions.extend(["lfs", "rfs"])
-
-    filtered_columns = [
-        col
-        for col in df.columns
-        if any(location.lower() in col.lower() for location in locations)
-        and any(measure.lower() in col.lower() for measure in measures)
-        and any(f".{dim.lower()}" in col.lower() for dim in dimensions)
+        measures = [*measures, "sensor"]
+        dimensions = [*dimensions, "lfs", "rfs"]
+
+    # Resolve the wanted channels from the labels, so only those rows of the analog data are copied
+    filtered_indices = [
+        index
+        for index, col in enumerate(columns)
+        if any(location.lower() in col for location in locations)
+        and any(measure.lower() in col for measure in measures)
+        and any(f".{dim.lower()}" in col for dim in dimensions)
     ]
 
-    df = df.select(filtered_columns)
+    selected_columns = [columns[index] for index in filtered_indices]
+    duplicates = sorted({col for col in selected_columns if selected_columns.count(col) > 1})
+    if duplicates:
+        raise ValueError(f"{filename} has more than one analog channel labelled {duplicates}.")
+
+    df = pl.DataFrame({columns[index]: analogs[index].astype(precision, copy=False) for index in filtered_indices})
 
     #################################################################
     # Add 'ACTIVITY', 'INCLINE', 'SPEED', 'TIME' and 'TRIAL' columns
@@ -245,6 +265,135 @@ def process_c3d(
     return df
 
 
+def _read_c3d_file(
+    file: str,
+    filename: str,
+    activity_categories: list[str],
+    missing_location_label: str | None,
+    measures: list[str],
+    locations: list[str],
+    dimensions: list[str],
+    precision: Literal["float32", "float64"] = "float64",
+) -> pl.DataFrame | None:
+    """
+    Load a single c3d file from disk and process it into a DataFrame.
+    The 'TRIAL' column is left as a placeholder; trial numbers are assigned by the caller,
+    so that files can be read in any order (or in parallel) without affecting the numbering.
+
+    Args:
+        file (str): Path to the c3d file.
+        filename (str): The filename of the c3d file.
+        activity_categories (list[str]): A list of activity categories to search for.
+        missing_location_label (str | None): Body location label to use for any unlabelled data.
+        measures (list[str]): List of measures (i.e. accel, gyro) to include in the DataFrame.
+        locations (list[str]): List of IMU body locations (i.e. thigh, pelvis) to include in the DataFrame.
+        dimensions (list[str]): List of dimensions to include in the DataFrame.
+        precision (Literal["float32", "float64"]): Floating point precision of the signal columns.
+
+    Returns:
+        pl.DataFrame | None: The processed data or None if no data found.
+    """
+    return process_c3d(
+        c3d(file),
+        filename,
+        activity_categories,
+        0,
+        missing_location_label,
+        measures,
+        locations,
+        dimensions,
+        precision,
+    )
+
+
+def _find_c3d_files(
+    input_path: Path,
+    skip_participants: list,
+    activity_categories: list[str],
+) -> list[tuple[str, int, str]]:
+    """
+    List the c3d files to process, in the order that trial numbers are assigned.
+    Participants are sorted by number; files are listed in directory order.
+
+    Args:
+        input_path (Path): Path to the directory containing the data.
+        skip_participants (list): Participant numbers to skip.
+        activity_categories (list[str]): A list of activity categories to search for.
+
+    Returns:
+        list[tuple[str, int, str]]: The participant folder, participant number and filename of each file.
+    """
+    files = []
+
+    # Process participants in order
+    participants = sorted(os.listdir(input_path), key=lambda x: int(x.split("_")[0][1:]))
+    for participant in participants:
+        participant_number = int(participant.split("_")[0][1:])
+
+        # Skip specified participants
+        if participant_number in skip_participants:
+            logger.info(f"Skipping participant: {participant}")
+            continue
+
+        for filename in os.listdir(os.path.join(input_path, participant)):
+            # Ignore any non-c3d files, transition files or files that don't start with the activity categories,
+            # i.e. calibration files
+            if (
+                filename.endswith(".c3d")
+                and any(activity in filename.lower() for activity in activity_categories)
+                and "transition" not in filename.lower()
+            ):
+                files.append((participant, participant_number, filename))
+
+    return files
+
+
+def _read_c3d_files(
+    input_path: Path,
+    files: list[tuple[str, int, str]],
+    activity_categories: list[str],
+    missing_location_labels: dict,
+    measures: list[str],
+    locations: list[str],
+    dimensions: list[str],
+    n_workers: int = 1,
+    precision: Literal["float32", "float64"] = "float64",
+) -> Iterator[tuple[tuple[str, int, str], pl.DataFrame | None]]:
+    """
+    Read and process the given c3d files, yielding the results in the same order as 'files'.
+    With more than one worker, files are parsed concurrently in a process pool, at most 2 * n_workers files ahead
+    of the consumer.
+
+    Args:
+        input_path (Path): Path to the directory containing the data.
+        files (list[tuple[str, int, str]]): The files to read, as returned by _find_c3d_files.
+        activity_categories (list[str]): A list of activity categories to search for.
+        missing_location_labels (dict): If any IMU location labels are missing in the data, specify them here.
+        measures (list[str]): List of measures (i.e. accel, gyro) to include in the DataFrame.
+        locations (list[str]): List of IMU body locations (i.e. thigh, pelvis) to include in the DataFrame.
+        dimensions (list[str]): List of dimensions to include in the DataFrame.
+        n_workers (int): Number of worker processes. Default is 1 (serial).
+        precision (Literal["float32", "float64"]): Floating point precision of the signal columns.
+            Default is 'float64'.
+
+    Yields:
+        tuple[tuple[str, int, str], pl.DataFrame | None]: The file entry and its processed data.
+    """
+    args = [
+        [os.path.join(input_path, participant, filename) for participant, _, filename in files],
+        [filename for _, _, filename in files],
+        [activity_categories] * len(files),
+        [missing_location_labels.get(participant_number) for _, participant_number, _ in files],
+        [measures] * len(files),
+        [locations] * len(files),
+        [dimensions] * len(files),
+        [precision] * len(files),
+    ]
+
+    # Only a few files are read ahead of the consumer, so decoded trials do not accumulate in memory
+    yield from zip(files, ordered_map(_read_c3d_file, *args, n_workers=n_workers, processes=True), strict=True)
+
+
 def process_files(
     input_path: Path,
     skip_participants: list = [],
@@ -252,9 +401,13 @@ def process_files(
     measures: list[str] = ["global angle", "highg", "accel", "gyro", "mag"],
     locations: list[str] = ["foot_", "foot sensor", "shank", "thigh", "pelvis"],
     dimensions: list[str] = ["x", "y", "z"],
+    n_workers: int = 1,
+    precision: Literal["float32", "float64"] = "float64",
 ) -> pl.LazyFrame:
     """
     Process c3d files in the given directory and return a single LazyFrame.
+    Trials are numbered in participant order, regardless of the number of workers,
+    and a 'PARTICIPANT' column records the participant number of each trial.
 
     Args:
         input_path (Path): Path to the directory containing the data.
@@ -267,6 +420,9 @@ def process_files(
             Default is ["foot_", "foot sensor", "shank", "thigh", "pelvis"].
         dimensions (list[str]): List of dimensions to include in the DataFrame.
             Default is ["x", "y", "z"].
+        n_workers (int): Number of processes used to parse the c3d files concurrently. Default is 1 (serial).
+        precision (Literal["float32", "float64"]): Floating point precision of the signal columns.
+            'float32' halves the memory and storage of the data. Default is 'float64'.
 
     Returns:
         pl.LazyFrame: The processed data.
@@ -274,64 +430,469 @@ def process_files(
     # Activity verbs to search for in the filenames
     activity_categories = ["walk", "jog", "run", "jump"]
 
-    total_df = None
-    trial_count = 0
-
-    # Process participants in order
-    participants = sorted(os.listdir(input_path), key=lambda x: int(x.split("_")[0][1:]))
-    for participant in tqdm(participants, desc="Processing Participants"):
-        participant_number = int(participant.split("_")[0][1:])
+    trials = []
+
+    files = _find_c3d_files(input_path, skip_participants, activity_categories)
+    results = _read_c3d_files(
+        input_path,
+        files,
+        activity_categories,
+        missing_location_labels,
+        measures,
+        locations,
+        dimensions,
+        n_workers,
+        precision,
+    )
 
-        # Skip specified participants
-        if participant_number in skip_participants:
-            logger.info(f"Skipping participant: {participant}")
+    for (participant, participant_number, filename), df in tqdm(results, total=len(files), desc="Processing Files"):
+        if df is None:
+            logger.warning(f"Skipping empty file: {participant}/{filename}")
             continue
 
-        logger.info(f"Processing participant: {participant}")
-        participant_path = os.path.join(input_path, participant)
+        # Assign trial numbers in file order
+        trials.append(
+            df.with_columns(
+                pl.lit(len(trials)).cast(pl.Int16).alias("TRIAL"),
+                pl.lit(participant_number).cast(pl.Int16).alias("PARTICIPANT"),
+            )
+        )
 
-        missing_label = missing_location_labels.get(participant_number)
+    logger.info(f"Processed {len(trials)} trials")
 
-        for filename in tqdm(os.listdir(participant_path), desc=f"Files in {participant}", leave=False):
-            # Ignore any non-c3d files, transition files or files that don't start with the activity categories,
-            # i.e. calibration files
-            if (
-                filename.endswith(".c3d")
-                and any(activity in filename.lower() for activity in activity_categories)
-                and "transition" not in filename.lower()
-            ):
-                file = os.path.join(participant_path, filename)
+    return _concat_trials(trials).lazy()
+
+
+def _report_column_differences(trial_columns: list[list[str]]) -> None:
+    """
+    Log, in one summary, any columns that are not shared by every trial.
+
+    Args:
+        trial_columns (list[list[str]]): The column names of each trial, in trial order.
+
+    Returns:
+        None
+    """
+    all_columns = list(dict.fromkeys(col for columns in trial_columns for col in columns))
+
+    extra_columns = [col for col in all_columns if col not in trial_columns[0]]
+    if extra_columns:
+        logger.warning(f"The following columns are not in the first trial: {extra_columns}")
 
-                c3d_contents = c3d(file)
+    missing_columns = defaultdict(list)
+    for trial, columns in enumerate(trial_columns):
+        columns = set(columns)
+        for col in all_columns:
+            if col not in columns:
+                missing_columns[col].append(trial)
+    if missing_columns:
+        summary = "\n".join(f"{col}: trials {trials}" for col, trials in missing_columns.items())
+        logger.warning(f"The following columns are missing and filled with nulls:\n{summary}")
 
-                df = process_c3d(
-                    c3d_contents,
-                    filename,
-                    activity_categories,
-                    trial_count,
-                    missing_label,
-                    measures,
-                    locations,
-                    dimensions,
-                )
-                if df is None:
-                    logger.warning(f"Skipping empty file: {filename}")
-                    continue
 
-                trial_count += 1
+def _concat_trials(trials: list[pl.DataFrame]) -> pl.DataFrame:
+    """
+    Combine the processed trials into a single DataFrame.
+    Columns follow the order of the first trial; any column missing from a trial (i.e. an absent sensor)
+    is filled with nulls, and all differences are reported in one summary.
+
+    Args:
+        trials (list[pl.DataFrame]): The processed trials, in trial order.
+
+    Returns:
+        pl.DataFrame: The combined data.
+    """
+    if not trials:
+        raise ValueError("No trials to combine; check the input path and skipped participants.")
+
+    _report_column_differences([df.columns for df in trials])
 
-                # Check for columns in df that are not in total_df
-                if total_df is not None:
-                    df_columns = set(df.columns)
-                    total_df_columns = set(total_df.columns)
-                    extra_columns = df_columns - total_df_columns
-                    if extra_columns:
-                        logger.warning(f"The following columns in df are not in total_df: {extra_columns}")
+    return pl.concat(trials, how="diagonal", rechunk=True)
 
-                total_df = df if total_df is None else total_df.vstack(df.select(total_df.columns))
-        logger.info(f"Processed participant: {participant}")
 
-    return total_df.lazy()
+def process_files_to_dataset(
+    input_path: Path,
+    output_path: Path,
+    skip_participants: list = [],
+    missing_location_labels: dict = {},
+    measures: list[str] = ["global angle", "highg", "accel", "gyro", "mag"],
+    locations: list[str] = ["foot_", "foot sensor", "shank", "thigh", "pelvis"],
+    dimensions: list[str] = ["x", "y", "z"],
+    n_workers: int = 1,
+    row_group_size: int = 100_000,
+    incremental: bool = True,
+    precision: Literal["float32", "float64"] = "float64",
+) -> None:
+    """
+    Process c3d files in the given directory and stream them to a hive-partitioned Parquet dataset.
+    Each trial is written to 'participant={number}/activity={activity}/{trial}.parquet' as soon as it is processed,
+    so the full dataset is never held in memory. Trials are numbered as in process_files.
+
+    A manifest of the source files (size, modification time, content hash, extraction parameters and trial number)
+    is kept in the output directory. When run incrementally, only new or changed files are parsed; unchanged trials
+    keep their files and trial numbers, and new trials are numbered after the existing ones.
+
+    Args:
+        input_path (Path): Path to the directory containing the data.
+        output_path (Path): Directory to write the partitioned dataset to.
+        skip_participants (list): Participant numbers to skip.
+        missing_location_labels (dict): If any IMU location labels are missing in the data, specify them here.
+        measures (list[str]): List of measures (i.e. accel, gyro) to include in the DataFrame.
+            Default is ["global angle", "highg", "accel", "gyro", "mag"].
+        locations (list[str]): List of IMU body locations (i.e. thigh, pelvis) to include in the DataFrame.
+            Use 'foot sensor' for foot sensor, and 'foot_' for foot imu.
+            Default is ["foot_", "foot sensor", "shank", "thigh", "pelvis"].
+        dimensions (list[str]): List of dimensions to include in the DataFrame.
+            Default is ["x", "y", "z"].
+        n_workers (int): Number of processes used to parse the c3d files concurrently. Default is 1 (serial).
+        row_group_size (int): Maximum number of rows per Parquet row group. Default is 100,000,
+            which keeps most trials in a single row group for per-trial scans.
+        incremental (bool): Reuse the trials recorded in an existing manifest. If False, the dataset is rebuilt
+            from scratch. Default is True.
+        precision (Literal["float32", "float64"]): Floating point precision of the signal columns.
+            Default is 'float64'.
+
+    Returns:
+        None
+    """
+    # Activity verbs to search for in the filenames
+    activity_categories = ["walk", "jog", "run", "jump"]
+
+    output_path = Path(output_path)
+    manifest_path = output_path / MANIFEST_FILENAME
+
+    if incremental and manifest_path.exists():
+        with manifest_path.open("r") as f:
+            manifest = json.load(f)
+    else:
+        # Start afresh, removing any trials from a previous run
+        manifest = {}
+        for partition in output_path.glob("participant=*"):
+            shutil.rmtree(partition)
+
+    files = _find_c3d_files(input_path, skip_participants, activity_categories)
+    keys = [f"{participant}/{filename}" for participant, _, filename in files]
+
+    # Remove trials whose source files no longer exist (or are now skipped)
+    for key in set(manifest).difference(keys):
+        _remove_trial(output_path, manifest.pop(key))
+
+    # Find the new or changed files; their manifest entries are only updated once they have been written,
+    # so that an interrupted run can be resumed
+    changed_files = []
+    changed_entries = {}
+    for key, (participant, participant_number, filename) in zip(keys, files, strict=True):
+        file = os.path.join(input_path, participant, filename)
+        file_stat = os.stat(file)
+        params = {
+            "missing_location_label": missing_location_labels.get(participant_number),
+            "measures": measures,
+            "locations": locations,
+            "dimensions": dimensions,
+            "precision": precision,
+        }
+
+        entry = manifest.get(key)
+        if entry is not None and entry["params"] == params and entry["size"] == file_stat.st_size:
+            if entry["mtime_ns"] == file_stat.st_mtime_ns:
+                continue
+
+            # Touched but possibly unchanged; compare the contents
+            sha256 = _file_digest(file)
+            if entry["sha256"] == sha256:
+                entry["mtime_ns"] = file_stat.st_mtime_ns
+                continue
+        else:
+            sha256 = _file_digest(file)
+
+        changed_entries[key] = {
+            "size": file_stat.st_size,
+            "mtime_ns": file_stat.st_mtime_ns,
+            "sha256": sha256,
+            "params": params,
+            # Changed files keep their trial number; new files are numbered once read
+            "trial": entry["trial"] if entry is not None else None,
+            "path": entry["path"] if entry is not None else None,
+        }
+        changed_files.append((participant, participant_number, filename))
+
+    logger.info(f"{len(changed_files)} of {len(files)} files are new or changed")
+
+    results = _read_c3d_files(
+        input_path,
+        changed_files,
+        activity_categories,
+        missing_location_labels,
+        measures,
+        locations,
+        dimensions,
+        n_workers,
+        precision,
+    )
+
+    next_trial = max((entry["trial"] for entry in manifest.values() if entry["trial"] is not None), default=-1) + 1
+
+    for (participant, participant_number, filename), df in tqdm(
+        results, total=len(changed_files), desc="Processing Files"
+    ):
+        key = f"{participant}/{filename}"
+        if key in manifest:
+            _remove_trial(output_path, manifest[key])
+        entry = manifest[key] = changed_entries[key]
+
+        if df is None:
+            logger.warning(f"Skipping empty file: {participant}/{filename}")
+            entry["path"] = None
+        else:
+            # Assign trial numbers to new files in file order
+            if entry["trial"] is None:
+                entry["trial"] = next_trial
+                next_trial += 1
+
+            df = df.with_columns(
+                pl.lit(entry["trial"]).cast(pl.Int16).alias("TRIAL"),
+                pl.lit(participant_number).cast(pl.Int16).alias("PARTICIPANT"),
+            )
+            trial_path = _write_trial(df, output_path, participant_number, entry["trial"], row_group_size)
+            entry["path"] = trial_path.relative_to(output_path).as_posix()
+
+        _save_manifest(manifest, manifest_path)
+
+    _save_manifest(manifest, manifest_path)
+
+    trial_paths = [
+        output_path / entry["path"]
+        for entry in sorted(manifest.values(), key=lambda entry: entry["trial"] or 0)
+        if entry["path"] is not None
+    ]
+    if not trial_paths:
+        raise ValueError("No trials to write; check the input path and skipped participants.")
+
+    _report_column_differences([pl.scan_parquet(trial_path).collect_schema().names() for trial_path in trial_paths])
+    logger.info(f"Dataset contains {len(trial_paths)} trials")
+
+
+def _file_digest(file: str) -> str:
+    """
+    SHA-256 hash of a file's contents.
+
+    Args:
+        file (str): Path to the file.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _save_manifest(manifest: dict, manifest_path: Path) -> None:
+    """
+    Write the ingestion manifest, replacing any previous version atomically.
+
+    Args:
+        manifest (dict): The manifest, keyed by source file.
+        manifest_path (Path): Path to the manifest file.
+
+    Returns:
+        None
+    """
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = manifest_path.with_suffix(".tmp")
+    with tmp_path.open("w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(tmp_path, manifest_path)
+
+
+def _remove_trial(output_path: Path, entry: dict) -> None:
+    """
+    Delete a trial file written by a previous run, if it exists.
+
+    Args:
+        output_path (Path): The root directory of the partitioned dataset.
+        entry (dict): The trial's manifest entry.
+
+    Returns:
+        None
+    """
+    if entry["path"] is not None:
+        (output_path / entry["path"]).unlink(missing_ok=True)
+
+
+def _trial_path(output_path: Path, participant_number: int, activity: str, trial: int) -> Path:
+    """
+    Path of a trial file within a partitioned dataset.
+
+    Args:
+        output_path (Path): The root directory of the partitioned dataset.
+        participant_number (int): The participant number.
+        activity (str): The trial's activity.
+        trial (int): The trial number.
+
+    Returns:
+        Path: The trial file path.
+    """
+    return Path(output_path) / f"participant={participant_number}" / f"activity={activity}" / f"{trial:05d}.parquet"
+
+
+def _write_trial(df: pl.DataFrame, output_path: Path, participant_number: int, trial: int, row_group_size: int) -> Path:
+    """
+    Write a single processed trial into a partitioned dataset.
+
+    Args:
+        df (pl.DataFrame): The processed trial.
+        output_path (Path): The root directory of the partitioned dataset.
+        participant_number (int): The participant number.
+        trial (int): The trial number.
+        row_group_size (int): Maximum number of rows per Parquet row group.
+
+    Returns:
+        Path: The path the trial was written to.
+    """
+    trial_path = _trial_path(output_path, participant_number, df["ACTIVITY"][0], trial)
+    trial_path.parent.mkdir(parents=True, exist_ok=True)
+    df.write_parquet(trial_path, row_group_size=row_group_size)
+
+    return trial_path
+
+
+def files_fingerprint(
+    input_path: Path,
+    skip_participants: list = [],
+    missing_location_labels: dict = {},
+    measures: list[str] = ["global angle", "highg", "accel", "gyro", "mag"],
+    locations: list[str] = ["foot_", "foot sensor", "shank", "thigh", "pelvis"],
+    dimensions: list[str] = ["x", "y", "z"],
+    precision: Literal["float32", "float64"] = "float64",
+) -> str:
+    """
+    Fingerprint of the data process_files would produce, from the path, size and modification time of each
+    c3d file and the extraction parameters. The files themselves are not read.
+
+    Args:
+        input_path (Path): Path to the directory containing the data.
+        skip_participants (list): Participant numbers to skip.
+        missing_location_labels (dict): If any IMU location labels are missing in the data, specify them here.
+        measures (list[str]): List of measures (i.e. accel, gyro) to include in the DataFrame.
+        locations (list[str]): List of IMU body locations (i.e. thigh, pelvis) to include in the DataFrame.
+        dimensions (list[str]): List of dimensions to include in the DataFrame.
+        precision (Literal["float32", "float64"]): Floating point precision of the signal columns.
+
+    Returns:
+        str: The fingerprint.
+    """
+    activity_categories = ["walk", "jog", "run", "jump"]
+
+    files = []
+    for participant, participant_number, filename in _find_c3d_files(
+        input_path, skip_participants, activity_categories
+    ):
+        file_stat = os.stat(os.path.join(input_path, participant, filename))
+        files.append(
+            [
+                f"{participant}/{filename}",
+                file_stat.st_size,
+                file_stat.st_mtime_ns,
+                missing_location_labels.get(participant_number),
+            ]
+        )
+
+    contents = json.dumps(
+        {
+            "files": files,
+            "measures": measures,
+            "locations": locations,
+            "dimensions": dimensions,
+            "precision": precision,
+        }
+    )
+    return hashlib.sha256(contents.encode()).hexdigest()
+
+
+def manifest_fingerprint(input_path: Path) -> str:
+    """
+    Fingerprint of a partitioned dataset written by process_files_to_dataset, from the content hash,
+    extraction parameters and trial number of each source file in its manifest.
+
+    Args:
+        input_path (Path): The root directory of the partitioned dataset.
+
+    Returns:
+        str: The fingerprint.
+    """
+    with (Path(input_path) / MANIFEST_FILENAME).open("r") as f:
+        manifest = json.load(f)
+
+    contents = json.dumps(
+        {key: [entry["sha256"], entry["params"], entry["trial"]] for key, entry in manifest.items()},
+        sort_keys=True,
+    )
+    return hashlib.sha256(contents.encode()).hexdigest()
+
+
+def scan_trials(
+    input_path: Path,
+    participants: list[int] | None = None,
+    activities: list[str] | None = None,
+) -> dict[int, pl.LazyFrame]:
+    """
+    Lazily scan each trial of a partitioned dataset written by process_files_to_dataset.
+    Only the partitions of the requested participants and activities are read.
+
+    Args:
+        input_path (Path): The root directory of the partitioned dataset.
+        participants (list[int] | None): Participant numbers to include. Defaults to None (all).
+        activities (list[str] | None): Activities to include. Defaults to None (all).
+
+    Returns:
+        dict[int, pl.LazyFrame]: The processed data of each trial, by TRIAL number in trial order.
+    """
+    trial_files = {}
+    for trial_path in Path(input_path).glob("participant=*/activity=*/*.parquet"):
+        participant_number = int(trial_path.parent.parent.name.split("=", 1)[1])
+        activity = trial_path.parent.name.split("=", 1)[1]
+
+        if participants is not None and participant_number not in participants:
+            continue
+        if activities is not None and activity not in activities:
+            continue
+
+        trial_files[trial_path] = participant_number
+
+    if not trial_files:
+        raise ValueError(f"No trials found in {input_path}")
+
+    # The participant is also set from the partition, for datasets written before the column was added
+    return {
+        int(trial_path.stem): pl.scan_parquet(trial_path).with_columns(
+            pl.lit(participant_number).cast(pl.Int16).alias("PARTICIPANT")
+        )
+        for trial_path, participant_number in sorted(trial_files.items(), key=lambda item: int(item[0].stem))
+    }
+
+
+def scan_dataset(
+    input_path: Path,
+    participants: list[int] | None = None,
+    activities: list[str] | None = None,
+) -> pl.LazyFrame:
+    """
+    Lazily scan a partitioned dataset written by process_files_to_dataset.
+    Only the partitions of the requested participants and activities are read, and trials are returned in
+    trial order, with any columns missing from a trial filled with nulls.
+
+    Args:
+        input_path (Path): The root directory of the partitioned dataset.
+        participants (list[int] | None): Participant numbers to include. Defaults to None (all).
+        activities (list[str] | None): Activities to include. Defaults to None (all).
+
+    Returns:
+        pl.LazyFrame: The processed data, with the same columns as process_files.
+    """
+    return pl.concat(list(scan_trials(input_path, participants, activities).values()), how="diagonal")
 
 
 def main(
@@ -339,21 +900,31 @@ def main(
     output_path: Path,
     skip_participants: list,
     missing_location_labels: dict,
+    n_workers: int = 1,
+    partitioned: bool = False,
 ):
     """
     Process raw data and save to parquet.
-    Combines all c3d files into one dataset.
+    Combines all c3d files into one dataset, either as a single file or streamed
+    to a partitioned dataset directory.
 
     Args:
         input_path (Path): Path to the directory containing the input data.
         output_path (Path): Path to save the processed data to.
         skip_participants (list): Participant numbers to skip.
         missing_location_labels (dict): If any body location labels are missing in the data, specify them here.
+        n_workers (int): Number of processes used to parse the c3d files concurrently. Default is 1 (serial).
+        partitioned (bool): Write each trial as it is processed to a hive-partitioned dataset at output_path,
+            instead of a single file. Default is False.
     """
+    if partitioned:
+        process_files_to_dataset(
+            input_path, output_path, skip_participants, missing_location_labels, n_workers=n_workers
+        )
+    else:
+        data = process_files(input_path, skip_participants, missing_location_labels, n_workers=n_workers)
+        data.sink_parquet(output_path)
 
-    data = process_files(input_path, skip_participants, missing_location_labels)
-
-    data.sink_parquet(output_path)
     logger.success(f"Output saved to: {output_path}")
 
 
@@ -4,6 +4,7 @@ from collections import defaultdict
 from pathlib import Path
 
 import matplotlib.pyplot as plt
+import numpy as np
 import polars as pl
 from sklearn import metrics
 from sklearn.base import BaseEstimator
@@ -18,9 +19,12 @@ def confusion_matrix(
     X_test: pl.DataFrame,
     y_test: pl.DataFrame,
     savepath: Path = None,
+    y_pred: np.ndarray | None = None,
 ) -> pl.DataFrame:
     """
     Generate a confusion matrix for the model and save it to a file, if a savepath is provided.
+    If the model's predictions are provided, they are used for both the matrix and the score in the plot,
+    rather than predicting the test set again.
 
     Args:
         model (BaseEstimator): The trained model.
@@ -28,17 +32,22 @@ def confusion_matrix(
         X_test (pl.DataFrame): The test features.
         y_test (pl.DataFrame): The test labels.
         savepath (Path, optional): The path to save the confusion matrix plot. Defaults to None.
+        y_pred (np.ndarray | None, optional): The model's predictions for X_test. Defaults to None (predicted here).
 
     Returns:
         pl.Dataframe: The confusion matrix.
 
     """
-    cm = metrics.confusion_matrix(y_test, model.predict(X_test), labels=labels, normalize="true")
+    if y_pred is None:
+        y_pred = model.predict(X_test)
+
+    cm = metrics.confusion_matrix(y_test, y_pred, labels=labels, normalize="true")
     cm_df = pl.DataFrame(cm, schema=[str(label) for label in labels])
     cm_df = cm_df.with_columns(pl.Series("labels", labels))
 
     if savepath:
-        fig = confusion_matrix_plot(cm, model, labels, X_test, y_test)
+        score = metrics.accuracy_score(y_test, y_pred)
+        fig = confusion_matrix_plot(cm, model, labels, X_test, y_test, score)
         fig.savefig(savepath)
         plt.close(fig)
 
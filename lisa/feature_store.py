@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+
+import polars as pl
+from loguru import logger
+
+from lisa.config import FEATURE_CACHE_DIR
+
+# Name of the cached features file within each cache entry
+FEATURES_FILENAME = "features.parquet"
+
+
+def cache_key(input_fingerprint: str, params: dict[str, any]) -> str:
+    """
+    Content address of a feature dataset: a hash of the input data's fingerprint and all extraction parameters.
+
+    Args:
+        input_fingerprint (str): Fingerprint of the data the features are extracted from,
+            i.e. from dataset.manifest_fingerprint or dataset.files_fingerprint.
+        params (dict[str, any]): The feature extraction parameters, i.e. window, stride and stats.
+            Must be JSON serialisable.
+
+    Returns:
+        str: The cache key.
+    """
+    contents = json.dumps({"input": input_fingerprint, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(contents.encode()).hexdigest()
+
+
+def fetch_features(key: str, output_path: Path, cache_dir: Path = FEATURE_CACHE_DIR) -> bool:
+    """
+    Copy a cached feature dataset to output_path, if it exists, and mark it as recently used.
+
+    Args:
+        key (str): The cache key, from cache_key.
+        output_path (Path): Path to copy the features Parquet file to.
+        cache_dir (Path): The cache directory. Defaults to FEATURE_CACHE_DIR.
+
+    Returns:
+        bool: True if the features were found in the cache.
+    """
+    cached_path = Path(cache_dir) / key / FEATURES_FILENAME
+    if not cached_path.exists():
+        return False
+
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    shutil.copyfile(cached_path, output_path)
+
+    # The modification time records when the entry was last used, for eviction
+    os.utime(cached_path)
+    logger.info(f"Loaded features from cache entry {key}")
+
+    return True
+
+
+def store_features(
+    key: str,
+    features_path: Path,
+    params: dict[str, any],
+    cache_dir: Path = FEATURE_CACHE_DIR,
+    max_size: int = 20 * 1024**3,
+) -> None:
+    """
+    Add a feature dataset to the cache, along with its schema and parameters, then evict the least recently used
+    entries until the cache is within max_size.
+
+    Args:
+        key (str): The cache key, from cache_key.
+        features_path (Path): Path to the features Parquet file to store.
+        params (dict[str, any]): The feature extraction parameters, recorded alongside the features.
+        cache_dir (Path): The cache directory. Defaults to FEATURE_CACHE_DIR.
+        max_size (int): The maximum total size of the cache in bytes. Defaults to 20 GiB.
+
+    Returns:
+        None
+    """
+    entry_dir = Path(cache_dir) / key
+    tmp_dir = Path(cache_dir) / f"{key}.tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    tmp_dir.mkdir(parents=True)
+
+    shutil.copyfile(features_path, tmp_dir / FEATURES_FILENAME)
+
+    schema = pl.scan_parquet(features_path).collect_schema()
+    with (tmp_dir / "schema.json").open("w") as f:
+        json.dump(
+            {
+                "params": params,
+                "schema": dict(zip(schema.names(), map(str, schema.dtypes()), strict=True)),
+            },
+            f,
+            indent=4,
+            default=str,
+        )
+
+    # Replace any existing entry in one step, so readers never see a partial entry
+    shutil.rmtree(entry_dir, ignore_errors=True)
+    os.replace(tmp_dir, entry_dir)
+    logger.info(f"Stored features in cache entry {key}")
+
+    _evict(Path(cache_dir), max_size, keep=key)
+
+
+def _evict(cache_dir: Path, max_size: int, keep: str) -> None:
+    """
+    Delete the least recently used cache entries until the cache is within max_size.
+
+    Args:
+        cache_dir (Path): The cache directory.
+        max_size (int): The maximum total size of the cache in bytes.
+        keep (str): Key of an entry that is never evicted, i.e. the one just stored.
+
+    Returns:
+        None
+    """
+    entries = []
+    for cached_path in cache_dir.glob(f"*/{FEATURES_FILENAME}"):
+        entry_dir = cached_path.parent
+        size = sum(file.stat().st_size for file in entry_dir.iterdir())
+        entries.append((cached_path.stat().st_mtime, size, entry_dir))
+
+    total_size = sum(size for _, size, _ in entries)
+
+    for _, size, entry_dir in sorted(entries, key=lambda entry: entry[0]):
+        if total_size <= max_size:
+            break
+        if entry_dir.name == keep:
+            continue
+        shutil.rmtree(entry_dir)
+        total_size -= size
+        logger.info(f"Evicted cache entry {entry_dir.name}")
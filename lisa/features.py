@@ -1,6 +1,8 @@
 import json
 from pathlib import Path
+from typing import Literal
 
+import numpy as np
 import polars as pl
 import pyarrow as pa
 import pyarrow.parquet as pq
@@ -8,7 +10,26 @@ from loguru import logger
 from sklearn.preprocessing import StandardScaler
 from tqdm import tqdm
 
-from lisa.config import PROJ_ROOT
+from lisa.config import NON_FEATURE_COLUMNS, PROJ_ROOT
+from lisa.dataset import FLOAT_DTYPES, scan_trials
+from lisa.parallel import ordered_map
+from lisa.windowing import available_statistics, rolling_statistics
+
+# Parquet metadata key for the feature extraction parameters
+FEATURE_METADATA_KEY = "lisa"
+
+# Columns of the validation schema that data processed before they were added does not have
+OPTIONAL_SCHEMA_COLUMNS = ["PARTICIPANT"]
+
+# Map of statistic names to Polars functions, for the 'polars' sliding window engine
+POLARS_STATS = {
+    "max": pl.max,
+    "min": pl.min,
+    "mean": pl.mean,
+    "std": pl.std,
+    "first": pl.first,
+    "last": pl.last,
+}
 
 
 def sequential_stratified_split(
@@ -33,75 +54,128 @@ def sequential_stratified_split(
     Returns:
         list: A list containing train-test split of inputs, i.e. [X_train, X_test, y1_train, y1_test, y2_train, ...].
     """
+    split_lf = _assign_splits(lf, train_size, gap, feature_cols)
+
+    train_lf = split_lf.filter(pl.col("_SPLIT"))
+    test_lf = split_lf.filter(pl.col("_SPLIT").not_())
+
+    # Generate X and y splits lazily
+    splits = [
+        train_lf.select(pl.exclude([*NON_FEATURE_COLUMNS, "_SPLIT", *feature_cols])),
+        test_lf.select(pl.exclude([*NON_FEATURE_COLUMNS, "_SPLIT", *feature_cols])),
+    ]
+    for feature in feature_cols:
+        splits.extend([train_lf.select(feature), test_lf.select(feature)])
+
+    return splits
+
+
+def sequential_split_indices(
+    lf: pl.LazyFrame,
+    train_size: float,
+    gap: int = 0,
+    feature_cols: list[str] = ["ACTIVITY"],
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    The same split as sequential_stratified_split, as row indices into the input rather than separate frames.
+    Only the TRIAL and feature columns are read, so the split can be applied to a single collected DataFrame
+    (i.e. df[train_indices]) to take the features and all targets from one copy of the data.
+
+    Args:
+        lf (pl.LazyFrame): The input LazyFrame to be split.
+        train_size (float): The proportion of rows to be included in the train set, between 0.0 and 1.0.
+        gap (int): The number of rows to leave as a gap between the train and test sets. Defaults to 0.
+        feature_cols (list[str]): The list of feature columns to stratify the split by. Defaults to ['ACTIVITY'].
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: The row indices of the train set, test set and gap, in the
+            same order as the rows of sequential_stratified_split.
+    """
+    split = _assign_splits(lf.with_row_index("_ROW"), train_size, gap, feature_cols).select("_ROW", "_SPLIT").collect()
+
+    return (
+        split.filter(pl.col("_SPLIT"))["_ROW"].to_numpy(),
+        split.filter(pl.col("_SPLIT").not_())["_ROW"].to_numpy(),
+        split.filter(pl.col("_SPLIT").is_null())["_ROW"].to_numpy(),
+    )
+
+
+def _assign_splits(lf: pl.LazyFrame, train_size: float, gap: int, feature_cols: list[str]) -> pl.LazyFrame:
+    """
+    Assign each row to the train set, test set or gap, for sequential_stratified_split.
+    The train split of each feature group is moved forward to the start of the next TRIAL, to avoid trial overlap.
+    The row counts and TRIAL start positions of all groups are found with a single grouped aggregation.
+
+    Args:
+        lf (pl.LazyFrame): The input LazyFrame to be split.
+        train_size (float): The proportion of rows to be included in the train set, between 0.0 and 1.0.
+        gap (int): The number of rows to leave as a gap between the train and test sets.
+        feature_cols (list[str]): The list of feature columns to stratify the split by.
 
+    Returns:
+        pl.LazyFrame: The rows of each feature group in turn, in order of appearance, with a '_SPLIT' column that
+            is True for the train set, False for the test set and null for the gap. Rows with a null feature
+            are dropped.
+    """
     # Ensure train_size is between 0 and 1
     if not (0 <= train_size <= 1):
         raise ValueError(f"train_size must be between 0 and 1, but got {train_size}.")
 
     # Combine feature columns into a single column
     combined_feat_name = "_".join(feature_cols)
+    combined_feat = pl.col(combined_feat_name)
     if len(feature_cols) > 1:
-        lf = lf.with_columns(
-            pl.concat_str(
-                [pl.col(col).fill_null("").cast(pl.Utf8) for col in feature_cols],
-                separator="_",
-            ).alias(combined_feat_name)
+        combined_feat = pl.concat_str(
+            [pl.col(col).fill_null("").cast(pl.Utf8) for col in feature_cols],
+            separator="_",
         )
 
-    # Collect unique feature combinations lazily
-    unique_features = lf.select(pl.col(combined_feat_name)).unique(maintain_order=True)
-
-    def _process_feature(feature: str) -> tuple[pl.LazyFrame, pl.LazyFrame]:
-        "Process a single feature"
-        feature_lf = lf.filter(pl.col(combined_feat_name) == feature)
-
-        # Get number of rows for the feature group
-        n_rows = feature_lf.select(pl.len()).collect().item()
+    # Row count and TRIAL start positions of each feature group, in a single pass over the data
+    groups = (
+        lf.select(combined_feat.alias("_FEATURE"), "TRIAL")
+        .filter(pl.col("_FEATURE").is_not_null())
+        .group_by("_FEATURE", maintain_order=True)
+        .agg(
+            pl.len().alias("ROWS"),
+            pl.int_range(pl.len()).filter(pl.col("TRIAL") != pl.col("TRIAL").shift(1)).alias("STARTS"),
+        )
+        .collect()
+    )
 
-        # Determine split indices
+    train_splits, test_splits = [], []
+    for n_rows, trial_starts in zip(groups["ROWS"], groups["STARTS"], strict=True):
+        # Determine split indices, moving the train split forward to the next TRIAL to avoid trial overlap
         train_split = int(train_size * n_rows)
-        test_split = int(train_split + gap)
+        trial_starts = trial_starts.to_numpy()
+        next_start = np.searchsorted(trial_starts, train_split, side="right")
+        if next_start < len(trial_starts):
+            train_split = int(trial_starts[next_start])
+        test_split = train_split + gap
 
-        # Get trial values lazily
-        trial_values = feature_lf.select("TRIAL").collect().to_series()
+        if test_split > n_rows:
+            raise ValueError(f"gap of {gap} rows is larger than the test set of {n_rows - train_split} rows.")
 
-        # Adjust train_split to avoid trial overlap
-        for index in range(train_split, n_rows):
-            if trial_values[index] != trial_values[train_split]:
-                train_split = int(index)
-                test_split = int(train_split + gap)
-                break
+        train_splits.append(train_split)
+        test_splits.append(test_split)
 
-        # Extract train and test splits lazily
-        feature_train_lf = feature_lf.slice(0, train_split)
-        feature_test_lf = feature_lf.slice(test_split, n_rows - test_split)
-
-        return feature_train_lf, feature_test_lf
-
-    train_lfs, test_lfs = [], []
-    for feature in unique_features.collect().to_series():
-        if feature is not None:
-            train_lf, test_lf = _process_feature(feature)
-            train_lfs.append(train_lf)
-            test_lfs.append(test_lf)
-
-    # Combine all train and test LazyFrames
-    train_lf = pl.concat(train_lfs, rechunk=True)
-    test_lf = pl.concat(test_lfs, rechunk=True)
-
-    # Generate X and y splits lazily
-    splits = [
-        train_lf.select(
-            pl.exclude(["ACTIVITY", "INCLINE", "SPEED", "TRIAL", "TIME", combined_feat_name] + feature_cols)
-        ),
-        test_lf.select(
-            pl.exclude(["ACTIVITY", "INCLINE", "SPEED", "TRIAL", "TIME", combined_feat_name] + feature_cols)
-        ),
-    ]
-    for feature in feature_cols:
-        splits.extend([train_lf.select(feature), test_lf.select(feature)])
-
-    return splits
+    # Assign rows by their position within their feature group, keeping the groups in order of appearance
+    group_index = combined_feat.replace_strict(
+        groups["_FEATURE"], range(len(groups)), default=None, return_dtype=pl.UInt32
+    )
+    index = pl.int_range(pl.len()).over("_GROUP")
+    return (
+        lf.with_columns(group_index.alias("_GROUP"))
+        .filter(pl.col("_GROUP").is_not_null())
+        .sort("_GROUP", maintain_order=True)
+        .with_columns(
+            pl.when(index < pl.col("_GROUP").replace_strict(range(len(groups)), train_splits))
+            .then(True)
+            .when(index >= pl.col("_GROUP").replace_strict(range(len(groups)), test_splits))
+            .then(False)
+            .alias("_SPLIT")
+        )
+        .drop("_GROUP")
+    )
 
 
 def check_split_balance(
@@ -150,26 +224,59 @@ def check_split_balance(
     return df_diff.filter(pl.col("diff") > threshold).collect()
 
 
-def standard_scaler(X_train: pl.LazyFrame, X_test: pl.LazyFrame) -> tuple[pl.DataFrame, pl.DataFrame, StandardScaler]:
+def standard_scaler(
+    X_train: pl.LazyFrame | pl.DataFrame,
+    X_test: pl.LazyFrame | pl.DataFrame,
+    dtype: pl.DataType = pl.Float64,
+) -> tuple[pl.DataFrame, pl.DataFrame, StandardScaler]:
     """
-    Standardises the input data with scikit-learn's StandardScaler.
+    Standardises the input data, equivalent to scikit-learn's StandardScaler.
+    The mean and variance of each column are calculated in a single aggregation over X_train,
+    and the transform is applied as a Polars expression, so no NumPy copies of the data are made.
+    Missing values are ignored when fitting, and remain missing.
 
     Args:
-        X_train (pl.LazyFrame): The training data to be standardised.
-        X_test (pl.LazyFrame): The test data to be standardised.
+        X_train (pl.LazyFrame | pl.DataFrame): The training data to be standardised.
+        X_test (pl.LazyFrame | pl.DataFrame): The test data to be standardised.
+        dtype (pl.DataType): The data type of the standardised data, i.e. pl.Float32 to halve its memory use.
+            Default is pl.Float64.
 
     Returns:
-        tuple[pl.DataFrame, pl.DataFrame, StandardScaler]: The standardised training and test data, and scaler.
+        tuple[pl.DataFrame, pl.DataFrame, StandardScaler]: The standardised training and test data, and a fitted
+            StandardScaler with the same parameters, for transforming new data (see predict.apply_model).
     """
-    scaler = StandardScaler()
+    X_train, X_test = X_train.lazy(), X_test.lazy()
+    columns = X_train.collect_schema().names()
+
+    # Mean, population variance and non-missing count of every column, in one pass
+    stats = X_train.select(
+        pl.all().mean().name.prefix("mean:"),
+        pl.all().var(ddof=0).name.prefix("var:"),
+        pl.all().count().name.prefix("count:"),
+    ).collect()
+    mean, var, count = np.array(stats.row(0), dtype=np.float64).reshape(3, len(columns))
+
+    # Constant columns (to within rounding error) and empty columns are left unscaled, as in scikit-learn
+    eps = np.finfo(np.float64).eps
+    constant = np.isnan(var) | (var <= count * eps * var + (count * mean * eps) ** 2)
+    scale = np.where(constant, 1.0, np.sqrt(var))
 
-    X_train_scaled = scaler.fit_transform(X_train.collect())
-    X_test_scaled = scaler.transform(X_test.collect())
+    scaler = StandardScaler()
+    scaler.mean_ = mean
+    scaler.var_ = var
+    scaler.scale_ = scale
+    scaler.n_features_in_ = len(columns)
+    count = count.astype(np.int64)
+    scaler.n_samples_seen_ = int(count[0]) if (count == count[0]).all() else count
 
-    X_train = pl.from_numpy(X_train_scaled, schema=X_train.collect_schema())
-    X_test = pl.from_numpy(X_test_scaled, schema=X_test.collect_schema())
+    def _transform(lf: pl.LazyFrame) -> pl.DataFrame:
+        "Apply the scaling to every column."
+        return lf.select(
+            ((pl.col(column) - column_mean) / column_scale).cast(dtype)
+            for column, column_mean, column_scale in zip(columns, mean, scale, strict=True)
+        ).collect()
 
-    return X_train, X_test, scaler
+    return _transform(X_train), _transform(X_test), scaler
 
 
 def sliding_window(
@@ -177,18 +284,33 @@ def sliding_window(
     agg_columns: list[str],
     period: int,
     stats: list[str] = ["min", "max", "mean", "std"],
+    engine: Literal["polars", "numpy"] = "polars",
+    stride: int = 1,
+    precision: Literal["float32", "float64"] = "float64",
 ) -> pl.DataFrame:
     """
     Apply sliding window aggregation on a DataFrame.
-    Extracts specified stats for each signal. Removes rows before the first full window.
+    Extracts specified stats for each signal. Removes rows before the first full window,
+    then keeps one window every {stride} rows of each TRIAL.
 
     Args:
         df (pl.DataFrame): The input DataFrame.
         agg_columns (list[str]): The columns names to apply aggregation.
         period (int): The window size in number of rows.
         stats (list[str]): The statistics to calculate for each signal.
-            Options are ['min', 'max', 'mean', 'std', 'first', 'last'].
+            Options are ['min', 'max', 'mean', 'std', 'first', 'last'] for both engines. The 'numpy' engine also
+            supports 'rms', 'range' and the statistics registered in lisa.windowing, i.e. 'skew', 'kurtosis',
+            'zcr', 'sma', 'domfreq' and the FFT band energies 'band{low}to{high}'.
             Default is ['min', 'max', 'mean', 'std'].
+        engine (Literal["polars", "numpy"]): The windowing backend. 'polars' uses Polars' rolling aggregation;
+            'numpy' uses the running-window engine in lisa.windowing, which computes every column of a trial at once
+            in time independent of the window size. The 'numpy' engine assumes TIME increases by one per row
+            (i.e. 1 kHz analog data). The 'numpy' engine is used whenever a statistic is only available with it.
+            Default is 'polars'.
+        stride (int): The number of rows between consecutive windows, counted from the first full window
+            of each TRIAL. Default is 1 (every row).
+        precision (Literal["float32", "float64"]): Floating point precision of the statistics. The 'numpy' engine
+            always accumulates in float64. Default is 'float64'.
     Returns:
         pl.DataFrame: The processed DataFrame.
     """
@@ -202,77 +324,146 @@ def sliding_window(
         "Apply rolling aggregation to a single chunk."
         rolling = chunk.lazy().rolling(index_column="TIME", period=f"{period}i", group_by="TRIAL")
 
-        # Map of statistic names to Polars functions
-        stat_funcs = {
-            "max": pl.max,
-            "min": pl.min,
-            "mean": pl.mean,
-            "std": pl.std,
-            "first": pl.first,
-            "last": pl.last,
-        }
-
         aggregations = []
         for col in columns_to_aggregate:
             for stat in stats:
-                if stat in stat_funcs:
-                    aggregations.append(stat_funcs[stat](col).alias(f"{stat}_{col}"))
+                aggregations.append(POLARS_STATS[stat](col).alias(f"{stat}_{col}"))
 
         return rolling.agg(aggregations).collect()
 
-    # Apply rolling aggregation
-    result_chunk = _rolling_agg(df, agg_columns, stats, period)
+    def _rolling_agg_numpy(
+        chunk: pl.DataFrame,
+        columns_to_aggregate: list[str],
+        stats: list[str],
+        period: int,
+    ) -> pl.DataFrame:
+        "Apply the running-window engine to each trial of a single chunk, keeping full windows only."
+        values = chunk.select(pl.col(columns_to_aggregate).cast(pl.Float64)).to_numpy()
+
+        # Sample rate in Hz, from the TIME step in ms, for the spectral statistics
+        time_steps = chunk["TIME"].diff().filter(chunk["TIME"].diff() > 0)
+        sample_rate = 1000 / time_steps.median() if len(time_steps) else 1000.0
+
+        # Row ranges of each trial, assuming rows are grouped by TRIAL
+        trials = chunk["TRIAL"].to_numpy()
+        bounds = [0, *(np.flatnonzero(trials[1:] != trials[:-1]) + 1), len(trials)]
+
+        row_indices, trial_stats = [], []
+        for start, end in zip(bounds[:-1], bounds[1:], strict=True):
+            if end - start < period:
+                continue
+            row_indices.append(np.arange(start + period - 1, end, stride))
+            trial_stats.append(rolling_statistics(values[start:end], period, stats, stride, sample_rate))
+
+        row_indices = np.concatenate(row_indices) if row_indices else np.empty(0, dtype=np.int64)
+        result = chunk.select("TRIAL", "TIME")[row_indices]
+
+        # Column-major, so each output column is a contiguous slice
+        stat_values = {
+            stat: np.asfortranarray(np.concatenate([trial[stat] for trial in trial_stats]))
+            if trial_stats
+            else np.empty((0, len(columns_to_aggregate)))
+            for stat in stats
+        }
+
+        aggregations = []
+        for index, col in enumerate(columns_to_aggregate):
+            for stat in stats:
+                series = pl.Series(f"{stat}_{col}", stat_values[stat][:, index], dtype=pl.Float64).fill_nan(None)
+                # Statistics that select a value keep the column's type, as in Polars
+                if stat in ["min", "max", "first", "last"]:
+                    series = series.cast(chunk.schema[col])
+                aggregations.append(series)
+
+        return result.with_columns(aggregations)
 
     # Check if TIME resets to 0 when TRIAL increases by 1
-    trial_check = result_chunk.with_columns((pl.col("TRIAL") - pl.col("TRIAL").shift(1)).alias("TRIAL_INCREASE"))
+    trial_check = df.with_columns((pl.col("TRIAL") - pl.col("TRIAL").shift(1)).alias("TRIAL_INCREASE"))
     time_resets_correctly = trial_check.filter(pl.col("TRIAL_INCREASE") == 1)["TIME"].to_list() == [0] * len(
         trial_check.filter(pl.col("TRIAL_INCREASE") == 1)
     )
-
-    # Remove rows before first 'full' window
-    if time_resets_correctly:
-        result_chunk = result_chunk.filter(pl.col("TIME") > period - 2)
-    else:
+    if not time_resets_correctly:
         raise ValueError(
-            "Time does not reset to 0 when TRIAL increases by 1. " "Unable to remove rows before first full window."
+            "Time does not reset to 0 when TRIAL increases by 1. Unable to remove rows before first full window."
         )
 
-    return result_chunk
+    if stride < 1:
+        raise ValueError(f"stride must be at least 1, but got {stride}.")
+
+    if engine == "polars" and not set(stats).issubset(POLARS_STATS):
+        engine = "numpy"
+
+    unknown_stats = set(stats).difference(POLARS_STATS if engine == "polars" else available_statistics())
+    if unknown_stats:
+        raise ValueError(f"Statistics {unknown_stats} are not available with the '{engine}' engine.")
+
+    if engine == "numpy":
+        # Only full windows are computed
+        result_chunk = _rolling_agg_numpy(df, agg_columns, stats, period)
+    else:
+        # Apply rolling aggregation
+        result_chunk = _rolling_agg(df, agg_columns, stats, period)
+
+        # Remove rows before first 'full' window
+        result_chunk = result_chunk.filter(pl.col("TIME") > period - 2)
+
+        if stride > 1:
+            result_chunk = result_chunk.filter(pl.int_range(pl.len()).over("TRIAL") % stride == 0)
+
+    # Floating point statistics are returned at the requested precision
+    return result_chunk.with_columns(pl.col(pl.Float32, pl.Float64).cast(FLOAT_DTYPES[precision]))
 
 
 def feature_extraction(
-    df: pl.DataFrame,
+    df: pl.DataFrame | pl.LazyFrame | dict[int, pl.LazyFrame],
     output_path: Path,
     period: int = 300,
     stats: list[str] = ["min", "max", "mean", "std"],
     validate_schema: bool = True,
+    engine: Literal["polars", "numpy"] = "polars",
+    stride: int = 1,
+    n_workers: int = 1,
+    memory_budget: int = 2 * 1024**3,
+    precision: Literal["float32", "float64"] = "float64",
 ):
     """
     Apply sliding window aggregation, validates results and saves to Parquet file.
 
+    The data is processed in parts of whole TRIALs, sized to fit within memory_budget. A LazyFrame, or the trials
+    of a partitioned dataset (from dataset.scan_trials), are never collected in full: each part is read from the
+    source when it is processed, so the raw data does not need to fit in memory. For the trials of a partitioned
+    dataset, each part only reads the files of its own trials.
+
     Args:
-        df (pl.DataFrame): The input DataFrame.
+        df (pl.DataFrame | pl.LazyFrame | dict[int, pl.LazyFrame]): The input data, or the LazyFrame of each
+            trial of a partitioned dataset by TRIAL number, from dataset.scan_trials.
         output_path (Path): The output path to save the Parquet file.
         period (int): The window size in number of rows. Default is 300.
-        stats (list[str]): The statistics to calculate for each signal.
-            Options are ['min', 'max', 'mean', 'std', 'first', 'last']. Default is ['min', 'max', 'mean', 'std'].
+        stats (list[str]): The statistics to calculate for each signal. See sliding_window for the options.
+            Default is ['min', 'max', 'mean', 'std'].
         validate_schema (bool): Flag to validate the schema of the output DataFrame.
-            Currently only works for 'full' dataset (i.e. all features). Default is True.
+            Currently only works for 'full' dataset (i.e. all features). Data without the OPTIONAL_SCHEMA_COLUMNS,
+            i.e. processed before PARTICIPANT was recorded, is validated without them. Default is True.
+        engine (Literal["polars", "numpy"]): The windowing backend used by sliding_window. The 'numpy' engine is
+            used whenever a statistic is only available with it. Default is 'polars'.
+        stride (int): The number of rows between consecutive windows of each TRIAL, i.e. 50 for one window
+            every 50 ms of 1 kHz data. Recorded with the window size and stats in the Parquet file metadata
+            (see read_feature_metadata). Default is 1 (every row).
+        n_workers (int): Number of threads processing groups of trials concurrently. The windowing engines
+            release the GIL, so trials are processed in parallel without copying them to other processes.
+            Default is 1 (serial).
+        memory_budget (int): Approximate memory limit in bytes for the parts being processed at once, across all
+            workers. A TRIAL is never split, so a single TRIAL larger than the budget is processed on its own.
+            Default is 2 GiB.
+        precision (Literal["float32", "float64"]): Floating point precision of the features; 'float32' halves the
+            size of the output. Recorded in the Parquet file metadata. Default is 'float64'.
     """
+    if engine == "polars" and not set(stats).issubset(POLARS_STATS):
+        logger.info(f"Using the 'numpy' engine for {set(stats).difference(POLARS_STATS)}, which Polars cannot compute.")
+        engine = "numpy"
 
-    def _split_into_parts(df: pl.DataFrame, trials_per_part: int = 5) -> list[pl.DataFrame]:
-        "Split df into groups of 'trials_per_part' TRIALs."
-
-        # Get number of TRIALs
-        max_trial = df["TRIAL"].max()
-
-        # Split TRIALs into chunks of trials_per_part
-        trial_chunks = [
-            list(range(i, min(i + trials_per_part, max_trial + 1))) for i in range(0, max_trial + 1, trials_per_part)
-        ]
-
-        # Split the DataFrame based on the trial_chunks
-        return [df.filter(pl.col("TRIAL").is_in(trial_chunk)) for trial_chunk in trial_chunks]
+    trial_frames = df if isinstance(df, dict) else None
+    lf = pl.concat(list(trial_frames.values()), how="diagonal") if trial_frames is not None else df.lazy()
 
     # Load the schema for validation later
     if validate_schema:
@@ -280,29 +471,73 @@ def feature_extraction(
         with schema_path.open("r") as f:
             validation_schema = json.load(f)
 
-    # List of categorical columns; one per trial
-    categorical_columns = ["ACTIVITY", "SPEED", "INCLINE"]
+        # The schema is recorded in float64; labels keep their types at any precision
+        if precision == "float32":
+            validation_schema = {
+                column: "Float32" if dtype == "Float64" and column not in NON_FEATURE_COLUMNS else dtype
+                for column, dtype in validation_schema.items()
+            }
 
-    # List of other columns to exclude from aggregation
-    exclude_columns = ["TIME", "TRIAL"]
-    exclude_columns.extend(categorical_columns)
+    column_names = lf.collect_schema().names()
 
-    # Get the list of columns to aggregate
-    columns_to_aggregate = [col for col in df.collect_schema().names() if col not in exclude_columns]
+    # List of categorical columns; one per trial. PARTICIPANT is carried through if present.
+    categorical_columns = ["ACTIVITY", "SPEED", "INCLINE"]
+    if "PARTICIPANT" in column_names:
+        categorical_columns.append("PARTICIPANT")
+
+    # Get the list of columns to aggregate, excluding the labels and identifiers
+    columns_to_aggregate = [col for col in column_names if col not in NON_FEATURE_COLUMNS]
+
+    # Table of the length and categorical values of each TRIAL, in a single pass over the data.
+    # The labels are matched onto every group of trials after windowing.
+    trial_labels = (
+        lf.group_by("TRIAL", maintain_order=True)
+        .agg(pl.len().alias("ROWS"), pl.col(categorical_columns).first())
+        .with_columns(pl.col("SPEED").cast(pl.Float64), pl.col("INCLINE").cast(pl.Int64))
+        .collect()
+    )
 
-    parts = _split_into_parts(df)
+    # Pack consecutive trials into parts, so the parts in progress (up to 2 per worker) fit in the budget.
+    # Each raw row is estimated as 8 bytes per column, plus a float copy and one output per statistic.
+    row_bytes = 8 * len(column_names) * (2 + len(stats))
+    part_rows = max(1, memory_budget // (2 * max(1, n_workers) * row_bytes))
+    part_trials = [[]]
+    rows = 0
+    for trial, trial_rows in trial_labels.select("TRIAL", "ROWS").iter_rows():
+        if part_trials[-1] and rows + trial_rows > part_rows:
+            part_trials.append([])
+            rows = 0
+        part_trials[-1].append(trial)
+        rows += trial_rows
+
+    if isinstance(df, pl.DataFrame):
+        # Already in memory: split in a single pass
+        trial_parts = {trial: index for index, trials in enumerate(part_trials) for trial in trials}
+        parts = df.with_columns(
+            pl.col("TRIAL").replace_strict(trial_parts, return_dtype=pl.UInt32).alias("PART")
+        ).partition_by("PART", maintain_order=True, include_key=False)
+    elif trial_frames is not None:
+        # Read each part from its own trial files when it is processed, with the columns of the full dataset
+        empty = lf.clear()
+        parts = [
+            pl.concat([empty, *(trial_frames[trial] for trial in trials)], how="diagonal") for trials in part_trials
+        ]
+    else:
+        # Read each part from the source when it is processed
+        parts = [lf.filter(pl.col("TRIAL").is_in(trials)) for trials in part_trials]
 
-    for index, part in enumerate(tqdm(parts, desc="Processing Trial Groups")):
-        result_chunk = sliding_window(part, columns_to_aggregate, period, stats)
+    def _process_part(part: pl.DataFrame | pl.LazyFrame) -> pa.Table:
+        "Extract and validate the features of a single group of trials."
+        if isinstance(part, pl.LazyFrame):
+            part = part.collect()
 
-        # Add the categorical columns back in by matching TRIAL
-        def _add_columns_back(result, df, columns):
-            for column in columns:
-                column_map = dict(zip(df["TRIAL"], df[column], strict=True))
-                result = result.with_columns(pl.col("TRIAL").replace_strict(column_map).alias(column))
-            return result
+        result_chunk = sliding_window(part, columns_to_aggregate, period, stats, engine, stride, precision)
 
-        result_chunk = _add_columns_back(result_chunk, df, categorical_columns)
+        # Add the categorical columns back in by matching TRIAL
+        result_chunk = result_chunk.with_columns(
+            pl.col("TRIAL").replace_strict(trial_labels["TRIAL"], trial_labels[column]).alias(column)
+            for column in categorical_columns
+        )
 
         # Validate the schema
         if validate_schema:
@@ -314,7 +549,12 @@ def feature_extraction(
                     strict=True,
                 )
             )
-            diff = set(validation_schema.items()) ^ set(result_schema_dict.items())
+            expected_schema = {
+                column: dtype
+                for column, dtype in validation_schema.items()
+                if column in result_schema_dict or column not in OPTIONAL_SCHEMA_COLUMNS
+            }
+            diff = set(expected_schema.items()) ^ set(result_schema_dict.items())
             if diff:
                 raise ValueError("Schema validation failed, difference: ", diff)
 
@@ -328,18 +568,49 @@ def feature_extraction(
             logger.error(f"Arrow table validation failed: {e}")
             raise
 
+        return arrow_table
+
+    # Parts are processed concurrently, and written in order as they complete
+    results = ordered_map(_process_part, parts, n_workers=n_workers)
+
+    for index, arrow_table in enumerate(tqdm(results, total=len(parts), desc="Processing Trial Groups")):
         # Write the Arrow table to Parquet
         if index == 0:  # First chunk: initialize ParquetWriter
-            writer = pq.ParquetWriter(output_path, arrow_table.schema)
+            metadata = {"window": period, "stride": stride, "stats": stats, "precision": precision}
+            schema = arrow_table.schema.with_metadata({FEATURE_METADATA_KEY: json.dumps(metadata)})
+            writer = pq.ParquetWriter(output_path, schema)
         writer.write_table(arrow_table)
 
     writer.close()
     logger.success(f"All {len(parts)} parts processed and saved to {output_path}.")
 
 
+def read_feature_metadata(features_path: Path) -> dict[str, any]:
+    """
+    Read the feature extraction parameters recorded by feature_extraction in a features Parquet file.
+
+    Args:
+        features_path (Path): Path to the features Parquet file.
+
+    Returns:
+        dict[str, any]: The 'window', 'stride', 'stats' and 'precision' used. Files without metadata, or partitioned
+            dataset directories, are assumed to have a stride of 1.
+    """
+    metadata = {"stride": 1}
+
+    if Path(features_path).is_file():
+        schema_metadata = pq.read_schema(features_path).metadata or {}
+        if FEATURE_METADATA_KEY.encode() in schema_metadata:
+            metadata.update(json.loads(schema_metadata[FEATURE_METADATA_KEY.encode()]))
+
+    return metadata
+
+
 def main(
     input_path: Path,
     output_path: Path,
+    participants: list[int] | None = None,
+    activities: list[str] | None = None,
 ):
     """
     Run feature extraction on the interim data and save to file.
@@ -347,12 +618,19 @@ def main(
     max, min, mean and std for each signal.
 
     Args:
-        input_path (Path): Path to the directory containing the data from dataset.py.
+        input_path (Path): Path to the data from dataset.py; either a single Parquet file
+            or a partitioned dataset directory.
         output_path (Path): Path to save the processed data to.
+        participants (list[int] | None): For a partitioned dataset, the participant numbers to include.
+            Defaults to None (all).
+        activities (list[str] | None): For a partitioned dataset, the activities to include. Defaults to None (all).
     """
-    df = pl.read_parquet(input_path, low_memory=True, rechunk=True)
+    if Path(input_path).is_dir():
+        data = scan_trials(input_path, participants, activities)
+    else:
+        data = pl.scan_parquet(input_path, low_memory=True)
 
-    feature_extraction(df, output_path)
+    feature_extraction(data, output_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,270 @@
+import json
+import multiprocessing
+import os
+import tempfile
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Literal
+
+import numpy as np
+import polars as pl
+from loguru import logger
+from numpy.lib.format import open_memmap
+from sklearn import metrics
+from sklearn.model_selection import GroupKFold
+from sklearn.preprocessing import StandardScaler
+from tqdm import tqdm
+
+from lisa.config import MODELS_DIR, NON_FEATURE_COLUMNS, PROJ_ROOT
+from lisa.dataset import scan_dataset
+from lisa.modeling.multipredictor import classifier, regressor
+
+# Number of feature columns read from the input at once, when writing the shared feature matrix
+COLUMN_BATCH_SIZE = 64
+
+# Scores reported for each fold, with the same names as the multipredictor output
+SCORES = ["activity", "activity_weighted", "speed_r2", "speed_rmse", "incline_r2", "incline_rmse"]
+
+
+def participant_folds(participants: np.ndarray) -> list[tuple[str, list[int]]]:
+    """
+    Leave-one-participant-out folds: each participant in turn is the test set, and all others the train set.
+
+    Args:
+        participants (np.ndarray): The participant number of each row.
+
+    Returns:
+        list[tuple[str, list[int]]]: The name and test participant numbers of each fold.
+    """
+    return [(f"P{participant}", [int(participant)]) for participant in np.unique(participants)]
+
+
+def trial_folds(trials: np.ndarray, n_splits: int = 5) -> list[tuple[str, list[int]]]:
+    """
+    Grouped k-fold folds by TRIAL: each trial is in the test set of exactly one fold, so no trial is shared
+    between the train and test sets. Folds are balanced by number of rows.
+
+    Args:
+        trials (np.ndarray): The TRIAL of each row.
+        n_splits (int): The number of folds. Default 5.
+
+    Returns:
+        list[tuple[str, list[int]]]: The name and test TRIALs of each fold.
+    """
+    splits = GroupKFold(n_splits=n_splits).split(trials, groups=trials)
+    return [
+        (f"fold{index}", np.unique(trials[test_indices]).tolist()) for index, (_, test_indices) in enumerate(splits)
+    ]
+
+
+def _write_arrays(lf: pl.LazyFrame, columns: list[str], group_column: str, data_dir: Path) -> np.ndarray:
+    """
+    Write the features, targets and fold groups to .npy files, to be memory-mapped by the fold workers.
+    The features are read a batch of columns at a time, so the full data is never held in memory twice.
+    ACTIVITY is stored as integer codes, and missing SPEED and INCLINE values as NaN.
+
+    Args:
+        lf (pl.LazyFrame): The feature data.
+        columns (list[str]): The feature columns.
+        group_column (str): The column that defines the folds, i.e. 'PARTICIPANT'.
+        data_dir (Path): Directory to write the arrays to.
+
+    Returns:
+        np.ndarray: The fold group of each row.
+    """
+    labels = lf.select("ACTIVITY", "SPEED", "INCLINE", group_column).collect()
+
+    _, activity_codes = np.unique(labels["ACTIVITY"].to_numpy().astype(str), return_inverse=True)
+    np.save(data_dir / "ACTIVITY.npy", activity_codes)
+    np.save(data_dir / "SPEED.npy", labels["SPEED"].cast(pl.Float64).to_numpy())
+    np.save(data_dir / "INCLINE.npy", labels["INCLINE"].cast(pl.Float64).to_numpy())
+
+    groups = labels[group_column].to_numpy()
+    np.save(data_dir / "groups.npy", groups)
+
+    X = open_memmap(data_dir / "X.npy", mode="w+", dtype=np.float64, shape=(labels.height, len(columns)))
+    for start in range(0, len(columns), COLUMN_BATCH_SIZE):
+        batch = lf.select(columns[start : start + COLUMN_BATCH_SIZE]).collect()
+        X[:, start : start + batch.width] = batch.to_numpy()
+    X.flush()
+
+    with (data_dir / "columns.json").open("w") as f:
+        json.dump(columns, f)
+
+    return groups
+
+
+def _fit_fold(
+    data_dir: str,
+    fold: str,
+    test_groups: list[int],
+    model: Literal["LR", "RF", "LGBM"],
+    hyperparams: dict[str, any],
+    n_jobs: int,
+) -> dict[str, any]:
+    """
+    Train and score the activity, speed and incline models of a single fold.
+    The arrays written by _write_arrays are memory-mapped, so each worker only copies its own train and test rows.
+
+    Args:
+        data_dir (str): Directory containing the arrays.
+        fold (str): The name of the fold.
+        test_groups (list[int]): The fold groups in the test set; all other rows are in the train set.
+        model (Literal["LR", "RF", "LGBM"]): Short name of the model 'family' to use.
+        hyperparams (dict[str, any]): The hyperparameters for the models.
+        n_jobs (int): Number of threads each model may use.
+
+    Returns:
+        dict[str, any]: The fold name, number of train and test rows, and scores.
+    """
+    data_dir = Path(data_dir)
+    with (data_dir / "columns.json").open("r") as f:
+        columns = json.load(f)
+
+    X = np.load(data_dir / "X.npy", mmap_mode="r")
+    test_mask = np.isin(np.load(data_dir / "groups.npy", mmap_mode="r"), test_groups)
+    train_indices, test_indices = np.flatnonzero(~test_mask), np.flatnonzero(test_mask)
+
+    X_train, X_test = X[train_indices], X[test_indices]
+    if model == "LR":
+        scaler = StandardScaler()
+        X_train = scaler.fit_transform(X_train)
+        X_test = scaler.transform(X_test)
+    X_train = pl.from_numpy(X_train, schema=columns)
+    X_test = pl.from_numpy(X_test, schema=columns)
+
+    params = {**hyperparams, "n_jobs": n_jobs}
+    scores = {"fold": fold, "train_rows": len(train_indices), "test_rows": len(test_indices)}
+
+    # === Predict activity ===
+    activity = np.load(data_dir / "ACTIVITY.npy", mmap_mode="r")
+    activity_model = classifier(model, X_train, pl.Series("ACTIVITY", activity[train_indices]), params)
+    y_pred = activity_model.predict(X_test)
+    scores["activity"] = metrics.accuracy_score(activity[test_indices], y_pred)
+    scores["activity_weighted"] = metrics.f1_score(activity[test_indices], y_pred, average="weighted")
+
+    # === Predict speed and incline ===
+    for target in ["SPEED", "INCLINE"]:
+        y = np.load(data_dir / f"{target}.npy", mmap_mode="r")
+        y_train = pl.Series(target, y[train_indices], nan_to_null=True).to_frame()
+        y_test = pl.Series(target, y[test_indices], nan_to_null=True).to_frame()
+
+        # Folds with too little locomotion (non-null values) in the test set cannot be scored
+        if y_test.to_series().count() < 2:
+            scores[f"{target.lower()}_r2"] = scores[f"{target.lower()}_rmse"] = None
+            continue
+
+        y_test_filtered, y_pred, _ = regressor(model, X_train, X_test, y_train, y_test, params)
+        scores[f"{target.lower()}_r2"] = metrics.r2_score(y_test_filtered, y_pred)
+        scores[f"{target.lower()}_rmse"] = float(np.sqrt(metrics.mean_squared_error(y_test_filtered, y_pred)))
+
+    return scores
+
+
+def _map_folds(args: list[list], n_workers: int) -> Iterator[dict[str, any]]:
+    """
+    Run _fit_fold for each fold, yielding the scores in fold order.
+    With more than one worker, folds are run concurrently in a process pool.
+
+    Args:
+        args (list[list]): The arguments of _fit_fold, as one list per argument.
+        n_workers (int): Number of worker processes.
+
+    Yields:
+        dict[str, any]: The scores of each fold.
+    """
+    if n_workers > 1:
+        # 'spawn' avoids forking the polars thread pool
+        with ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            yield from executor.map(_fit_fold, *args)
+    else:
+        yield from map(_fit_fold, *args)
+
+
+def cross_validate(
+    data_path: Path,
+    run_name: str,
+    model: Literal["LR", "RF", "LGBM"],
+    folds: Literal["participant", "trial"] = "participant",
+    n_splits: int = 5,
+    n_workers: int = 1,
+) -> pl.DataFrame:
+    """
+    Cross-validate the activity, speed and incline models, either leaving one participant out per fold
+    or with grouped k-fold by TRIAL. Folds are trained in parallel worker processes, which share the feature
+    matrix through memory-mapped files rather than receiving a copy each.
+    The scores of each fold, and their mean and standard deviation, are saved to
+    MODELS_DIR/run_name/cross_validation.csv and cross_validation.json.
+
+    Args:
+        data_path (Path): Path to the features parquet file, or to a partitioned dataset directory.
+        run_name (str): Name of the run.
+        model (Literal["LR", "RF", "LGBM"]): Short name of the model 'family' to use.
+            Currently supports 'LR' (logistic/linear regression), 'RF' (random forest), 'LGBM' (LightGBM).
+        folds (Literal["participant", "trial"]): 'participant' for leave-one-participant-out, which requires a
+            PARTICIPANT column, or 'trial' for grouped k-fold by TRIAL. Default 'participant'.
+        n_splits (int): Number of folds for grouped k-fold by TRIAL. Default 5.
+        n_workers (int): Number of folds trained concurrently, in separate processes. The CPUs are divided
+            between the workers. Default 1 (serial).
+
+    Returns:
+        pl.DataFrame: The scores of each fold.
+    """
+    lf = scan_dataset(data_path) if Path(data_path).is_dir() else pl.scan_parquet(data_path)
+
+    group_column = {"participant": "PARTICIPANT", "trial": "TRIAL"}[folds]
+    schema_names = lf.collect_schema().names()
+    if group_column not in schema_names:
+        raise ValueError(f"The data has no {group_column} column; re-run dataset processing and feature extraction.")
+    columns = [col for col in schema_names if col not in NON_FEATURE_COLUMNS]
+
+    # Get the hyperparameters for the model
+    hyperparams_path = Path(PROJ_ROOT / "lisa" / "modeling" / "hyperparameters.json")
+    with hyperparams_path.open("r") as f:
+        hyperparams = json.load(f)[model]
+
+    # Create output directory
+    output_dir = MODELS_DIR / run_name
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="lisa_cv_") as data_dir:
+        groups = _write_arrays(lf, columns, group_column, Path(data_dir))
+        fold_groups = participant_folds(groups) if folds == "participant" else trial_folds(groups, n_splits)
+
+        n_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+        args = [
+            [data_dir] * len(fold_groups),
+            [fold for fold, _ in fold_groups],
+            [test_groups for _, test_groups in fold_groups],
+            [model] * len(fold_groups),
+            [hyperparams] * len(fold_groups),
+            [n_jobs] * len(fold_groups),
+        ]
+
+        for scores in tqdm(_map_folds(args, n_workers), total=len(fold_groups), desc="Folds"):
+            logger.info(f"Fold {scores['fold']}: {scores}")
+            results.append(scores)
+
+    report = pl.DataFrame(results, schema_overrides={score: pl.Float64 for score in SCORES})
+    report.write_csv(output_dir / "cross_validation.csv")
+
+    summary = {
+        "mean": report.select(pl.col(SCORES).mean()).row(0, named=True),
+        "std": report.select(pl.col(SCORES).std()).row(0, named=True),
+        "folds": results,
+        "params": {
+            "model": model,
+            "folds": folds,
+            "n_folds": len(fold_groups),
+            "hyperparams": hyperparams,
+        },
+    }
+    with (output_dir / "cross_validation.json").open("w") as f:
+        json.dump(summary, f, indent=4)
+
+    logger.success(f"Cross-validation mean scores: {summary['mean']}")
+    logger.info(f"Report saved to: {output_dir}")
+
+    return report
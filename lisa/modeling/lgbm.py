@@ -0,0 +1,266 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+from loguru import logger
+from numpy import ndarray
+from sklearn.base import BaseEstimator, ClassifierMixin, RegressorMixin
+
+from lisa.feature_store import cache_key
+
+# LightGBM parameters that change how the features are binned, and so the binned Dataset
+BINNING_PARAMS = [
+    "max_bin",
+    "max_bin_by_feature",
+    "min_data_in_bin",
+    "bin_construct_sample_cnt",
+    "data_random_seed",
+    "use_missing",
+    "zero_as_missing",
+    "linear_tree",
+]
+
+
+class BoosterClassifier(ClassifierMixin, BaseEstimator):
+    """
+    A LightGBM Booster trained on a binned Dataset, with the predict and score methods of a scikit-learn classifier.
+
+    Args:
+        booster (lgb.Booster): The trained booster.
+        classes (ndarray): The class labels, in the order of the booster's class indices.
+    """
+
+    def __init__(self, booster: lgb.Booster, classes: ndarray):
+        self.booster = booster
+        self.classes = classes
+
+    @property
+    def classes_(self) -> ndarray:
+        return self.classes
+
+    @property
+    def feature_importances_(self) -> ndarray:
+        return self.booster.feature_importance()
+
+    def predict_proba(self, X: pl.DataFrame) -> ndarray:
+        proba = self.booster.predict(X)
+        return proba if proba.ndim == 2 else np.column_stack([1 - proba, proba])
+
+    def predict(self, X: pl.DataFrame) -> ndarray:
+        return self.classes[np.argmax(self.predict_proba(X), axis=1)]
+
+
+class BoosterRegressor(RegressorMixin, BaseEstimator):
+    """
+    A LightGBM Booster trained on a binned Dataset, with the predict and score methods of a scikit-learn regressor.
+
+    Args:
+        booster (lgb.Booster): The trained booster.
+    """
+
+    def __init__(self, booster: lgb.Booster):
+        self.booster = booster
+
+    @property
+    def feature_importances_(self) -> ndarray:
+        return self.booster.feature_importance()
+
+    def predict(self, X: pl.DataFrame) -> ndarray:
+        return self.booster.predict(X)
+
+
+def dataset_cache_path(data_path: Path, params: dict[str, any]) -> Path:
+    """
+    Path of the binned Dataset for a split of a features file, in a '.lgbm' directory alongside it.
+    The file name is a hash of the path, size and modification time of every features file (including those in
+    nested partition directories), the split and the binning parameters.
+
+    Args:
+        data_path (Path): Path to the features parquet file, or to a partitioned dataset directory.
+        params (dict[str, any]): The split and binning parameters. Must be JSON serialisable.
+
+    Returns:
+        Path: The path of the binary Dataset file.
+    """
+    data_path = Path(data_path)
+    if data_path.is_dir():
+        # Partitioned datasets nest their files, i.e. participant=1/activity=walk/00000.parquet
+        files = {file.relative_to(data_path).as_posix(): file for file in sorted(data_path.rglob("*.parquet"))}
+    else:
+        files = {data_path.name: data_path}
+    contents = json.dumps([[name, file.stat().st_size, file.stat().st_mtime_ns] for name, file in files.items()])
+    fingerprint = hashlib.sha256(contents.encode()).hexdigest()
+
+    return data_path.with_name(data_path.name + ".lgbm") / f"{cache_key(fingerprint, params)}.bin"
+
+
+def binning_params(hyperparams: dict[str, any]) -> dict[str, any]:
+    """
+    The Dataset parameters of a set of hyperparameters.
+    Pre-filtering of features is disabled, so hyperparameters such as min_data_in_leaf can change between runs
+    that share a Dataset.
+
+    Args:
+        hyperparams (dict[str, any]): The hyperparameters for the models.
+
+    Returns:
+        dict[str, any]: The parameters the Dataset is constructed with.
+    """
+    return {**{key: hyperparams[key] for key in BINNING_PARAMS if key in hyperparams}, "feature_pre_filter": False}
+
+
+def binned_dataset(X_train: pl.DataFrame, hyperparams: dict[str, any], cache_path: Path | None = None) -> lgb.Dataset:
+    """
+    Bin the training features into a LightGBM Dataset, shared by the models through their subsets of its rows.
+    The regressors' bins are those of all the training rows, so they can differ slightly from those of the
+    scikit-learn LightGBM wrappers, which bin the non-null rows alone.
+    With a cache_path, the Dataset is loaded from LightGBM's binary format if it exists, and saved to it otherwise,
+    so later runs on the same split skip binning.
+
+    Args:
+        X_train (pl.DataFrame): The training data.
+        hyperparams (dict[str, any]): The hyperparameters for the models.
+        cache_path (Path | None): Path of the binary Dataset file, i.e. from dataset_cache_path.
+            Default None (not cached).
+
+    Returns:
+        lgb.Dataset: The constructed Dataset, with placeholder labels.
+    """
+    params = binning_params(hyperparams)
+
+    if cache_path is not None and cache_path.exists():
+        dataset = lgb.Dataset(str(cache_path), params=params).construct()
+        if dataset.num_data() == X_train.height and dataset.feature_name == X_train.columns:
+            logger.info(f"Loaded binned LightGBM dataset from {cache_path}")
+            return dataset
+
+    dataset = lgb.Dataset(
+        X_train.to_numpy(),
+        label=np.zeros(X_train.height),
+        feature_name=X_train.columns,
+        params=params,
+    ).construct()
+
+    if cache_path is not None:
+        # Write to a temporary file first, so an interrupted write is never loaded
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = cache_path.with_suffix(".tmp")
+        dataset.save_binary(str(temp_path))
+        temp_path.replace(cache_path)
+        logger.info(f"Saved binned LightGBM dataset to {cache_path}")
+
+    return dataset
+
+
+def subset(dataset: lgb.Dataset, mask: pl.Series) -> lgb.Dataset:
+    """
+    The rows of a binned Dataset selected by a mask, as a new Dataset with the same bins.
+
+    Args:
+        dataset (lgb.Dataset): The binned Dataset, from binned_dataset.
+        mask (pl.Series): Boolean mask of the rows to keep.
+
+    Returns:
+        lgb.Dataset: The constructed subset, with placeholder labels.
+    """
+    return dataset.subset(np.flatnonzero(mask.to_numpy())).construct()
+
+
+def _train(
+    dataset: lgb.Dataset,
+    label: ndarray,
+    weight: ndarray | None,
+    params: dict[str, any],
+) -> lgb.Booster:
+    """
+    Train a booster on a binned Dataset. The labels and weights are set on the Dataset, so it must not be shared
+    with a fit running on another thread.
+    The scikit-learn style parameters used by multipredictor.classifier and multipredictor.regressor
+    (n_estimators, n_jobs, random_state) are translated to their LightGBM equivalents.
+
+    Args:
+        dataset (lgb.Dataset): The binned Dataset, from binned_dataset.
+        label (ndarray): The label of each row.
+        weight (ndarray | None): The weight of each row, if any.
+        params (dict[str, any]): The hyperparameters for the model, including the objective.
+
+    Returns:
+        lgb.Booster: The trained booster.
+    """
+    dataset.set_label(label)
+    if weight is not None:
+        dataset.set_weight(weight)
+
+    params = {**params, **dataset.params}
+    num_boost_round = params.pop("n_estimators", 100)
+    params.setdefault("seed", params.pop("random_state", 42))
+    n_jobs = params.pop("n_jobs", -1)
+    params["num_threads"] = (os.cpu_count() or 1) + 1 + n_jobs if n_jobs < 0 else n_jobs
+
+    return lgb.train(params, dataset, num_boost_round=num_boost_round)
+
+
+def classifier(dataset: lgb.Dataset, y_train: pl.Series, params: dict[str, any]) -> BoosterClassifier:
+    """
+    Fits a LightGBM classifier to a binned Dataset, weighting the classes as multipredictor.classifier does.
+
+    Args:
+        dataset (lgb.Dataset): The binned training data, from binned_dataset.
+        y_train (pl.Series): The training labels.
+        params (dict[str, any]): The hyperparameters for the model.
+
+    Returns:
+        BoosterClassifier: The trained classifier model.
+    """
+    classes, codes = np.unique(y_train.to_numpy(), return_inverse=True)
+    sample_weight = (len(codes) / np.bincount(codes))[codes]
+
+    if len(classes) > 2:
+        params = {**params, "objective": "multiclass", "num_class": len(classes)}
+    else:
+        params = {**params, "objective": "binary"}
+
+    booster = _train(dataset, codes, sample_weight, params)
+
+    return BoosterClassifier(booster, classes)
+
+
+def regressor(
+    dataset: lgb.Dataset,
+    X_test: pl.DataFrame,
+    y_train: pl.DataFrame,
+    y_test: pl.DataFrame,
+    params: dict[str, any],
+) -> tuple[pl.DataFrame, ndarray, BoosterRegressor]:
+    """
+    Fits a LightGBM regressor to a binned Dataset, as multipredictor.regressor does.
+    Only the rows with non-null values (locomotion activities) are used for fitting and testing, so the Dataset
+    must hold the non-null rows of the training data alone.
+
+    Args:
+        dataset (lgb.Dataset): The binned non-null rows of the training data, i.e. from subset.
+        X_test (pl.DataFrame): The test data.
+        y_train (pl.DataFrame): The training labels.
+        y_test (pl.DataFrame): The test labels.
+        params (dict[str, any]): The hyperparameters for the model.
+
+    Returns:
+        tuple[pl.DataFrame, ndarray, BoosterRegressor]: The true values, predicted values, and model.
+    """
+    label = y_train.to_series(0).drop_nulls().to_numpy()
+    if dataset.num_data() != len(label):
+        raise ValueError(
+            f"The Dataset has {dataset.num_data()} rows, but there are {len(label)} non-null training labels."
+        )
+    booster = _train(dataset, label, None, {**params, "objective": "regression"})
+    model = BoosterRegressor(booster)
+
+    test_non_null_mask = y_test.to_series(0).is_not_null()
+    y_test_filtered = y_test.filter(test_non_null_mask)
+    y_pred = model.predict(X_test.filter(test_non_null_mask))
+
+    return y_test_filtered, y_pred, model
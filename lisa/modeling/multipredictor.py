@@ -1,8 +1,11 @@
 import json
+import multiprocessing
 import os
 import pickle
 import re
+import tempfile
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 from typing import Literal
 
@@ -12,6 +15,7 @@ import numpy as np
 import polars as pl
 from loguru import logger
 from numpy import ndarray
+from numpy.lib.format import open_memmap
 from sklearn import metrics, set_config
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.linear_model import LinearRegression, LogisticRegression
@@ -19,17 +23,20 @@ from sklearn.multiclass import OneVsRestClassifier
 from sklearn.preprocessing import StandardScaler
 
 from lisa import evaluate
-from lisa.config import FOOT_SENSOR_PATTERN, IMU_PATTERN, MODELS_DIR, PROJ_ROOT
+from lisa.config import FOOT_SENSOR_PATTERN, IMU_PATTERN, MODELS_DIR, NON_FEATURE_COLUMNS, PROJ_ROOT
+from lisa.dataset import FLOAT_DTYPES, scan_dataset
 from lisa.features import (
     check_split_balance,
-    sequential_stratified_split,
+    read_feature_metadata,
+    sequential_split_indices,
     standard_scaler,
 )
+from lisa.modeling import lgbm
 from lisa.plots import regression_histogram
 
 # Define type aliases
-ClassifierModel = OneVsRestClassifier | RandomForestClassifier | lgb.LGBMClassifier
-TreeBasedRegressorModel = RandomForestRegressor | lgb.LGBMRegressor
+ClassifierModel = OneVsRestClassifier | RandomForestClassifier | lgb.LGBMClassifier | lgbm.BoosterClassifier
+TreeBasedRegressorModel = RandomForestRegressor | lgb.LGBMRegressor | lgbm.BoosterRegressor
 RegressorModel = LinearRegression | TreeBasedRegressorModel
 
 
@@ -58,7 +65,9 @@ def classifier(model_name: str, X_train: pl.DataFrame, y_train: pl.Series, param
     sample_weight = np.array([class_weights[label] for label in y_train])
 
     models = {
-        "LR": lambda **params: OneVsRestClassifier(LogisticRegression(**params).set_fit_request(sample_weight=True)),
+        "LR": lambda **params: OneVsRestClassifier(
+            LogisticRegression(**params).set_fit_request(sample_weight=True), n_jobs=params["n_jobs"]
+        ),
         "RF": lambda **params: RandomForestClassifier(**params).set_fit_request(sample_weight=True),
         "LGBM": lambda **params: lgb.LGBMClassifier(**params).set_fit_request(sample_weight=True),
     }
@@ -121,35 +130,27 @@ def _regressor_script(
     model_name: str,
     feature_name: str,
     X_train: pl.DataFrame,
-    X_test: pl.DataFrame,
-    y_train: pl.DataFrame,
-    y_test: pl.DataFrame,
-    hyperparams: dict[str, any],
+    y_test_filtered: pl.DataFrame,
+    y_pred: ndarray,
+    model: RegressorModel,
     output_dir: Path,
-) -> tuple[float, float, RegressorModel]:
+) -> tuple[float, float]:
     """
-    Script set-up and tear-down for fitting the regressor model.
-    Logs any imbalance in train-test split, fits the model, and saves the histogram plot
-    and feature importances.
+    Script tear-down for a fitted regressor model.
+    Scores the predictions, and saves the histogram plot and feature importances.
 
     Args:
-        feature_name (str): The name of the feature to predict, i.e 'Speed'.
+        feature_name (str): The name of the feature predicted, i.e 'Speed'.
         X_train (pl.DataFrame): The training data.
-        X_test (pl.DataFrame): The test data.
-        y_train (pl.DataFrame): The training labels.
-        y_test (pl.DataFrame): The test labels.
-        hyperparams (dict[str, any]): The hyperparameters for the model.
+        y_test_filtered (pl.DataFrame): The non-null test labels.
+        y_pred (ndarray): The predicted values.
+        model (RegressorModel): The trained regressor model.
+        output_dir (Path): Directory to save the files.
 
     Returns:
         float: The r2 score.
         float: The rmse score.
-        RegressorModel: The trained regressor model.
     """
-    if not check_split_balance(y_train.lazy(), y_test.lazy()).is_empty():
-        logger.info(f"{feature_name} unbalance: {check_split_balance(y_train.lazy(), y_test.lazy())}")
-
-    y_test_filtered, y_pred, model = regressor(model_name, X_train, X_test, y_train, y_test, hyperparams)
-
     rmse = np.sqrt(metrics.mean_squared_error(y_test_filtered, y_pred))
     r2 = metrics.r2_score(y_test_filtered, y_pred)
 
@@ -165,7 +166,23 @@ def _regressor_script(
         with open(feature_importances_path, "w") as f:
             json.dump(sorted_feature_importance_dict, f, indent=4)
 
-    return r2, rmse, model
+    return r2, rmse
+
+
+def _split_jobs(n_jobs: int, n_models: int) -> int:
+    """
+    Divide a budget of cores between models trained concurrently.
+
+    Args:
+        n_jobs (int): The total number of cores. Negative values count back from all cores, as in joblib,
+            so -1 is all cores.
+        n_models (int): The number of models trained at once.
+
+    Returns:
+        int: The number of cores for each model, at least 1.
+    """
+    total = (os.cpu_count() or 1) + 1 + n_jobs if n_jobs < 0 else n_jobs
+    return max(1, total // n_models)
 
 
 def _feature_importances(model: TreeBasedRegressorModel, X_train: pl.DataFrame) -> dict[str, float]:
@@ -194,15 +211,24 @@ def _feature_importances(model: TreeBasedRegressorModel, X_train: pl.DataFrame)
     )
 
 
-def _log_parameters(df: pl.DataFrame, hyperparams: dict[str, any], window: int, split: float) -> dict[str, any]:
+def _log_parameters(
+    columns: list[str],
+    hyperparams: dict[str, any],
+    window: int,
+    split: float,
+    stride: int = 1,
+    precision: str = "float64",
+) -> dict[str, any]:
     """
     Logs the parameters used in the models.
 
     Args:
-        df (pl.DataFrame): The input data.
+        columns (list[str]): The column names of the input data.
         hyperparams (dict[str, any]): The tuning hyperparameters for the models.
         window (int): The size of the sliding window.
         split (float): The train-test split.
+        stride (int): The number of raw samples between feature rows. Default 1.
+        precision (str): The floating point precision of the features. Default 'float64'.
 
         Returns:
         dict[str, any]: The output dictionary.
@@ -227,7 +253,7 @@ def _log_parameters(df: pl.DataFrame, hyperparams: dict[str, any], window: int,
     imu_pattern = re.compile(IMU_PATTERN)
     foot_sensor_pattern = re.compile(FOOT_SENSOR_PATTERN)
 
-    for key in df.collect_schema().names():
+    for key in columns:
         imu_match = imu_pattern.match(key)
         foot_sensor_match = foot_sensor_pattern.match(key)
         if imu_match:
@@ -244,6 +270,8 @@ def _log_parameters(df: pl.DataFrame, hyperparams: dict[str, any], window: int,
     # Log the parameters
     output["params"] = {
         "window": window,
+        "stride": stride,
+        "precision": precision,
         "split": split,
         "statistic": list(statistic),
         "measure": list(measure),
@@ -299,45 +327,148 @@ def _save_output(
         logger.info("Models saved to pickle files")
 
 
-def multipredictor(
+def _load_split(
     data_path: Path,
-    run_name: str,
-    model: Literal["LR", "RF", "LGBM"],
-    window: int = 800,
-    split: float = 0.8,
-    save: bool = False,
-):
+    window: int,
+    split: float,
+    precision: Literal["float32", "float64"],
+) -> tuple[pl.DataFrame, pl.DataFrame, list[str], pl.Series, int]:
     """
-    Runs a multimodel predictor on the input data.
-    Classifies activity, and predicts speed and incline.
-    Three separate models are trained, validated and logged.
+    Load the features and split them into train and test sets.
 
     Args:
-        data_path (Path): Path to the data parquet file.
-        run_name (str): Name of the run.
-        model (Literal["LR", "RF", "LGBM"]): Short name of the model 'family' to use.
-            Currently supports 'LR' (logistic/linear regression), 'RF' (random forest), 'LGBM' (LightGBM).
-        window (int): Size of the sliding window. Default 800.
-        split (float): Train-test split. Default 0.8.
-        save (bool): Whether to save the scaler and mdodels to pkl files. Default False.
+        data_path (Path): Path to the data parquet file, or to a partitioned dataset directory.
+        window (int): Size of the sliding window. The gap left between train and test sets is one window,
+            scaled by the stride recorded in the features file.
+        split (float): Train-test split.
+        precision (Literal["float32", "float64"]): Floating point precision of the features.
+
+    Returns:
+        pl.DataFrame: The train set.
+        pl.DataFrame: The test set.
+        list[str]: The column names of the input data.
+        pl.Series: The ACTIVITY labels, in order of appearance.
+        int: The stride recorded in the features file.
     """
-    start_time = time.time()
+    # Load the data once; the train and test sets are taken from it by row index
+    # Features are loaded at the requested precision, while the labels keep their types
+    lf = scan_dataset(data_path) if Path(data_path).is_dir() else pl.scan_parquet(data_path)
+    dtype = FLOAT_DTYPES[precision]
+    df = lf.with_columns(pl.col(pl.Float32, pl.Float64).exclude(NON_FEATURE_COLUMNS).cast(dtype)).collect()
 
-    # Lazy load the data
-    df = pl.scan_parquet(data_path)
+    # Leave a gap of one window between train and test, in feature rows
+    stride = read_feature_metadata(data_path)["stride"]
+    gap = -(-window // stride)
 
     # Split the data
-    X_train, X_test, y1_train, y1_test, y2_train, y2_test, y3_train, y3_test = sequential_stratified_split(
-        df, split, window, ["ACTIVITY", "SPEED", "INCLINE"]
-    )
+    train_indices, test_indices, _ = sequential_split_indices(df.lazy(), split, gap, ["ACTIVITY", "SPEED", "INCLINE"])
+    train, test = df[train_indices], df[test_indices]
+
+    # Keep only what is needed from the full data, so its memory can be released
+    columns = df.columns
+    labels = df["ACTIVITY"].unique(maintain_order=True)
+    del df
+
+    return train, test, columns, labels, stride
+
+
+def _write_split(
+    train: pl.DataFrame,
+    test: pl.DataFrame,
+    columns: list[str],
+    labels: pl.Series,
+    stride: int,
+    data_dir: Path,
+) -> None:
+    """
+    Write the train and test sets to files, to be read by the worker processes of multifamily_predictor.
+    The features of each set are written one column per row of a .npy file, so every column is contiguous,
+    and the targets to a Parquet file.
+
+    Args:
+        train (pl.DataFrame): The train set.
+        test (pl.DataFrame): The test set.
+        columns (list[str]): The column names of the input data.
+        labels (pl.Series): The ACTIVITY labels, in order of appearance.
+        stride (int): The stride recorded in the features file.
+        data_dir (Path): Directory to write the files to.
+    """
+    features = [col for col in train.columns if col not in NON_FEATURE_COLUMNS]
+
+    for name, data in [("train", train), ("test", test)]:
+        X = open_memmap(
+            data_dir / f"{name}_X.npy",
+            mode="w+",
+            dtype=data.select(features).head(0).to_numpy().dtype,
+            shape=(len(features), data.height),
+        )
+        for index, col in enumerate(features):
+            X[index] = data[col].to_numpy()
+        X.flush()
+        data.select("ACTIVITY", "SPEED", "INCLINE").write_parquet(data_dir / f"{name}_targets.parquet")
+
+    with (data_dir / "split.json").open("w") as f:
+        json.dump({"columns": columns, "features": features, "labels": labels.to_list(), "stride": stride}, f)
+
+
+def _read_split(data_dir: Path) -> tuple[pl.DataFrame, pl.DataFrame, list[str], pl.Series, int]:
+    """
+    Read the train and test sets written by _write_split.
+    Each feature column is copied from the memory-mapped file straight into the DataFrame, without first
+    reading the whole file, but the DataFrames are private to the calling process.
+
+    Args:
+        data_dir (Path): Directory containing the files.
+
+    Returns:
+        tuple[pl.DataFrame, pl.DataFrame, list[str], pl.Series, int]: As returned by _load_split.
+    """
+    with (data_dir / "split.json").open("r") as f:
+        split = json.load(f)
+
+    sets = []
+    for name in ["train", "test"]:
+        X = np.load(data_dir / f"{name}_X.npy", mmap_mode="r")
+        features = pl.DataFrame({col: X[index] for index, col in enumerate(split["features"])})
+        sets.append(features.hstack(pl.read_parquet(data_dir / f"{name}_targets.parquet")))
+
+    return sets[0], sets[1], split["columns"], pl.Series("ACTIVITY", split["labels"]), split["stride"]
+
+
+def _train_models(
+    train: pl.DataFrame,
+    test: pl.DataFrame,
+    columns: list[str],
+    labels: pl.Series,
+    stride: int,
+    output_dir: Path,
+    model: Literal["LR", "RF", "LGBM"],
+    window: int,
+    split: float,
+    save: bool,
+    precision: Literal["float32", "float64"],
+    n_jobs: int,
+    data_path: Path | None = None,
+) -> None:
+    """
+    Train, validate and log the activity, speed and incline models on a split of the data, saving the outputs
+    to output_dir. data_path is the features file the split was taken from, alongside which the binned
+    LightGBM Dataset is cached. Other arguments are as for multipredictor, and as returned by _load_split.
+    """
+    dtype = FLOAT_DTYPES[precision]
+
+    X_train, X_test = train.drop(NON_FEATURE_COLUMNS, strict=False), test.drop(NON_FEATURE_COLUMNS, strict=False)
+    y1_train, y1_test = train.select("ACTIVITY"), test.select("ACTIVITY")
+    y2_train, y2_test = train.select("SPEED"), test.select("SPEED")
+    y3_train, y3_test = train.select("INCLINE"), test.select("INCLINE")
 
     # Scale the data, if necessary
     if model == "LR":
         logger.info("scaling data...")
-        scaled_X_train, scaled_X_test, scaler = standard_scaler(X_train, X_test)
+        scaled_X_train, scaled_X_test, scaler = standard_scaler(X_train, X_test, dtype)
         logger.info("data scaled")
     else:
-        scaled_X_train, scaled_X_test = X_train.collect(), X_test.collect()
+        scaled_X_train, scaled_X_test = X_train, X_test
         scaler = None
 
     # Get the hyperparameters for the model
@@ -346,82 +477,245 @@ def multipredictor(
         hyperparameters = json.load(f)
     hyperparams = hyperparameters[model]
 
+    output = _log_parameters(columns, hyperparams, window, split, stride, precision)
+
+    for name, y_train, y_test in [
+        ("Activity", y1_train, y1_test),
+        ("Speed", y2_train, y2_test),
+        ("Incline", y3_train, y3_test),
+    ]:
+        unbalance = check_split_balance(y_train.lazy(), y_test.lazy())
+        if not unbalance.is_empty():
+            logger.info(f"{name} unbalance: {unbalance}")
+
+    # Train the three models concurrently, dividing the cores between them
+    # The fits release the GIL, while evaluation and plotting stay on this thread as each fit completes
+    params = {**hyperparams, "n_jobs": _split_jobs(n_jobs, 3)}
+    if model == "LGBM":
+        # The training rows are binned once, and cached alongside the features. The regressors are trained on
+        # subsets of the non-null rows, which share its bins. Each subset is its own Dataset, built here, so no
+        # Dataset is shared between the fitting threads
+        cache_path = None
+        if data_path is not None:
+            cache_params = {"window": window, "split": split, "stride": stride, "precision": precision}
+            cache_path = lgbm.dataset_cache_path(data_path, {**cache_params, **lgbm.binning_params(hyperparams)})
+        dataset = lgbm.binned_dataset(scaled_X_train, hyperparams, cache_path)
+        datasets = {
+            "Speed": lgbm.subset(dataset, y2_train.to_series().is_not_null()),
+            "Incline": lgbm.subset(dataset, y3_train.to_series().is_not_null()),
+        }
+
+        fits = {
+            "Activity": (lgbm.classifier, dataset, y1_train.to_series(), params),
+            "Speed": (lgbm.regressor, datasets["Speed"], scaled_X_test, y2_train, y2_test, params),
+            "Incline": (lgbm.regressor, datasets["Incline"], scaled_X_test, y3_train, y3_test, params),
+        }
+    else:
+        fits = {
+            "Activity": (classifier, model, scaled_X_train, y1_train.to_series(), params),
+            "Speed": (regressor, model, scaled_X_train, scaled_X_test, y2_train, y2_test, params),
+            "Incline": (regressor, model, scaled_X_train, scaled_X_test, y3_train, y3_test, params),
+        }
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        futures = {executor.submit(*fit): target for target, fit in fits.items()}
+
+        for future in as_completed(futures):
+            target = futures[future]
+            logger.info(f"{target} model trained")
+
+            # === Predict activity ===
+            if target == "Activity":
+                activity_model = future.result()
+
+                # Predict the test set once, for all the scores and the confusion matrix
+                y1_pred = activity_model.predict(scaled_X_test)
+
+                y1_score = metrics.accuracy_score(y1_test, y1_pred)
+                output["score"]["activity"] = y1_score
+
+                # Calculate and log the weighted f1_score
+                f1_av = metrics.f1_score(y1_test, y1_pred, average="weighted")
+                output["score"]["activity_weighted"] = f1_av
+
+                # Create and log confusion matrix
+                cm_plot_path = output_dir / "confusion_matrix.png"
+                cm = evaluate.confusion_matrix(activity_model, labels, scaled_X_test, y1_test, cm_plot_path, y1_pred)
+                logger.info("Confusion Matrix:\n" + str(cm))
+
+            # === Predict speed and incline ===
+            else:
+                y_test_filtered, y_pred, regressor_model = future.result()
+                r2, rmse = _regressor_script(
+                    model, target, scaled_X_train, y_test_filtered, y_pred, regressor_model, output_dir
+                )
+                output["score"][f"{target.lower()}_r2"], output["score"][f"{target.lower()}_rmse"] = r2, rmse
+                if target == "Speed":
+                    speed_model = regressor_model
+                else:
+                    incline_model = regressor_model
+
+    # Save final outputs
+    _save_output(
+        output,
+        output_dir,
+        scaler,
+        activity_model,
+        speed_model,
+        incline_model,
+        scaled_X_train,
+        save,
+    )
+
+
+def multipredictor(
+    data_path: Path,
+    run_name: str,
+    model: Literal["LR", "RF", "LGBM"],
+    window: int = 800,
+    split: float = 0.8,
+    save: bool = False,
+    precision: Literal["float32", "float64"] = "float64",
+    n_jobs: int = -1,
+):
+    """
+    Runs a multimodel predictor on the input data.
+    Classifies activity, and predicts speed and incline.
+    Three separate models are trained concurrently, sharing the cores, then validated and logged.
+    Each model is evaluated and plotted as soon as its fit completes, while the others are still training.
+
+    Args:
+        data_path (Path): Path to the data parquet file, or to a partitioned dataset directory.
+        run_name (str): Name of the run.
+        model (Literal["LR", "RF", "LGBM"]): Short name of the model 'family' to use.
+            Currently supports 'LR' (logistic/linear regression), 'RF' (random forest), 'LGBM' (LightGBM).
+        window (int): Size of the sliding window. Default 800. The gap left between train and test sets is one window,
+            scaled by the stride recorded in the features file.
+        split (float): Train-test split. Default 0.8.
+        save (bool): Whether to save the scaler and mdodels to pkl files. Default False.
+        precision (Literal["float32", "float64"]): Floating point precision of the feature matrices passed to the
+            models. 'float32' halves their memory. Default 'float64'.
+        n_jobs (int): Number of cores shared between the three models. Negative values count back from all
+            cores, as in joblib. Default -1 (all cores).
+    """
+    start_time = time.time()
+
     # Create output directory
     output_dir = MODELS_DIR / run_name
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    output = _log_parameters(df, hyperparams, window, split)
+    train, test, columns, labels, stride = _load_split(data_path, window, split, precision)
+    _train_models(
+        train, test, columns, labels, stride, output_dir, model, window, split, save, precision, n_jobs, data_path
+    )
 
-    # === Predict activity ===
-    if not check_split_balance(y1_train, y1_test).is_empty():
-        logger.info(f"Activity unbalance: {check_split_balance(y1_train, y1_test)}")
+    end_time = time.time()
+    elapsed_time = end_time - start_time
+    logger.info(f"Time taken to run: {elapsed_time:.2f} seconds")
 
-    y1_train = y1_train.collect()
-    y1_test = y1_test.collect()
 
-    activity_model = classifier(
-        model,
-        scaled_X_train,
-        y1_train.to_series(),
-        hyperparams,
-    )
+def _train_family(
+    data_dir: str,
+    data_path: Path,
+    output_dir: Path,
+    model: Literal["LR", "RF", "LGBM"],
+    window: int,
+    split: float,
+    save: bool,
+    precision: Literal["float32", "float64"],
+    n_jobs: int,
+) -> str:
+    """
+    Train one model family on the split written by _write_split, in a worker process of multifamily_predictor.
 
-    y1_score = activity_model.score(scaled_X_test, y1_test)
-    output["score"]["activity"] = y1_score
+    Args:
+        data_dir (str): Directory containing the split.
+        data_path (Path): Path to the features the split was taken from.
+        output_dir (Path): Directory to save the outputs of the family to.
+        n_jobs (int): Number of cores for the family.
+        Other arguments are as for multipredictor.
 
-    # Calculate and log the weighted f1_score
-    y1_pred = activity_model.predict(scaled_X_test)
-    f1_av = metrics.f1_score(y1_test, y1_pred, average="weighted")
-    output["score"]["activity_weighted"] = f1_av
+    Returns:
+        str: The model family.
+    """
+    start_time = time.time()
 
-    # Create and log confusion matrix
-    labels = df.select("ACTIVITY").collect().to_series().unique(maintain_order=True)
-    cm_plot_path = output_dir / "confusion_matrix.png"
-    cm = evaluate.confusion_matrix(activity_model, labels, scaled_X_test, y1_test, cm_plot_path)
-    logger.info("Confusion Matrix:\n" + str(cm))
+    train, test, columns, labels, stride = _read_split(Path(data_dir))
+    _train_models(
+        train, test, columns, labels, stride, output_dir, model, window, split, save, precision, n_jobs, data_path
+    )
 
-    # === Predict speed ===
-    y2_train = y2_train.collect()
-    y2_test = y2_test.collect()
+    logger.info(f"Time taken to run {model}: {time.time() - start_time:.2f} seconds")
+    return model
 
-    output["score"]["speed_r2"], output["score"]["speed_rmse"], speed_model = _regressor_script(
-        model,
-        "Speed",
-        scaled_X_train,
-        scaled_X_test,
-        y2_train,
-        y2_test,
-        hyperparams,
-        output_dir,
-    )
 
-    # === Predict incline ===
-    y3_train = y3_train.collect()
-    y3_test = y3_test.collect()
+def multifamily_predictor(
+    data_path: Path,
+    run_id: str,
+    models: list[Literal["LR", "RF", "LGBM"]] = ["LR", "RF", "LGBM"],
+    window: int = 800,
+    split: float = 0.8,
+    save: bool = False,
+    precision: Literal["float32", "float64"] = "float64",
+    n_jobs: dict[str, int] | None = None,
+):
+    """
+    Runs the multimodel predictor for several model families in parallel.
+    The data is loaded and split once, and handed to a worker process per family through files, so the total
+    time approaches that of the slowest family rather than the sum. Each worker reads its own copy of the split,
+    so peak memory grows with the number of families.
+    The outputs of each family are saved to MODELS_DIR/{model}_{run_id}, as by multipredictor.
 
-    output["score"]["incline_r2"], output["score"]["incline_rmse"], incline_model = _regressor_script(
-        model,
-        "Incline",
-        scaled_X_train,
-        scaled_X_test,
-        y3_train,
-        y3_test,
-        hyperparams,
-        output_dir,
-    )
+    Args:
+        data_path (Path): Path to the data parquet file, or to a partitioned dataset directory.
+        run_id (str): Unique identifier for the run.
+        models (list[Literal["LR", "RF", "LGBM"]]): Model 'families' to train. Defaults to all three.
+        window (int): Size of the sliding window. Default 800.
+        split (float): Train-test split. Default 0.8.
+        save (bool): Whether to save the scalers and models to pkl files. Default False.
+        precision (Literal["float32", "float64"]): Floating point precision of the feature matrices passed to the
+            models. Default 'float64'.
+        n_jobs (dict[str, int] | None): Number of cores for each family, i.e. {'LR': 2, 'RF': 8, 'LGBM': 6}.
+            Families not listed share the cores left over equally. Default None (all cores shared equally).
+    """
+    start_time = time.time()
 
-    # Save final outputs
-    _save_output(
-        output,
-        output_dir,
-        scaler,
-        activity_model,
-        speed_model,
-        incline_model,
-        scaled_X_train,
-        save,
-    )
+    n_jobs = dict(n_jobs or {})
+    unallocated = [model for model in models if model not in n_jobs]
+    if unallocated:
+        remaining = (os.cpu_count() or 1) - sum(n_jobs.get(model, 0) for model in models)
+        n_jobs.update({model: max(1, remaining // len(unallocated)) for model in unallocated})
+    logger.info(f"Cores per model family: {n_jobs}")
+
+    output_dirs = {model: MODELS_DIR / f"{model}_{run_id}" for model in models}
+    for output_dir in output_dirs.values():
+        output_dir.mkdir(parents=True, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(prefix="lisa_families_") as data_dir:
+        train, test, columns, labels, stride = _load_split(data_path, window, split, precision)
+        _write_split(train, test, columns, labels, stride, Path(data_dir))
+        del train, test
+
+        # 'spawn' avoids forking the polars thread pool
+        with ProcessPoolExecutor(max_workers=len(models), mp_context=multiprocessing.get_context("spawn")) as executor:
+            futures = [
+                executor.submit(
+                    _train_family,
+                    data_dir,
+                    data_path,
+                    output_dirs[model],
+                    model,
+                    window,
+                    split,
+                    save,
+                    precision,
+                    n_jobs[model],
+                )
+                for model in models
+            ]
+            for future in as_completed(futures):
+                logger.info(f"Completed training {future.result()}")
 
     end_time = time.time()
     elapsed_time = end_time - start_time
@@ -1,29 +1,188 @@
+import json
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Literal
 
 import joblib
+import matplotlib.pyplot as plt
 import numpy as np
 import polars as pl
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
 import typer
 from loguru import logger
-from sklearn import metrics
+from sklearn.base import BaseEstimator
 
-from lisa import evaluate
-from lisa.config import MODELS_DIR
+from lisa.config import MODELS_DIR, NON_LOCOMOTION_ACTIVITIES
+from lisa.features import read_feature_metadata
+from lisa.plots import confusion_matrix_plot
 
 app = typer.Typer()
 
 
+# Number of feature rows predicted at once by apply_model and apply_run
+BATCH_SIZE = 100_000
+
+# The targets of a run's models, predicted together by apply_run
+TARGETS = ["ACTIVITY", "SPEED", "INCLINE"]
+
+
+def _scan_batches(features_path: Path, columns: list[str], batch_size: int) -> Iterator[pl.DataFrame]:
+    """
+    Read the given columns of a features Parquet file (or partitioned dataset directory) in batches of rows,
+    so the full feature matrix is never held in memory.
+
+    Args:
+        features_path (Path): Path to the features.
+        columns (list[str]): The columns to read.
+        batch_size (int): The maximum number of rows in each batch.
+
+    Yields:
+        pl.DataFrame: Each batch of rows.
+    """
+    dataset = ds.dataset(features_path, format="parquet")
+    for batch in dataset.to_batches(columns=columns, batch_size=batch_size):
+        if batch.num_rows:
+            yield pl.from_arrow(batch)
+
+
+def _check_stride(features_path: Path, run_dir: Path) -> int:
+    """
+    Check the features were extracted with the same stride as the training data of a run, logging a warning if not.
+
+    Args:
+        features_path (Path): Path to the features.
+        run_dir (Path): The run directory, containing output.json.
+
+    Returns:
+        int: The stride of the features.
+    """
+    stride = read_feature_metadata(features_path)["stride"]
+    run_output_path = run_dir / "output.json"
+    if run_output_path.exists():
+        with run_output_path.open("r") as f:
+            train_stride = json.load(f)["params"].get("stride", 1)
+        if stride != train_stride:
+            logger.warning(
+                f"Features have a stride of {stride}, but the model was trained with a stride of {train_stride}"
+            )
+
+    return stride
+
+
+def _accumulate_activity(pair_counts: dict[tuple[str, str], int], y: pl.Series, y_pred: np.ndarray) -> None:
+    """
+    Add the counts of each (true, predicted) label pair in a batch to pair_counts.
+    Pairs are added in order of first appearance, so the true labels are too.
+    """
+    pairs = pl.DataFrame({"true": y, "pred": pl.Series(y_pred, dtype=y.dtype)}).group_by(
+        "true", "pred", maintain_order=True
+    )
+    for true, pred, count in pairs.len().iter_rows():
+        pair_counts[true, pred] = pair_counts.get((true, pred), 0) + count
+
+
+def _accumulate_regression(moments: np.ndarray, y: np.ndarray, y_pred: np.ndarray) -> None:
+    """
+    Merge the number of rows, mean and sum of squared deviations of the true values, and the sum of squared errors
+    of a batch into moments, with Chan et al.'s pairwise update so the variance is not lost to cancellation.
+    """
+    if len(y) == 0:
+        return
+
+    n, mean, m2, squared_error_sum = moments
+    batch_mean = y.mean()
+    delta = batch_mean - mean
+    total = n + len(y)
+    moments[:] = [
+        total,
+        mean + delta * len(y) / total,
+        m2 + ((y - batch_mean) ** 2).sum() + delta**2 * n * len(y) / total,
+        squared_error_sum + ((y - y_pred) ** 2).sum(),
+    ]
+
+
+def _activity_results(
+    pair_counts: dict[tuple[str, str], int], model: BaseEstimator, plot_path: Path
+) -> tuple[float, pl.DataFrame]:
+    """
+    The accuracy and confusion matrix from the accumulated label pair counts, saving the confusion matrix plot.
+    With no labels, the accuracy is NaN and no plot is saved.
+
+    Args:
+        pair_counts (dict[tuple[str, str], int]): The counts of each (true, predicted) label pair.
+        model (BaseEstimator): The activity model.
+        plot_path (Path): The path to save the confusion matrix plot.
+
+    Returns:
+        float: The accuracy.
+        pl.DataFrame: The confusion matrix, as from evaluate.confusion_matrix.
+    """
+    if not pair_counts:
+        logger.warning("There are no activity labels to score.")
+        return np.nan, pl.DataFrame()
+
+    labels = list(dict.fromkeys(true for true, _ in pair_counts))
+    counts = np.array([[pair_counts.get((true, pred), 0) for pred in labels] for true in labels])
+    score = sum(count for (true, pred), count in pair_counts.items() if true == pred) / sum(pair_counts.values())
+
+    # Normalise over the true labels, as evaluate.confusion_matrix; a label with no true rows has a row of zeros
+    true_counts = counts.sum(axis=1, keepdims=True)
+    cm = np.divide(counts, true_counts, out=np.zeros(counts.shape), where=true_counts > 0)
+    labels = pl.Series("ACTIVITY", labels)
+    cm_df = pl.DataFrame(cm, schema=[str(label) for label in labels]).with_columns(pl.Series("labels", labels))
+
+    fig = confusion_matrix_plot(cm, model, labels, None, None, score)
+    fig.savefig(plot_path)
+    plt.close(fig)
+
+    return score, cm_df
+
+
+def _regression_results(moments: np.ndarray) -> tuple[float, float]:
+    """
+    The r2 score (as scored by the regressors) and rmse from the accumulated moments.
+    Both are NaN when there are no rows, and the r2 score is NaN when the true values are all equal.
+    """
+    n, _, m2, squared_error_sum = moments
+    if n == 0:
+        logger.warning("There are no rows to score.")
+        return np.nan, np.nan
+    if m2 == 0:
+        logger.warning("The true values are all equal, so the r2 score is undefined.")
+        return np.nan, np.sqrt(squared_error_sum / n)
+
+    return 1 - squared_error_sum / m2, np.sqrt(squared_error_sum / n)
+
+
+def _save_results(results: dict[str, list]) -> None:
+    """
+    Append results to MODELS_DIR/validation/results.csv.
+    """
+    results_csv_path = MODELS_DIR / "validation" / "results.csv"
+    if results_csv_path.exists():
+        results_store = pl.read_csv(results_csv_path)
+        results_store = pl.concat([results_store, pl.DataFrame(results)], how="vertical_relaxed")
+    else:
+        logger.info(f"{results_csv_path} does not exist. Creating a new file.")
+        results_store = pl.DataFrame(results)
+
+    results_store.write_csv(results_csv_path)
+
+
 @app.command()
 def apply_model(
     features_path: Path,
     feature: Literal["ACTIVITY", "SPEED", "INCLINE"],
     model_path: Path,
     scaler_path: Path | None = None,
+    batch_size: int = BATCH_SIZE,
 ) -> None:
     """
     Load a pre-trained model and scaler from pkl files and apply them to a new dataset.
     Evaluation plots are saved in MODELS_DIR/validation, and scores are saved in MODELS_DIR/validation/results.csv.
+    The features are read in batches, projecting only the columns the model was trained on, and predicted once;
+    the scores are accumulated over the batches, so datasets larger than memory can be validated.
 
     Args:
         features_path (Path):The unseen processed dataset.
@@ -31,6 +190,7 @@ def apply_model(
         model_path (Path): Path to the pre-trained model.
         scaler_path (Path | None): Path to the pre-trained scaler; required for linear/logistic regression.
             Defaults to None.
+        batch_size (int): The number of rows predicted at once. Defaults to BATCH_SIZE.
 
     Returns:
         None
@@ -42,62 +202,192 @@ def apply_model(
         logger.info(f"Loading scaler from {scaler_path}")
         scaler = joblib.load(scaler_path)
 
-    # Load the dataset
-    logger.info(f"Loading features from {features_path}")
-    features = pl.read_parquet(features_path)
+    stride = _check_stride(features_path, model_path.parent)
 
-    X = features.select(pl.exclude(["ACTIVITY", "TRIAL", "TIME", "INCLINE", "SPEED"]))
-    y = features.select(feature)
+    logger.info(f"Performing predictions on {features_path} (stride {stride}), in batches of {batch_size} rows")
 
-    X = X.select(column_names)
+    # Scores accumulated over the batches
+    pair_counts, moments = {}, np.zeros(4)
 
-    if feature in ["SPEED", "INCLINE"]:
-        # Filter out the rows with null values (non-locomotion)
-        train_non_null_mask = y.to_series(0).is_not_null()
-        X = X.filter(train_non_null_mask)
-        y = y.filter(train_non_null_mask)
+    for batch in _scan_batches(features_path, [*column_names, feature], batch_size):
+        if feature in ["SPEED", "INCLINE"]:
+            # Filter out the rows with null values (non-locomotion)
+            batch = batch.filter(pl.col(feature).is_not_null())
+            if batch.is_empty():
+                continue
 
-    if scaler_path:
-        # Apply the scaler to the dataset
-        logger.info("Scaling the features")
-        X = scaler.transform(X)
+        X = batch.select(column_names)
+        y = batch[feature]
 
-    logger.info("Performing predictions")
+        if scaler_path:
+            # Apply the scaler to the batch
+            X = scaler.transform(X)
+
+        y_pred = model.predict(X)
+
+        if feature == "ACTIVITY":
+            _accumulate_activity(pair_counts, y, y_pred)
+        else:
+            _accumulate_regression(moments, y.cast(pl.Float64).to_numpy(), y_pred)
 
     # Save the results
     RESULTS_DIR = MODELS_DIR / "validation"
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
     results = {
         "val_data": [features_path.stem],
         "run_id": [model_path.parent.name],
         "feature": [feature],
-        "score": [model.score(X, y)],
     }
 
-    logger.info("Score: " + str(model.score(X, y)))
-
     if feature == "ACTIVITY":
-        labels = y["ACTIVITY"].unique(maintain_order=True)
         cm_plot_path = RESULTS_DIR / f"{model_path.parent.name}_cm.png"
-        cm = evaluate.confusion_matrix(model, labels, X, y, cm_plot_path)
+        score, cm = _activity_results(pair_counts, model, cm_plot_path)
         logger.info("Confusion Matrix:\n" + str(cm))
 
-        results["plot_path"] = str(cm_plot_path.stem)
-        results["rmse"] = None
+        results["score"] = [score]
+        results["plot_path"] = [str(cm_plot_path.stem) if pair_counts else None]
+        results["rmse"] = [None]
     else:
-        results["plot_path"] = None
-        results["rmse"] = np.sqrt(metrics.mean_squared_error(y, model.predict(X)))
+        score, rmse = _regression_results(moments)
+        results["score"] = [score]
+        results["plot_path"] = [None]
+        results["rmse"] = [rmse]
 
-    results_csv_path = RESULTS_DIR / "results.csv"
-    if results_csv_path.exists():
-        results_store = pl.read_csv(results_csv_path)
-        results_store = results_store.vstack(pl.DataFrame(results))
-    else:
-        logger.info(f"{results_csv_path} does not exist. Creating a new file.")
-        results_store = pl.DataFrame(results)
+    logger.info("Score: " + str(score))
 
-    results_store.write_csv(results_csv_path)
+    _save_results(results)
+    logger.success("Inference complete.")
+
+
+@app.command()
+def apply_run(
+    run_dir: Path,
+    features_path: Path,
+    gate_on_activity: bool = False,
+    batch_size: int = BATCH_SIZE,
+    predictions_path: Path | None = None,
+) -> pl.DataFrame:
+    """
+    Apply the activity, speed and incline models of a trained run to a new dataset in a single pass.
+    The models (activity.pkl, speed.pkl, incline.pkl) and scaler.pkl, if any, are loaded from the run directory,
+    and each batch of features is read and scaled once, then predicted by all three models.
+    Scores are appended to MODELS_DIR/validation/results.csv, and the confusion matrix plot saved alongside,
+    as by apply_model.
+
+    With gate_on_activity, the regressors only predict rows whose predicted activity is locomotion, as they would
+    when deployed; SPEED and INCLINE are then scored on the locomotion rows that pass the gate, and the fraction
+    of locomotion rows that do is logged as their coverage.
+
+    Args:
+        run_dir (Path): The run directory, i.e. MODELS_DIR/run_name, with the models saved by multipredictor.
+        features_path (Path): The unseen processed dataset.
+        gate_on_activity (bool): Only predict speed and incline where locomotion is predicted. Defaults to False.
+        batch_size (int): The number of rows predicted at once. Defaults to BATCH_SIZE.
+        predictions_path (Path | None): Parquet file to write the predictions of every row to, with the row's
+            identifiers. Defaults to None (not written).
+
+    Returns:
+        pl.DataFrame: The results appended to results.csv.
+    """
+    # Load the models and scaler
+    logger.info(f"Loading models from {run_dir}")
+    models, column_names = {}, None
+    for target in TARGETS:
+        models[target], target_columns = joblib.load(run_dir / f"{target.lower()}.pkl")
+        if column_names is not None and list(target_columns) != list(column_names):
+            raise ValueError(f"The {target.lower()} model was trained on different features to the activity model.")
+        column_names = list(target_columns)
+
+    scaler = None
+    if (run_dir / "scaler.pkl").exists():
+        logger.info("Loading scaler")
+        scaler = joblib.load(run_dir / "scaler.pkl")
+
+    stride = _check_stride(features_path, run_dir)
+
+    schema_names = ds.dataset(features_path, format="parquet").schema.names
+    identifiers = [col for col in ["PARTICIPANT", "TRIAL", "TIME"] if col in schema_names]
+
+    logger.info(f"Performing predictions on {features_path} (stride {stride}), in batches of {batch_size} rows")
+
+    # Scores accumulated over the batches, and the number of locomotion rows for the coverage of the gate
+    pair_counts = {}
+    moments = {target: np.zeros(4) for target in ["SPEED", "INCLINE"]}
+    locomotion_rows = {target: 0 for target in ["SPEED", "INCLINE"]}
+    writer = None
+
+    for batch in _scan_batches(features_path, [*column_names, *TARGETS, *identifiers], batch_size):
+        X = batch.select(column_names)
+        if scaler is not None:
+            X = scaler.transform(X)
+
+        predictions = {"ACTIVITY": models["ACTIVITY"].predict(X)}
+        _accumulate_activity(pair_counts, batch["ACTIVITY"], predictions["ACTIVITY"])
+
+        gate = np.ones(batch.height, dtype=bool)
+        if gate_on_activity:
+            gate = ~np.isin(predictions["ACTIVITY"], NON_LOCOMOTION_ACTIVITIES)
+        X_gated = X[gate] if isinstance(X, np.ndarray) else X.filter(pl.Series(gate))
+
+        for target in ["SPEED", "INCLINE"]:
+            predictions[target] = np.full(batch.height, np.nan)
+            if gate.any():
+                predictions[target][gate] = models[target].predict(X_gated)
+
+            y = batch[target].cast(pl.Float64).to_numpy()
+            locomotion = ~np.isnan(y)
+            locomotion_rows[target] += locomotion.sum()
+            _accumulate_regression(moments[target], y[locomotion & gate], predictions[target][locomotion & gate])
+
+        if predictions_path is not None:
+            arrow_table = (
+                batch.select(identifiers)
+                .with_columns(pl.Series(f"{target}_PRED", predictions[target], nan_to_null=True) for target in TARGETS)
+                .to_arrow()
+            )
+            if writer is None:
+                writer = pq.ParquetWriter(predictions_path, arrow_table.schema)
+            writer.write_table(arrow_table)
+
+    if writer is not None:
+        writer.close()
+        logger.info(f"Predictions saved to {predictions_path}")
+
+    # Save the results
+    RESULTS_DIR = MODELS_DIR / "validation"
+    RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+
+    cm_plot_path = RESULTS_DIR / f"{run_dir.name}_cm.png"
+    activity_score, cm = _activity_results(pair_counts, models["ACTIVITY"], cm_plot_path)
+    logger.info("Confusion Matrix:\n" + str(cm))
+
+    results = {
+        "val_data": [features_path.stem] * 3,
+        "run_id": [run_dir.name] * 3,
+        "feature": TARGETS,
+        "score": [activity_score],
+        "plot_path": [str(cm_plot_path.stem) if pair_counts else None, None, None],
+        "rmse": [None],
+    }
+    for target in ["SPEED", "INCLINE"]:
+        score, rmse = _regression_results(moments[target])
+        results["score"].append(score)
+        results["rmse"].append(rmse)
+        if gate_on_activity:
+            if locomotion_rows[target]:
+                coverage = moments[target][0] / locomotion_rows[target]
+                logger.info(f"{target} coverage: {coverage:.3f} of locomotion rows")
+            else:
+                logger.warning(f"There are no locomotion rows for the {target} coverage.")
+
+    results = pl.DataFrame(results, schema_overrides={"rmse": pl.Float64})
+    logger.info(f"Scores:\n{results}")
+
+    _save_results(results.to_dict(as_series=False))
     logger.success("Inference complete.")
 
+    return results
+
 
 if __name__ == "__main__":
-    apply_model()
+    app()
@@ -0,0 +1,304 @@
+import json
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import polars as pl
+from ezc3d import c3d
+from loguru import logger
+
+from lisa.config import NON_LOCOMOTION_ACTIVITIES
+from lisa.dataset import process_c3d
+from lisa.windowing import WINDOW_STATS, available_statistics
+
+# Percentiles of the prediction latency reported by replay_c3d
+LATENCY_PERCENTILES = [50, 90, 99]
+
+
+class StreamingPredictor:
+    """
+    Online inference over streams of raw IMU samples, with the activity, speed and incline models of a trained run.
+
+    Samples are pushed as they arrive, with the channel labels of process_c3d (i.e. 'accel_thigh_l.z'), into a ring
+    buffer of one window. The window sums behind the mean, standard deviation and RMS are updated incrementally as
+    samples arrive and leave the window, and re-computed from the buffer once per window to bound rounding drift.
+    The remaining statistics (i.e. min and max) are computed from the buffer when a prediction is due.
+    Once the buffer is full, a prediction is emitted every 'hop' samples, from the same features as the offline
+    sliding window: the prediction at sample i uses the window ending at sample i.
+
+    Args:
+        run_dir (Path): The run directory, with the models saved by multipredictor and its output.json.
+        hop (int): Number of samples between predictions. Default 100.
+        window (int | None): The window size in samples. Default None (the window recorded in output.json).
+        sample_rate (float): The sample rate of the stream in Hz, used by the spectral statistics. Default 1000.
+        gate_on_activity (bool): Only predict speed and incline when locomotion is predicted, returning None
+            otherwise. Default True.
+    """
+
+    def __init__(
+        self,
+        run_dir: Path,
+        hop: int = 100,
+        window: int | None = None,
+        sample_rate: float = 1000.0,
+        gate_on_activity: bool = True,
+    ):
+        run_dir = Path(run_dir)
+        if window is None:
+            with (run_dir / "output.json").open("r") as f:
+                window = json.load(f)["params"]["window"]
+
+        # Load the models and scaler; single predictions are too small to be worth parallelising
+        self.models = {}
+        for target in ["activity", "speed", "incline"]:
+            self.models[target], self.feature_names = joblib.load(run_dir / f"{target}.pkl")
+            if "n_jobs" in self.models[target].get_params():
+                self.models[target].set_params(n_jobs=1)
+        self.feature_names = list(self.feature_names)
+        self.scaler = joblib.load(run_dir / "scaler.pkl") if (run_dir / "scaler.pkl").exists() else None
+
+        # Parse the statistic and channel of each feature, i.e. 'max_accel_thigh_l.z'
+        stat_channels = [name.split("_", 1) for name in self.feature_names]
+        self.stats = list(dict.fromkeys(stat for stat, _ in stat_channels))
+        unknown_stats = set(self.stats).difference(available_statistics())
+        if unknown_stats:
+            raise ValueError(f"Unknown statistics in the model features: {unknown_stats}.")
+        self.channels = list(dict.fromkeys(channel for _, channel in stat_channels))
+        self._feature_index = [(stat, self.channels.index(channel)) for stat, channel in stat_channels]
+
+        self.window = window
+        self.hop = hop
+        self.sample_rate = sample_rate
+        self.gate_on_activity = gate_on_activity
+        self.reset()
+
+    def reset(self) -> None:
+        """
+        Clear the buffer, to start a new stream.
+        """
+        # Empty slots are NaN, so they count as missing values in the window statistics
+        self._buffer = np.full((self.window, len(self.channels)), np.nan)
+        self._position = 0
+        self.n_samples = 0
+
+        # Sums of the valid samples in the window, centred on 'shift', and their count
+        self._shift = np.zeros(len(self.channels))
+        self._sum = np.zeros(len(self.channels))
+        self._squares = np.zeros(len(self.channels))
+        self._count = np.zeros(len(self.channels))
+        self._since_recompute = 0
+
+    def push(self, samples: pl.DataFrame | np.ndarray) -> list[dict[str, any]]:
+        """
+        Add samples to the stream, and return the predictions that became due.
+
+        Args:
+            samples (pl.DataFrame | np.ndarray): The new samples, in order. A DataFrame must have a column for each
+                channel in 'channels'; an array must have shape (samples, channels), in the order of 'channels'.
+
+        Returns:
+            list[dict[str, any]]: For each prediction, the number of samples seen ('sample'), the predicted
+                'activity', 'speed' and 'incline', and the 'latency' in seconds from receiving the samples.
+        """
+        received = time.perf_counter()
+
+        if isinstance(samples, pl.DataFrame):
+            missing = set(self.channels).difference(samples.columns)
+            if missing:
+                raise ValueError(f"The samples have no {missing} channels, which the models require.")
+            samples = samples.select(self.channels).to_numpy()
+        samples = np.asarray(samples, dtype=np.float64)
+
+        predictions = []
+        start = 0
+        while start < len(samples):
+            # Add samples up to the next prediction, or at most one window at a time
+            if self.n_samples < self.window:
+                next_prediction = self.window
+            else:
+                next_prediction = self.n_samples + self.hop - (self.n_samples - self.window) % self.hop
+            end = start + min(len(samples) - start, next_prediction - self.n_samples, self.window)
+            self._add(samples[start:end])
+            start = end
+
+            if self.n_samples >= self.window and (self.n_samples - self.window) % self.hop == 0:
+                prediction = self._predict()
+                prediction["latency"] = time.perf_counter() - received
+                predictions.append(prediction)
+
+        return predictions
+
+    def _add(self, samples: np.ndarray) -> None:
+        """
+        Write at most one window of samples to the ring buffer, updating the window sums for the samples
+        that arrive and those they replace.
+        """
+        indices = (self._position + np.arange(len(samples))) % self.window
+        for values, sign in [(self._buffer[indices], -1), (samples, 1)]:
+            centred = np.nan_to_num(values - self._shift)
+            self._sum += sign * centred.sum(axis=0)
+            self._squares += sign * (centred**2).sum(axis=0)
+            self._count += sign * (~np.isnan(values)).sum(axis=0)
+
+        self._buffer[indices] = samples
+        self._position = (self._position + len(samples)) % self.window
+        self.n_samples += len(samples)
+        self._since_recompute += len(samples)
+
+    def _recompute(self) -> None:
+        """
+        Re-compute the window sums from the buffer, centred on the current window mean.
+        """
+        with np.errstate(invalid="ignore"):
+            self._shift = np.nan_to_num(np.nanmean(self._buffer, axis=0))
+        centred = np.nan_to_num(self._buffer - self._shift)
+        self._sum = centred.sum(axis=0)
+        self._squares = (centred**2).sum(axis=0)
+        self._count = (~np.isnan(self._buffer)).sum(axis=0).astype(float)
+        self._since_recompute = 0
+
+    def features(self) -> pl.DataFrame:
+        """
+        The features of the current window, as extracted offline by features.sliding_window.
+
+        Returns:
+            pl.DataFrame: A single row, with a column for each of the models' features.
+        """
+        if self._since_recompute >= self.window:
+            self._recompute()
+
+        results = {}
+        count = self._count
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = self._sum / count
+            if "mean" in self.stats:
+                results["mean"] = mean + self._shift
+            if "std" in self.stats:
+                variance = (self._squares - self._sum * mean) / (count - 1)
+                results["std"] = np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+            if "rms" in self.stats:
+                mean_square = (self._squares + 2 * self._shift * self._sum) / count + self._shift**2
+                results["rms"] = np.sqrt(np.maximum(mean_square, 0.0))
+
+        if "max" in self.stats or "range" in self.stats:
+            results["max"] = np.fmax.reduce(self._buffer, axis=0)
+        if "min" in self.stats or "range" in self.stats:
+            results["min"] = np.fmin.reduce(self._buffer, axis=0)
+        if "range" in self.stats:
+            results["range"] = results["max"] - results["min"]
+
+        # The buffer in order, oldest sample first
+        ordered = np.roll(self._buffer, -self._position, axis=0)
+        if "first" in self.stats:
+            results["first"] = ordered[0]
+        if "last" in self.stats:
+            results["last"] = ordered[-1]
+        # One batch of a single window, shared by the registered statistics so they can share its spectrum
+        windows = ordered.T[np.newaxis]
+        for stat in self.stats:
+            if stat in WINDOW_STATS:
+                results[stat] = WINDOW_STATS[stat](windows, self.sample_rate)[0]
+
+        row = [[results[stat][index] for stat, index in self._feature_index]]
+        return pl.DataFrame(row, schema=self.feature_names, orient="row")
+
+    def _predict(self) -> dict[str, any]:
+        """
+        Predict the activity, speed and incline from the current window.
+        """
+        X = self.features()
+        if self.scaler is not None:
+            X = self.scaler.transform(X)
+
+        activity = self.models["activity"].predict(X)[0]
+        prediction = {"sample": self.n_samples, "activity": activity, "speed": None, "incline": None}
+        if not (self.gate_on_activity and activity in NON_LOCOMOTION_ACTIVITIES):
+            prediction["speed"] = float(self.models["speed"].predict(X)[0])
+            prediction["incline"] = float(self.models["incline"].predict(X)[0])
+
+        return prediction
+
+
+def latency_percentiles(latencies: list[float], percentiles: list[int] = LATENCY_PERCENTILES) -> dict[str, float]:
+    """
+    Percentiles of the prediction latency, in milliseconds.
+
+    Args:
+        latencies (list[float]): The latency of each prediction, in seconds.
+        percentiles (list[int]): The percentiles to report. Default LATENCY_PERCENTILES.
+
+    Returns:
+        dict[str, float]: Each percentile, i.e. {'p50': 1.2, ...}.
+    """
+    values = np.percentile(np.asarray(latencies) * 1000, percentiles) if latencies else [np.nan] * len(percentiles)
+    return {f"p{percentile}": float(value) for percentile, value in zip(percentiles, values, strict=True)}
+
+
+def replay_c3d(
+    c3d_path: Path,
+    run_dir: Path,
+    hop: int = 100,
+    speed_factor: float | None = 1.0,
+    chunk_size: int = 10,
+    missing_location_label: str | None = None,
+) -> tuple[pl.DataFrame, dict[str, float]]:
+    """
+    Replay a c3d file through a StreamingPredictor, as if its samples were arriving from the sensors, and
+    report the latency of the predictions.
+
+    Args:
+        c3d_path (Path): Path to the c3d file, i.e. from dataset.create_synthetic_c3d_file.
+        run_dir (Path): The run directory, with the models saved by multipredictor and its output.json.
+        hop (int): Number of samples between predictions. Default 100.
+        speed_factor (float | None): Replay speed relative to real time, i.e. 10 for ten times faster than the
+            samples were recorded. Default 1 (real time). None replays as fast as possible.
+        chunk_size (int): Number of samples that arrive at once. Default 10.
+        missing_location_label (str | None): Body location label to use for any unlabelled data, as for
+            dataset.process_c3d. Default None.
+
+    Returns:
+        pl.DataFrame: The predictions, with their latency in seconds.
+        dict[str, float]: The latency percentiles, in milliseconds.
+    """
+    c3d_path = Path(c3d_path)
+    c3d_contents = c3d(str(c3d_path))
+    sample_rate = float(c3d_contents["parameters"]["ANALOG"]["RATE"]["value"][0])
+
+    # Label the channels as process_c3d does for offline processing
+    samples = process_c3d(c3d_contents, c3d_path.name, ["walk", "jog", "run", "jump"], 0, missing_location_label)
+    if samples is None:
+        raise ValueError(f"{c3d_path.name} has no analog data.")
+
+    predictor = StreamingPredictor(run_dir, hop, sample_rate=sample_rate)
+    missing = set(predictor.channels).difference(samples.columns)
+    if missing:
+        raise ValueError(f"{c3d_path.name} has no {missing} channels, which the models require.")
+    samples = samples.select(predictor.channels).to_numpy()
+
+    logger.info(f"Replaying {len(samples)} samples from {c3d_path.name} at {speed_factor or 'maximum'} speed")
+
+    predictions = []
+    start_time = time.perf_counter()
+    for start in range(0, len(samples), chunk_size):
+        if speed_factor is not None:
+            # Wait until the last sample of the chunk would have been recorded
+            arrival = (start + chunk_size) / sample_rate / speed_factor
+            time.sleep(max(0.0, arrival - (time.perf_counter() - start_time)))
+        predictions.extend(predictor.push(samples[start : start + chunk_size]))
+
+    predictions = pl.DataFrame(
+        predictions,
+        schema={
+            "sample": pl.Int64,
+            "activity": pl.String,
+            "speed": pl.Float64,
+            "incline": pl.Float64,
+            "latency": pl.Float64,
+        },
+        orient="row",
+    )
+    percentiles = latency_percentiles(predictions["latency"].to_list())
+    logger.info(f"{predictions.height} predictions; latency (ms): {percentiles}")
+
+    return predictions, percentiles
@@ -0,0 +1,369 @@
+import inspect
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import tempfile
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Literal
+
+import lightgbm as lgb
+import numpy as np
+import polars as pl
+from loguru import logger
+from sklearn import metrics
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, LogisticRegression
+
+from lisa.config import MODELS_DIR, NON_FEATURE_COLUMNS, PROJ_ROOT
+from lisa.dataset import FLOAT_DTYPES
+from lisa.features import standard_scaler
+from lisa.modeling.multipredictor import (
+    _load_split,
+    _log_parameters,
+    _read_split,
+    _write_split,
+    classifier,
+    regressor,
+)
+
+# Number of values each range in the search space is expanded to, for grid search
+GRID_POINTS = 3
+
+# The estimators fitted for each target, whose parameters a candidate may set
+ESTIMATORS = {
+    "LR": {"activity": LogisticRegression, "speed": LinearRegression, "incline": LinearRegression},
+    "RF": {"activity": RandomForestClassifier, "speed": RandomForestRegressor, "incline": RandomForestRegressor},
+    "LGBM": {"activity": lgb.LGBMClassifier, "speed": lgb.LGBMRegressor, "incline": lgb.LGBMRegressor},
+}
+
+# The score each target's candidates are ranked by; higher is better
+RANKING_SCORES = {"activity": "activity_weighted", "speed": "speed_r2", "incline": "incline_r2"}
+
+# Name of the file recording every evaluation, from which an interrupted search is resumed
+STATE_FILENAME = "search.jsonl"
+
+# The split loaded by each worker process, from _init_worker
+_worker_split = None
+
+
+def grid_candidates(space: dict[str, any]) -> list[dict[str, any]]:
+    """
+    Every combination of the values in a search space.
+    Lists are taken as the values to try, and ranges ({'low', 'high', 'log'}) are expanded to GRID_POINTS values,
+    evenly spaced (or log-spaced).
+
+    Args:
+        space (dict[str, any]): The search space, mapping each hyperparameter to a list of values or a range.
+
+    Returns:
+        list[dict[str, any]]: The candidate hyperparameters.
+    """
+    values = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            values[name] = spec
+        else:
+            points = (np.geomspace if spec.get("log") else np.linspace)(spec["low"], spec["high"], GRID_POINTS)
+            values[name] = _cast(points, spec)
+
+    return [dict(zip(values, combination, strict=True)) for combination in itertools.product(*values.values())]
+
+
+def random_candidates(space: dict[str, any], n_candidates: int, seed: int = 42) -> list[dict[str, any]]:
+    """
+    Candidates sampled at random from a search space.
+    Lists are sampled uniformly, and ranges ({'low', 'high', 'log'}) uniformly or log-uniformly.
+
+    Args:
+        space (dict[str, any]): The search space, mapping each hyperparameter to a list of values or a range.
+        n_candidates (int): The number of candidates.
+        seed (int): The random seed. Default 42.
+
+    Returns:
+        list[dict[str, any]]: The candidate hyperparameters.
+    """
+    rng = np.random.default_rng(seed)
+
+    values = {}
+    for name, spec in space.items():
+        if isinstance(spec, list):
+            values[name] = [spec[index] for index in rng.integers(len(spec), size=n_candidates)]
+        elif spec.get("log"):
+            values[name] = _cast(np.exp(rng.uniform(np.log(spec["low"]), np.log(spec["high"]), n_candidates)), spec)
+        else:
+            values[name] = _cast(rng.uniform(spec["low"], spec["high"], n_candidates), spec)
+
+    return [{name: values[name][index] for name in values} for index in range(n_candidates)]
+
+
+def _cast(points: np.ndarray, spec: dict[str, any]) -> list:
+    """
+    Convert sampled values to Python numbers, rounded to integers if both bounds of the range are integers.
+    """
+    if isinstance(spec["low"], int) and isinstance(spec["high"], int):
+        return [int(round(point)) for point in points]
+    return [float(point) for point in points]
+
+
+def halving_schedule(n_candidates: int, eta: int = 3) -> list[tuple[int, float]]:
+    """
+    The rungs of successive halving: at each rung, the surviving candidates are evaluated on a fraction of the
+    training rows, and the best 1/eta of them continue to the next, with eta times as many rows.
+    The last rung uses all the training rows.
+
+    Args:
+        n_candidates (int): The number of candidates at the first rung.
+        eta (int): The reduction factor. Default 3.
+
+    Returns:
+        list[tuple[int, float]]: The number of candidates and fraction of training rows of each rung.
+    """
+    n_rungs = 1 + int(math.log(n_candidates, eta) + 1e-9)
+    return [(math.ceil(n_candidates / eta**rung), float(eta ** (rung - n_rungs + 1))) for rung in range(n_rungs)]
+
+
+def _target_space(model: Literal["LR", "RF", "LGBM"], target: str, space: dict[str, any]) -> dict[str, any]:
+    """
+    The part of a family's search space that applies to a target's estimator, i.e. 'C' only applies to the
+    activity model of 'LR'. Estimators that accept arbitrary keyword arguments, as LightGBM's do, take all of it.
+    """
+    parameters = inspect.signature(ESTIMATORS[model][target]).parameters.values()
+    if any(parameter.kind == inspect.Parameter.VAR_KEYWORD for parameter in parameters):
+        return space
+    names = {parameter.name for parameter in parameters}
+    return {name: spec for name, spec in space.items() if name in names}
+
+
+def _init_worker(data_dir: str) -> None:
+    """
+    Load the split written by _write_split once per worker process, for all the evaluations it runs.
+    """
+    global _worker_split
+    _worker_split = _read_split(Path(data_dir))
+
+
+def _evaluate(
+    model: Literal["LR", "RF", "LGBM"],
+    target: Literal["activity", "speed", "incline"],
+    params: dict[str, any],
+    resource: float,
+    seed: int,
+) -> dict[str, any]:
+    """
+    Train one candidate on a fraction of the training rows, and score it on the test set.
+
+    Args:
+        model (Literal["LR", "RF", "LGBM"]): Short name of the model 'family' to use.
+        target (Literal["activity", "speed", "incline"]): The target to predict.
+        params (dict[str, any]): The hyperparameters of the candidate, including n_jobs.
+        resource (float): The fraction of the training rows to train on.
+        seed (int): The random seed for choosing the training rows; the same rows are used for every candidate.
+
+    Returns:
+        dict[str, any]: The scores, named as in the multipredictor output.
+    """
+    train, test, *_ = _worker_split
+
+    if resource < 1:
+        rng = np.random.default_rng(seed)
+        train = train[np.sort(rng.choice(train.height, size=max(1, round(resource * train.height)), replace=False))]
+
+    X_train, X_test = train.drop(NON_FEATURE_COLUMNS, strict=False), test.drop(NON_FEATURE_COLUMNS, strict=False)
+    column = target.upper()
+
+    if target == "activity":
+        activity_model = classifier(model, X_train, train[column], params)
+        y_pred = activity_model.predict(X_test)
+        return {
+            "activity": metrics.accuracy_score(test[column], y_pred),
+            "activity_weighted": metrics.f1_score(test[column], y_pred, average="weighted"),
+        }
+
+    y_test_filtered, y_pred, _ = regressor(model, X_train, X_test, train.select(column), test.select(column), params)
+    return {
+        f"{target}_r2": metrics.r2_score(y_test_filtered, y_pred),
+        f"{target}_rmse": float(np.sqrt(metrics.mean_squared_error(y_test_filtered, y_pred))),
+    }
+
+
+def _map_evaluations(tasks: list[tuple], data_dir: str, n_workers: int) -> Iterator[tuple[tuple, dict[str, any]]]:
+    """
+    Run _evaluate for each task, yielding each task with its scores as it completes.
+    With more than one worker, tasks are run concurrently in a process pool.
+
+    Args:
+        tasks (list[tuple]): The arguments of _evaluate for each task.
+        data_dir (str): Directory containing the split.
+        n_workers (int): Number of worker processes.
+
+    Yields:
+        tuple[tuple, dict[str, any]]: The task and its scores.
+    """
+    if n_workers > 1:
+        # 'spawn' avoids forking the polars thread pool
+        with ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(data_dir,),
+        ) as executor:
+            futures = {executor.submit(_evaluate, *task): task for task in tasks}
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+    else:
+        _init_worker(data_dir)
+        for task in tasks:
+            yield task, _evaluate(*task)
+
+
+def _task_key(target: str, params: dict[str, any], resource: float) -> str:
+    """
+    Identifies an evaluation in the search state, independent of the order of the hyperparameters.
+    """
+    return json.dumps([target, params, resource], sort_keys=True)
+
+
+def search(
+    data_path: Path,
+    run_name: str,
+    model: Literal["LR", "RF", "LGBM"],
+    method: Literal["grid", "random", "halving"] = "random",
+    n_candidates: int = 20,
+    eta: int = 3,
+    window: int = 800,
+    split: float = 0.8,
+    precision: Literal["float32", "float64"] = "float64",
+    n_workers: int = 1,
+    seed: int = 42,
+) -> pl.DataFrame:
+    """
+    Search the hyperparameters of the activity, speed and incline models, over the family's search space in the
+    'search' entry of hyperparameters.json. Candidates override the family's fixed hyperparameters, and are
+    evaluated on the same sequential train-test split as multipredictor, in parallel worker processes.
+    Successive halving ('halving') evaluates random candidates on increasing fractions of the training rows,
+    terminating the poorer candidates early.
+
+    Every evaluation is appended to MODELS_DIR/run_name/search.jsonl as it completes; re-running an interrupted
+    search with the same arguments resumes it, skipping the evaluations already recorded.
+    The scores and hyperparameters of the best candidate for each target are saved to output.json, in the same
+    structure as multipredictor, with the activity model ranked by weighted F1 and the regressors by r2.
+
+    Args:
+        data_path (Path): Path to the data parquet file, or to a partitioned dataset directory.
+        run_name (str): Name of the run.
+        model (Literal["LR", "RF", "LGBM"]): Short name of the model 'family' to use.
+        method (Literal["grid", "random", "halving"]): The search method. Default 'random'.
+        n_candidates (int): Number of candidates for random search and successive halving. Default 20.
+        eta (int): Reduction factor of successive halving. Default 3.
+        window (int): Size of the sliding window. Default 800.
+        split (float): Train-test split. Default 0.8.
+        precision (Literal["float32", "float64"]): Floating point precision of the features. Default 'float64'.
+        n_workers (int): Number of evaluations run concurrently, in separate processes. The CPUs are divided
+            between the workers. Default 1 (serial).
+        seed (int): The random seed for sampling candidates and training rows. Default 42.
+
+    Returns:
+        pl.DataFrame: The scores of every evaluation.
+    """
+    hyperparams_path = Path(PROJ_ROOT / "lisa" / "modeling" / "hyperparameters.json")
+    with hyperparams_path.open("r") as f:
+        hyperparameters = json.load(f)
+    if model not in hyperparameters.get("search", {}):
+        raise ValueError(f"hyperparameters.json has no search space for {model}.")
+    space = hyperparameters["search"][model]
+
+    # Create output directory, and load the evaluations of any previous, interrupted search
+    output_dir = MODELS_DIR / run_name
+    output_dir.mkdir(parents=True, exist_ok=True)
+    state_path = output_dir / STATE_FILENAME
+    state = {}
+    if state_path.exists():
+        with state_path.open("r") as f:
+            for line in f:
+                record = json.loads(line)
+                state[_task_key(record["target"], record["params"], record["resource"])] = record
+        logger.info(f"Resuming search with {len(state)} evaluations from {state_path}")
+
+    # The candidates of each target
+    candidates = {}
+    for target in RANKING_SCORES:
+        target_space = _target_space(model, target, space)
+        if method == "grid":
+            target_candidates = grid_candidates(target_space)
+        else:
+            target_candidates = random_candidates(target_space, n_candidates, seed)
+        # Merge duplicates, i.e. when the target's space is empty
+        unique = {json.dumps(candidate, sort_keys=True): candidate for candidate in target_candidates}
+        candidates[target] = [{**hyperparameters[model], **candidate} for candidate in unique.values()]
+
+    n_jobs = max(1, (os.cpu_count() or 1) // n_workers)
+
+    with tempfile.TemporaryDirectory(prefix="lisa_search_") as data_dir:
+        # Load, split and (for LR) scale the data once for all evaluations
+        train, test, columns, labels, stride = _load_split(data_path, window, split, precision)
+        if model == "LR":
+            X_train, X_test, _ = standard_scaler(
+                train.drop(NON_FEATURE_COLUMNS, strict=False),
+                test.drop(NON_FEATURE_COLUMNS, strict=False),
+                FLOAT_DTYPES[precision],
+            )
+            train = X_train.hstack(train.select("ACTIVITY", "SPEED", "INCLINE"))
+            test = X_test.hstack(test.select("ACTIVITY", "SPEED", "INCLINE"))
+        _write_split(train, test, columns, labels, stride, Path(data_dir))
+        del train, test
+
+        schedule = halving_schedule(n_candidates, eta) if method == "halving" else [(None, 1.0)]
+        with state_path.open("a") as state_file:
+            for rung, (_, resource) in enumerate(schedule):
+                tasks = [
+                    (model, target, {**params, "n_jobs": n_jobs}, resource, seed)
+                    for target, target_candidates in candidates.items()
+                    for params in target_candidates
+                    if _task_key(target, params, resource) not in state
+                ]
+                logger.info(f"Rung {rung}: {len(tasks)} evaluations on {resource:.3g} of the training rows")
+
+                for (_, target, params, _, _), scores in _map_evaluations(tasks, data_dir, n_workers):
+                    params = {name: value for name, value in params.items() if name != "n_jobs"}
+                    record = {"target": target, "params": params, "resource": resource, "scores": scores}
+                    state[_task_key(target, params, resource)] = record
+                    state_file.write(json.dumps(record) + "\n")
+                    state_file.flush()
+
+                # Keep the best 1/eta of each target's candidates for the next rung
+                if rung < len(schedule) - 1:
+                    n_keep = schedule[rung + 1][0]
+                    for target, target_candidates in candidates.items():
+                        ranked = sorted(
+                            target_candidates,
+                            key=lambda params: state[_task_key(target, params, resource)]["scores"][
+                                RANKING_SCORES[target]
+                            ],
+                            reverse=True,
+                        )
+                        candidates[target] = ranked[:n_keep]
+
+    # The best candidate of each target, from the evaluations on all the training rows
+    output = _log_parameters(columns, {}, window, split, stride, precision)
+    output["params"]["hyperparams"] = {}
+    for target, target_candidates in candidates.items():
+        records = [state[_task_key(target, params, 1.0)] for params in target_candidates]
+        best = max(records, key=lambda record: record["scores"][RANKING_SCORES[target]])
+        output["score"].update(best["scores"])
+        output["params"]["hyperparams"][target] = best["params"]
+    output["params"]["search"] = {"method": method, "n_candidates": n_candidates, "eta": eta, "seed": seed}
+
+    with (output_dir / "output.json").open("w") as f:
+        json.dump(output, f, indent=4)
+
+    logger.success(f"Best scores: {output['score']}")
+    logger.info(f"Search results saved to: {output_dir}")
+
+    return pl.DataFrame(
+        [{"target": record["target"], "resource": record["resource"], **record["scores"]} for record in state.values()],
+        infer_schema_length=None,
+    )
@@ -0,0 +1,39 @@
+import multiprocessing
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def ordered_map(func: Callable, *iterables: Iterable, n_workers: int = 1, processes: bool = False) -> Iterator:
+    """
+    Apply a function to each item, as map does, on a pool of workers, yielding the results in the order of the items.
+    At most 2 * n_workers items are in progress or waiting to be consumed at once, to bound memory use.
+
+    Args:
+        func (Callable): The function to apply. Must be picklable, i.e. defined at module level, with processes.
+        *iterables (Iterable): The arguments to apply the function to, one iterable per argument.
+        n_workers (int): Number of workers. Default is 1 (run serially, in the calling thread).
+        processes (bool): Use worker processes rather than threads, for functions that hold the GIL.
+            Default is False (threads).
+
+    Yields:
+        The result of func for each item, in order.
+    """
+    if n_workers <= 1:
+        yield from map(func, *iterables)
+        return
+
+    if processes:
+        # 'spawn' avoids forking the polars thread pool
+        executor = ProcessPoolExecutor(max_workers=n_workers, mp_context=multiprocessing.get_context("spawn"))
+    else:
+        executor = ThreadPoolExecutor(max_workers=n_workers)
+
+    with executor:
+        pending = deque()
+        for args in zip(*iterables, strict=True):
+            pending.append(executor.submit(func, *args))
+            if len(pending) >= 2 * n_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
@@ -49,6 +49,7 @@ def confusion_matrix_plot(
     labels: pl.Series,
     X_test: pl.DataFrame,
     y_test: pl.DataFrame,
+    score: float | None = None,
 ) -> plt.Figure:
     """
     Plot a confusion matrix from a confusion matrix ndarray.
@@ -59,6 +60,8 @@ def confusion_matrix_plot(
         labels (pl.Series): The category labels.
         X_test (pl.DataFrame): The test features.
         y_test (pl.DataFrame): The test labels.
+        score (float | None): The model's score on the test set, if already known. Defaults to None
+            (scored here).
 
     Returns:
         plt.Figure: The matplotlib figure object.
@@ -67,7 +70,9 @@ def confusion_matrix_plot(
     disp = metrics.ConfusionMatrixDisplay(confusion_matrix=cm, display_labels=labels.str.to_titlecase())
     fig, ax = plt.subplots(figsize=(5, 5))
     disp.plot(ax=ax, cmap="Blues_r", values_format=".2%", colorbar=False)
-    all_sample_title = f"Score: {str(model.score(X_test, y_test))}"
+    if score is None:
+        score = model.score(X_test, y_test)
+    all_sample_title = f"Score: {str(score)}"
     ax.set_title(all_sample_title, size=15)
     plt.tight_layout()
 
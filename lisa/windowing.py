@@ -0,0 +1,274 @@
+import threading
+import warnings
+from collections.abc import Callable
+
+import numpy as np
+
+# Statistics computed by the running-window engine
+ROLLING_STATS = ["min", "max", "mean", "std", "first", "last", "rms", "range"]
+
+# Statistics computed on batches of windows, by name; see register_statistic
+WINDOW_STATS: dict[str, Callable[[np.ndarray, float], np.ndarray]] = {}
+
+# Frequency bands (Hz) for the 'band' spectral energy statistics. The spectrum is of the mean-removed window,
+# so there is no band below 1 Hz, which would hold little more than the (zero) DC component
+FFT_BANDS = [(1, 3), (3, 6), (6, 12), (12, 25)]
+
+# Maximum number of samples in a batch of windows, to bound memory use
+BATCH_SIZE = 1 << 22
+
+# The power spectrum of the last batch of windows, for each thread; see _power_spectrum
+_spectrum_cache = threading.local()
+
+
+def _sliding_extreme(values: np.ndarray, period: int, ufunc: np.ufunc) -> np.ndarray:
+    """
+    Sliding window maximum or minimum of each column, using the van Herk/Gil-Werman algorithm.
+    The rows are split into blocks of 'period' rows, and each window is covered by the suffix of one block
+    and the prefix of the next, so each row costs a constant number of comparisons regardless of the window size.
+    NaN values are ignored, as long as 'ufunc' is np.fmax or np.fmin.
+
+    Args:
+        values (np.ndarray): 2D array of shape (rows, columns).
+        period (int): The window size in number of rows.
+        ufunc (np.ufunc): np.fmax for the maximum, np.fmin for the minimum.
+
+    Returns:
+        np.ndarray: Array of shape (rows - period + 1, columns), one row per full window.
+    """
+    n_rows, n_columns = values.shape
+    n_windows = n_rows - period + 1
+    n_blocks = -(-n_rows // period)
+
+    blocks = np.full((n_blocks * period, n_columns), np.nan)
+    blocks[:n_rows] = values
+    blocks = blocks.reshape(n_blocks, period, n_columns)
+
+    prefix = ufunc.accumulate(blocks, axis=1).reshape(-1, n_columns)
+    suffix = ufunc.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].reshape(-1, n_columns)
+
+    return ufunc(suffix[:n_windows], prefix[period - 1 : period - 1 + n_windows])
+
+
+def _window_sums(values: np.ndarray, period: int) -> np.ndarray:
+    """
+    Sum of each column over every full window, from a running (cumulative) sum.
+
+    Args:
+        values (np.ndarray): 2D array of shape (rows, columns).
+        period (int): The window size in number of rows.
+
+    Returns:
+        np.ndarray: Array of shape (rows - period + 1, columns), one row per full window.
+    """
+    running_sum = np.zeros((values.shape[0] + 1, values.shape[1]))
+    np.cumsum(values, axis=0, out=running_sum[1:])
+    return running_sum[period:] - running_sum[:-period]
+
+
+def register_statistic(name: str) -> Callable:
+    """
+    Decorator to add a window statistic to WINDOW_STATS, making it available to rolling_statistics
+    and to the 'stats' argument of features.sliding_window (computed by its 'numpy' engine).
+
+    The decorated function receives a batch of windows as an array of shape (windows, columns, period)
+    and the sample rate in Hz, and returns an array of shape (windows, columns). It should be vectorised
+    over the whole batch and ignore missing values (NaN) where possible.
+
+    Args:
+        name (str): The statistic name, used as the prefix of the feature column names, i.e. '{name}_{column}'.
+            Must not contain '_' or '.', so that feature names can be parsed with IMU_PATTERN.
+
+    Returns:
+        Callable: The decorator.
+    """
+    if "_" in name or "." in name:
+        raise ValueError(f"Statistic names cannot contain '_' or '.', but got {name}.")
+
+    def _register(func: Callable[[np.ndarray, float], np.ndarray]) -> Callable[[np.ndarray, float], np.ndarray]:
+        WINDOW_STATS[name] = func
+        return func
+
+    return _register
+
+
+def available_statistics() -> list[str]:
+    """
+    The names of all statistics that rolling_statistics can calculate.
+
+    Returns:
+        list[str]: The running-window statistics, followed by the registered window statistics.
+    """
+    return ROLLING_STATS + list(WINDOW_STATS)
+
+
+def rolling_statistics(
+    values: np.ndarray,
+    period: int,
+    stats: list[str],
+    stride: int = 1,
+    sample_rate: float = 1000.0,
+) -> dict[str, np.ndarray]:
+    """
+    Calculate statistics over every full window of 'period' rows of a single trial, for all columns at once.
+    Uses running sums for the mean, standard deviation and RMS, and the van Herk/Gil-Werman algorithm for the
+    minimum, maximum and range, so the cost per row does not depend on the window size. Registered statistics
+    (see register_statistic) are computed on batches of strided windows.
+    Missing values (NaN) are ignored, matching Polars' handling of nulls; the standard deviation is the
+    sample standard deviation (ddof=1).
+
+    Args:
+        values (np.ndarray): 2D float array of shape (rows, columns).
+        period (int): The window size in number of rows.
+        stats (list[str]): The statistics to calculate. See available_statistics() for the options.
+        stride (int): Keep every {stride}th window, starting from the first. Default is 1.
+        sample_rate (float): The sample rate of the data in Hz, used by the spectral statistics. Default is 1000.
+
+    Returns:
+        dict[str, np.ndarray]: Each statistic as an array with one row per kept window, where row i is the window
+            ending at row i * stride + period - 1.
+    """
+    unknown_stats = set(stats).difference(available_statistics())
+    if unknown_stats:
+        raise ValueError(f"Unknown statistics: {unknown_stats}. Options are {available_statistics()}.")
+
+    n_windows = values.shape[0] - period + 1
+    if n_windows < 1:
+        return {stat: np.empty((0, values.shape[1])) for stat in stats}
+
+    results = {}
+
+    if "max" in stats or "range" in stats:
+        results["max"] = _sliding_extreme(values, period, np.fmax)
+    if "min" in stats or "range" in stats:
+        results["min"] = _sliding_extreme(values, period, np.fmin)
+    if "range" in stats:
+        results["range"] = results["max"] - results["min"]
+    if "first" in stats:
+        results["first"] = values[:n_windows]
+    if "last" in stats:
+        results["last"] = values[period - 1 :]
+
+    if "mean" in stats or "std" in stats or "rms" in stats:
+        valid = ~np.isnan(values)
+        has_missing = not valid.all()
+
+        # Centre each column before summing, to limit cancellation error in the variance
+        with np.errstate(invalid="ignore"):
+            shift = np.nan_to_num(np.nanmean(values, axis=0))
+        centred = np.where(valid, values - shift, 0.0) if has_missing else values - shift
+
+        count = _window_sums(valid, period) if has_missing else np.full((1, values.shape[1]), float(period))
+        total = _window_sums(centred, period)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = total / count
+            if "mean" in stats:
+                results["mean"] = mean + shift
+            squares = _window_sums(centred**2, period)
+            if "std" in stats:
+                variance = (squares - total * mean) / (count - 1)
+                results["std"] = np.where(count > 1, np.sqrt(np.maximum(variance, 0.0)), np.nan)
+            if "rms" in stats:
+                # Expand the centred sum of squares back to the raw mean square
+                mean_square = (squares + 2 * shift * total) / count + shift**2
+                results["rms"] = np.sqrt(np.maximum(mean_square, 0.0))
+
+    results = {stat: results[stat][::stride] for stat in stats if stat in ROLLING_STATS}
+
+    window_stats = [stat for stat in stats if stat in WINDOW_STATS]
+    if window_stats:
+        windows = np.lib.stride_tricks.sliding_window_view(values, period, axis=0)[::stride]
+        batch_size = max(1, BATCH_SIZE // (period * values.shape[1]))
+        # All the statistics of a batch are computed together, so the spectral statistics share its spectrum
+        batches = {stat: [] for stat in window_stats}
+        for start in range(0, len(windows), batch_size):
+            batch = windows[start : start + batch_size]
+            for stat in window_stats:
+                batches[stat].append(WINDOW_STATS[stat](batch, sample_rate))
+        _spectrum_cache.value = None
+        results.update({stat: np.concatenate(batches[stat]) for stat in window_stats})
+
+    return results
+
+
+def _centred(windows: np.ndarray) -> np.ndarray:
+    "Subtract the mean of each window, leaving missing values as NaN."
+    with np.errstate(invalid="ignore"), warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return windows - np.nanmean(windows, axis=-1, keepdims=True)
+
+
+def _central_moment(windows: np.ndarray, order: int) -> np.ndarray:
+    "The central moment of each window."
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(_centred(windows) ** order, axis=-1)
+
+
+def _power_spectrum(windows: np.ndarray, sample_rate: float) -> tuple[np.ndarray, np.ndarray]:
+    """
+    The frequencies and power spectrum of each window, after removing the window mean.
+    The spectrum of the last batch is kept for each thread, so the spectral statistics of a batch (the same array
+    object, unmodified) share a single FFT.
+    """
+    cached = getattr(_spectrum_cache, "value", None)
+    if cached is not None and cached[0] is windows and cached[1] == sample_rate:
+        return cached[2]
+
+    spectrum = np.fft.rfft(np.nan_to_num(_centred(windows)), axis=-1)
+    frequencies = np.fft.rfftfreq(windows.shape[-1], d=1 / sample_rate)
+    result = frequencies, np.abs(spectrum) ** 2 / windows.shape[-1]
+
+    _spectrum_cache.value = (windows, sample_rate, result)
+    return result
+
+
+@register_statistic("skew")
+def _skew(windows: np.ndarray, sample_rate: float) -> np.ndarray:
+    "Skewness (biased, as scipy.stats.skew)."
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _central_moment(windows, 3) / _central_moment(windows, 2) ** 1.5
+
+
+@register_statistic("kurtosis")
+def _kurtosis(windows: np.ndarray, sample_rate: float) -> np.ndarray:
+    "Excess (Fisher) kurtosis, biased, as scipy.stats.kurtosis."
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _central_moment(windows, 4) / _central_moment(windows, 2) ** 2 - 3
+
+
+@register_statistic("zcr")
+def _zero_crossing_rate(windows: np.ndarray, sample_rate: float) -> np.ndarray:
+    "Zero-crossing rate of the mean-removed signal, as crossings per sample."
+    signs = np.signbit(_centred(windows))
+    return np.count_nonzero(signs[..., 1:] != signs[..., :-1], axis=-1) / (windows.shape[-1] - 1)
+
+
+@register_statistic("sma")
+def _signal_magnitude_area(windows: np.ndarray, sample_rate: float) -> np.ndarray:
+    "Signal magnitude area of a single channel, i.e. the mean absolute value."
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return np.nanmean(np.abs(windows), axis=-1)
+
+
+@register_statistic("domfreq")
+def _dominant_frequency(windows: np.ndarray, sample_rate: float) -> np.ndarray:
+    "Frequency (Hz) of the largest peak in the power spectrum, excluding the DC component."
+    frequencies, power = _power_spectrum(windows, sample_rate)
+    return frequencies[1:][np.argmax(power[..., 1:], axis=-1)]
+
+
+def _band_energy(low: float, high: float) -> Callable[[np.ndarray, float], np.ndarray]:
+    "Create a statistic for the spectral energy between 'low' and 'high' Hz."
+
+    def _energy(windows: np.ndarray, sample_rate: float) -> np.ndarray:
+        frequencies, power = _power_spectrum(windows, sample_rate)
+        return power[..., (frequencies >= low) & (frequencies < high)].sum(axis=-1)
+
+    return _energy
+
+
+for _low, _high in FFT_BANDS:
+    register_statistic(f"band{_low}to{_high}")(_band_energy(_low, _high))
@@ -1,12 +1,20 @@
 from pathlib import Path
+from typing import Literal
 
 from loguru import logger
 from tqdm import tqdm
 
-from lisa.config import MAIN_DATA_DIR, PROCESSED_DATA_DIR
-from lisa.dataset import process_files
+from lisa.config import FEATURE_CACHE_DIR, MAIN_DATA_DIR, PROCESSED_DATA_DIR
+from lisa.dataset import (
+    files_fingerprint,
+    manifest_fingerprint,
+    process_files,
+    process_files_to_dataset,
+    scan_trials,
+)
+from lisa.feature_store import cache_key, fetch_features, store_features
 from lisa.features import feature_extraction
-from lisa.modeling.multipredictor import multipredictor
+from lisa.modeling.multipredictor import multifamily_predictor, multipredictor
 
 
 def main(
@@ -27,6 +35,16 @@ def main(
     locations=["pelvis", "thigh", "shank", "foot_", "foot sensor"],
     dimensions=["z"],
     stats=["min", "max"],
+    n_workers: int = 1,
+    interim_path: Path | None = None,
+    engine: Literal["polars", "numpy"] = "polars",
+    stride: int = 1,
+    feature_cache: bool = False,
+    cache_dir: Path = FEATURE_CACHE_DIR,
+    memory_budget: int = 2 * 1024**3,
+    precision: Literal["float32", "float64"] = "float64",
+    parallel_families: bool = False,
+    family_jobs: dict[str, int] | None = None,
 ):
     """
     Top-level script for the end-to-end processing of the LISA dataset.
@@ -48,27 +66,100 @@ def main(
         locations (list[str]): Locations to extract. Defaults to ['pelvis', 'thigh', 'shank', 'foot_', 'foot sensor'].
         dimensions (list[str]): Dimensions to extract. Defaults to ['z'].
         stats (list[str]): Statistics to calculate. Defaults to ['min', 'max'].
+        n_workers (int): Number of processes used to parse the raw c3d files, and of threads used for feature
+                    extraction. Defaults to 1 (serial).
+        interim_path (Path | None): Directory for an incrementally updated, partitioned copy of the processed raw
+                    data. Only new or changed c3d files are re-parsed on subsequent runs.
+                    Defaults to None (process all files in memory).
+        engine (Literal["polars", "numpy"]): Windowing backend for feature extraction; statistics only
+            available with 'numpy' use it. Defaults to 'polars'.
+        stride (int): Number of raw samples between extracted windows. Defaults to 1 (every sample).
+        feature_cache (bool): Reuse previously extracted features when the input data and all extraction
+                    parameters are unchanged, skipping processing and feature extraction. Defaults to False.
+        cache_dir (Path): Directory of the feature cache. Defaults to FEATURE_CACHE_DIR.
+        memory_budget (int): Approximate memory limit in bytes for feature extraction. With interim_path, the raw
+                    data is streamed from the partitioned dataset and never held in memory in full.
+                    Defaults to 2 GiB.
+        precision (Literal["float32", "float64"]): Floating point precision of the signals, features and model
+                    inputs. 'float32' halves memory use and storage. Defaults to 'float64'.
+        parallel_families (bool): Train the model families in parallel processes, loading and splitting the
+                    features once for all of them. Defaults to False (one family after another).
+        family_jobs (dict[str, int] | None): Number of cores for each model family, i.e. {'RF': 8}. Families not
+                    listed share the remaining cores. Defaults to None (all cores, or an equal share of them when
+                    training in parallel).
     """
-
-    feature_extraction(
-        process_files(
+    if interim_path is not None:
+        process_files_to_dataset(
             input_path,
+            interim_path,
             skip_participants,
             missing_labels,
             measures,
             locations,
             dimensions,
-        ).collect(),
-        output_path,
-        window,
-        stats,
-        False,
-    )
+            n_workers,
+            precision=precision,
+        )
+
+    # Look up the features by the input data and extraction parameters
+    if feature_cache:
+        if interim_path is not None:
+            input_fingerprint = manifest_fingerprint(interim_path)
+        else:
+            input_fingerprint = files_fingerprint(
+                input_path, skip_participants, missing_labels, measures, locations, dimensions, precision
+            )
+        extraction_params = {
+            "window": window,
+            "stride": stride,
+            "stats": stats,
+            "engine": engine,
+            "precision": precision,
+        }
+        key = cache_key(input_fingerprint, extraction_params)
+
+    if not (feature_cache and fetch_features(key, output_path, cache_dir)):
+        if interim_path is not None:
+            # Streamed from disk by feature_extraction, one part at a time
+            processed_data = scan_trials(interim_path)
+        else:
+            # Already held in memory by process_files, so split it in a single pass
+            processed_data = process_files(
+                input_path,
+                skip_participants,
+                missing_labels,
+                measures,
+                locations,
+                dimensions,
+                n_workers,
+                precision,
+            ).collect()
+
+        feature_extraction(
+            processed_data,
+            output_path,
+            window,
+            stats,
+            False,
+            engine,
+            stride,
+            n_workers,
+            memory_budget,
+            precision,
+        )
+
+        if feature_cache:
+            store_features(key, output_path, extraction_params, cache_dir)
+
     logger.info("Completed processing")
 
-    for model in tqdm(models):
-        run_name = model + "_" + run_id
-        multipredictor(output_path, run_name, model, window, split, True)
+    if parallel_families:
+        multifamily_predictor(output_path, run_id, models, window, split, True, precision, family_jobs)
+    else:
+        for model in tqdm(models):
+            run_name = model + "_" + run_id
+            n_jobs = (family_jobs or {}).get(model, -1)
+            multipredictor(output_path, run_name, model, window, split, True, precision, n_jobs)
 
     logger.success("Completed training")
 
@@ -0,0 +1,31 @@
+import numpy as np
+import polars as pl
+import pytest
+
+
+@pytest.fixture
+def features_path(tmp_path):
+    """
+    A features file of 12 trials from 2 participants, with an activity each of walk, run and jump in turn.
+    The features separate the activities, and the locomotion trials have a constant speed and incline.
+    """
+    rng = np.random.default_rng(0)
+    n_trials, trial_length = 12, 40
+    activity = np.repeat(["walk", "run", "jump"] * 4, trial_length)
+    speed = [value for value in [1.0, 3.0, None] * 4 for _ in range(trial_length)]
+    incline = [value for value in [0, 5, None] * 4 for _ in range(trial_length)]
+
+    pl.DataFrame(
+        {
+            "max_accel_thigh_l.z": (activity == "run") * 2.0 + rng.normal(size=n_trials * trial_length),
+            "min_accel_thigh_l.z": (activity == "jump") * 2.0 + rng.normal(size=n_trials * trial_length),
+            "TRIAL": np.repeat(np.arange(n_trials), trial_length).astype(np.int16),
+            "TIME": np.tile(np.arange(trial_length), n_trials),
+            "ACTIVITY": activity,
+            "SPEED": pl.Series(speed, dtype=pl.Float64),
+            "INCLINE": pl.Series(incline, dtype=pl.Int64),
+            "PARTICIPANT": np.repeat([1, 2], n_trials // 2 * trial_length).astype(np.int16),
+        }
+    ).write_parquet(tmp_path / "features.parquet")
+
+    return tmp_path / "features.parquet"
@@ -0,0 +1,61 @@
+import json
+
+import numpy as np
+import polars as pl
+import pytest
+
+from lisa.modeling import cross_validate as cv
+
+
+def test_participant_folds() -> None:
+    """
+    Test that each participant is left out in turn
+    """
+    folds = cv.participant_folds(np.array([3, 3, 1, 1, 2], dtype=np.int16))
+
+    assert folds == [("P1", [1]), ("P2", [2]), ("P3", [3])]
+
+
+def test_trial_folds() -> None:
+    """
+    Test that every trial is in the test set of exactly one fold
+    """
+    trials = np.repeat(np.arange(6), [5, 3, 4, 6, 2, 5])
+
+    folds = cv.trial_folds(trials, n_splits=3)
+
+    assert len(folds) == 3
+    assert sorted(trial for _, test_trials in folds for trial in test_trials) == list(range(6))
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_cross_validate(features_path, tmp_path, monkeypatch, n_workers) -> None:
+    """
+    Test leave-one-participant-out cross-validation, in serial and in worker processes
+    """
+    monkeypatch.setattr(cv, "MODELS_DIR", tmp_path / "models")
+
+    report = cv.cross_validate(features_path, "cv_test", "LR", n_workers=n_workers)
+
+    assert report["fold"].to_list() == ["P1", "P2"]
+    assert report["test_rows"].to_list() == [240, 240]
+    assert (report["activity"] > 0.5).all()
+
+    with (tmp_path / "models" / "cv_test" / "cross_validation.json").open("r") as f:
+        summary = json.load(f)
+    assert summary["mean"]["activity"] == pytest.approx(report["activity"].mean())
+    assert (tmp_path / "models" / "cv_test" / "cross_validation.csv").exists()
+
+
+def test_cross_validate_missing_participant(features_path, tmp_path, monkeypatch) -> None:
+    """
+    Test that leave-one-participant-out requires a PARTICIPANT column, while grouping by TRIAL does not
+    """
+    monkeypatch.setattr(cv, "MODELS_DIR", tmp_path / "models")
+    pl.read_parquet(features_path).drop("PARTICIPANT").write_parquet(features_path)
+
+    with pytest.raises(ValueError):
+        cv.cross_validate(features_path, "cv_test", "LR")
+
+    report = cv.cross_validate(features_path, "cv_test", "LR", folds="trial", n_splits=3)
+    assert report.height == 3
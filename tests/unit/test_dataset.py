@@ -1,9 +1,16 @@
 import numpy as np
 import polars as pl
+import pytest
 from ezc3d import c3d
 from polars.testing import assert_frame_equal
 
-from lisa.dataset import process_c3d
+from lisa.dataset import (
+    create_synthetic_c3d_file,
+    process_c3d,
+    process_files,
+    process_files_to_dataset,
+    scan_dataset,
+)
 
 
 def test_process_c3d() -> None:
@@ -60,6 +67,36 @@ def test_process_c3d() -> None:
     )
 
 
+def test_process_c3d_precision() -> None:
+    """
+    Test that process_c3d returns the signal columns at the requested precision
+    """
+    c3d_contents = c3d()
+    c3d_contents["data"]["analogs"] = np.array([[[1.5, 2.5, 3.5], [4.5, 5.5, 6.5]]])
+    c3d_contents["parameters"]["ANALOG"]["RATE"]["value"] = np.array([100])
+    c3d_contents["parameters"]["ANALOG"]["LABELS"]["value"] = ["Accel_Thigh_L.x", "Accel_Thigh_L.y"]
+
+    result = process_c3d(c3d_contents, "Walk_1_0ms", ["walk"], 0, None, precision="float32")
+
+    assert result.schema["accel_thigh_l.x"] == pl.Float32
+    assert result.schema["accel_thigh_l.y"] == pl.Float32
+    assert result["accel_thigh_l.y"].to_list() == [4.5, 5.5, 6.5]
+    assert result.schema["SPEED"] == pl.Float32
+
+
+def test_process_c3d_duplicate_labels() -> None:
+    """
+    Test that process_c3d rejects wanted channels with the same label, rather than keeping only the last
+    """
+    c3d_contents = c3d()
+    c3d_contents["data"]["analogs"] = np.array([[[1.5, 2.5, 3.5], [4.5, 5.5, 6.5]]])
+    c3d_contents["parameters"]["ANALOG"]["RATE"]["value"] = np.array([100])
+    c3d_contents["parameters"]["ANALOG"]["LABELS"]["value"] = ["Accel_Thigh_L.x", "ACCEL_THIGH_L.X"]
+
+    with pytest.raises(ValueError, match="accel_thigh_l.x"):
+        process_c3d(c3d_contents, "Walk_1_0ms", ["walk"], 0, None)
+
+
 def test_process_c3d_filter_columns() -> None:
     """
     Test that process_c3d removes unwanted channels
@@ -118,6 +155,34 @@ def test_process_c3d_filter_columns() -> None:
     )
 
 
+def test_process_c3d_does_not_modify_arguments() -> None:
+    """
+    Test that process_c3d leaves the measures and dimensions lists unchanged
+    """
+    c3d_contents = c3d()
+    c3d_contents["data"]["analogs"] = np.array([[[1, 2, 3], [4, 5, 6]]])
+    c3d_contents["parameters"]["ANALOG"]["RATE"]["value"] = np.array([100])
+    c3d_contents["parameters"]["ANALOG"]["LABELS"]["value"] = ["Accel Thigh_R.z", "left foot sensor.lfs"]
+
+    measures = ["accel"]
+    dimensions = ["z"]
+
+    result = process_c3d(
+        c3d_contents,
+        "Walk_1_0ms",
+        ["walk"],
+        0,
+        None,
+        measures=measures,
+        locations=["foot sensor", "thigh"],
+        dimensions=dimensions,
+    )
+
+    assert result.columns[:2] == ["accel thigh_r.z", "left foot sensor.lfs"]
+    assert measures == ["accel"]
+    assert dimensions == ["z"]
+
+
 def test_process_c3d_empty() -> None:
     """
     Test process_c3d with empty data
@@ -135,3 +200,102 @@ def test_process_c3d_empty() -> None:
 
     # Check the result
     assert result is None
+
+
+def test_process_files_parallel(tmp_path) -> None:
+    """
+    Test that process_files gives identical output when reading files in parallel
+    """
+    for participant, filename in [
+        ("P1", "P1_Walk_1_7ms_10Incline.c3d"),
+        ("P1", "P1_Run_3_0ms.c3d"),
+        ("P2", "P2_Run_3_0ms_5Decline.c3d"),
+        ("P10", "P10_Jump.c3d"),
+    ]:
+        (tmp_path / participant).mkdir(exist_ok=True)
+        create_synthetic_c3d_file(tmp_path / participant / filename)
+
+    serial = process_files(tmp_path).collect()
+    parallel = process_files(tmp_path, n_workers=2).collect()
+
+    assert_frame_equal(serial, parallel)
+    assert serial["TRIAL"].unique().to_list() == [0, 1, 2, 3]
+    assert serial.group_by("TRIAL", maintain_order=True).agg(pl.col("PARTICIPANT").unique())[
+        "PARTICIPANT"
+    ].to_list() == [[1], [1], [2], [10]]
+
+
+def test_process_files_missing_columns(tmp_path) -> None:
+    """
+    Test that process_files fills channels missing from a trial with nulls, rather than dropping them
+    """
+    (tmp_path / "P1").mkdir()
+    (tmp_path / "P2").mkdir()
+    create_synthetic_c3d_file(tmp_path / "P1" / "P1_Walk_1_7ms.c3d")
+    create_synthetic_c3d_file(tmp_path / "P2" / "P2_Run_3_0ms.c3d")
+
+    # Remove the last channel from the first trial
+    c3d_contents = c3d(str(tmp_path / "P1" / "P1_Walk_1_7ms.c3d"))
+    c3d_contents["parameters"]["ANALOG"]["LABELS"]["value"] = c3d_contents["parameters"]["ANALOG"]["LABELS"]["value"][
+        :-1
+    ]
+    c3d_contents["data"]["analogs"] = c3d_contents["data"]["analogs"][:, :-1, :]
+    c3d_contents.write(str(tmp_path / "P1" / "P1_Walk_1_7ms.c3d"))
+
+    result = process_files(tmp_path).collect()
+
+    assert "gyro_pelvis.z" in result.columns
+    assert result.filter(pl.col("TRIAL") == 0)["gyro_pelvis.z"].is_null().all()
+    assert result.filter(pl.col("TRIAL") == 1)["gyro_pelvis.z"].is_not_null().all()
+
+
+def test_process_files_to_dataset(tmp_path) -> None:
+    """
+    Test that the partitioned dataset matches process_files, and can be pruned by partition
+    """
+    raw_dir = tmp_path / "raw"
+    for participant, filename in [
+        ("P1", "P1_Walk_1_7ms_10Incline.c3d"),
+        ("P2", "P2_Run_3_0ms_5Decline.c3d"),
+        ("P10", "P10_Walk_1_0ms.c3d"),
+    ]:
+        (raw_dir / participant).mkdir(parents=True, exist_ok=True)
+        create_synthetic_c3d_file(raw_dir / participant / filename)
+
+    dataset_dir = tmp_path / "interim"
+    process_files_to_dataset(raw_dir, dataset_dir)
+
+    assert (dataset_dir / "participant=10" / "activity=walk" / "00002.parquet").exists()
+    assert_frame_equal(scan_dataset(dataset_dir).collect(), process_files(raw_dir).collect())
+
+    walk_trials = scan_dataset(dataset_dir, activities=["walk"]).select("TRIAL").unique().collect()
+    assert sorted(walk_trials["TRIAL"].to_list()) == [0, 2]
+
+    p2_trials = scan_dataset(dataset_dir, participants=[2]).select("TRIAL").unique().collect()
+    assert p2_trials["TRIAL"].to_list() == [1]
+
+
+def test_process_files_to_dataset_incremental(tmp_path) -> None:
+    """
+    Test that re-running process_files_to_dataset only processes new files, keeping existing trial numbers
+    """
+    raw_dir = tmp_path / "raw"
+    (raw_dir / "P2").mkdir(parents=True)
+    create_synthetic_c3d_file(raw_dir / "P2" / "P2_Run_3_0ms.c3d")
+
+    dataset_dir = tmp_path / "interim"
+    process_files_to_dataset(raw_dir, dataset_dir)
+    trial_file = dataset_dir / "participant=2" / "activity=run" / "00000.parquet"
+    first_mtime = trial_file.stat().st_mtime_ns
+
+    # Add an earlier participant
+    (raw_dir / "P1").mkdir()
+    create_synthetic_c3d_file(raw_dir / "P1" / "P1_Walk_1_7ms.c3d")
+    process_files_to_dataset(raw_dir, dataset_dir)
+
+    assert trial_file.stat().st_mtime_ns == first_mtime
+    assert (dataset_dir / "participant=1" / "activity=walk" / "00001.parquet").exists()
+
+    # Rebuilding from scratch numbers trials in participant order
+    process_files_to_dataset(raw_dir, dataset_dir, incremental=False)
+    assert_frame_equal(scan_dataset(dataset_dir).collect(), process_files(raw_dir).collect())
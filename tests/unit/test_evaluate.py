@@ -0,0 +1,32 @@
+import numpy as np
+import polars as pl
+
+from lisa import evaluate
+
+
+class _PredictedModel:
+    """
+    A model that fails if it is asked to predict, for checking that cached predictions are used
+    """
+
+    def predict(self, X):
+        raise AssertionError("predict should not be called")
+
+    def score(self, X, y):
+        raise AssertionError("score should not be called")
+
+
+def test_confusion_matrix_cached_predictions(tmp_path) -> None:
+    """
+    Test that the confusion matrix and its plot use the predictions provided, without predicting again
+    """
+    labels = pl.Series("ACTIVITY", ["walk", "run"])
+    X_test = pl.DataFrame({"max_accel_thigh_l.z": [0.0, 1.0, 2.0, 3.0]})
+    y_test = pl.DataFrame({"ACTIVITY": ["walk", "walk", "run", "run"]})
+    y_pred = np.array(["walk", "run", "run", "run"])
+
+    cm = evaluate.confusion_matrix(_PredictedModel(), labels, X_test, y_test, tmp_path / "cm.png", y_pred)
+
+    assert cm["walk"].to_list() == [0.5, 0.0]
+    assert cm["run"].to_list() == [0.5, 1.0]
+    assert (tmp_path / "cm.png").exists()
@@ -0,0 +1,44 @@
+import os
+
+import polars as pl
+
+from lisa.feature_store import FEATURES_FILENAME, cache_key, fetch_features, store_features
+
+
+def test_cache_key() -> None:
+    """
+    Test that the cache key changes with the input fingerprint and every parameter
+    """
+    params = {"window": 300, "stride": 1, "stats": ["min", "max"]}
+
+    key = cache_key("abc", params)
+
+    assert key == cache_key("abc", dict(reversed(params.items())))
+    assert key != cache_key("abd", params)
+    assert key != cache_key("abc", {**params, "stride": 2})
+
+
+def test_store_and_fetch_features(tmp_path) -> None:
+    """
+    Test storing features in the cache, fetching them, and evicting the least recently used entry
+    """
+    cache_dir = tmp_path / "cache"
+    features_path = tmp_path / "features.parquet"
+    pl.DataFrame({"mean_accel_thigh_l.x": [1.0, 2.0, 3.0]}).write_parquet(features_path)
+    size = features_path.stat().st_size
+
+    assert not fetch_features("first", tmp_path / "out.parquet", cache_dir)
+
+    store_features("first", features_path, {"window": 300}, cache_dir)
+    assert fetch_features("first", tmp_path / "out.parquet", cache_dir)
+    assert pl.read_parquet(tmp_path / "out.parquet").equals(pl.read_parquet(features_path))
+    assert (cache_dir / "first" / "schema.json").exists()
+
+    # Make 'first' the least recently used entry, then exceed the size limit
+    os.utime(cache_dir / "first" / FEATURES_FILENAME, (0, 0))
+    store_features("second", features_path, {"window": 200}, cache_dir)
+    store_features("third", features_path, {"window": 100}, cache_dir, max_size=3 * size)
+
+    assert not (cache_dir / "first").exists()
+    assert (cache_dir / "second").exists()
+    assert (cache_dir / "third").exists()
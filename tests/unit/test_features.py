@@ -1,11 +1,22 @@
+import json
+
+import numpy as np
 import polars as pl
+import pyarrow.parquet as pq
 import pytest
 from polars.testing import assert_frame_equal
+from sklearn.preprocessing import StandardScaler
 
+from lisa import features
+from lisa.dataset import scan_trials
 from lisa.features import (
     check_split_balance,
+    feature_extraction,
+    read_feature_metadata,
+    sequential_split_indices,
     sequential_stratified_split,
     sliding_window,
+    standard_scaler,
 )
 
 
@@ -22,6 +33,24 @@ def sample_lazyframe():
     )
 
 
+def synthetic_trials(n_trials: int, trial_length: int = 20, columns: list[str] = ["Value"]) -> pl.DataFrame:
+    """
+    Trials of random signals in the given columns, cycling through the activities, with the speed and incline
+    increasing by trial
+    """
+    rng = np.random.default_rng(0)
+    return pl.DataFrame(
+        {
+            "TRIAL": np.repeat(np.arange(n_trials, dtype=np.int16), trial_length),
+            "TIME": np.tile(np.arange(trial_length), n_trials),
+            "ACTIVITY": np.repeat(np.resize(["walk", "run", "jump"], n_trials), trial_length),
+            "SPEED": np.repeat(np.arange(n_trials) / 2, trial_length),
+            "INCLINE": np.repeat(np.arange(n_trials), trial_length),
+            **{column: rng.normal(size=n_trials * trial_length) for column in columns},
+        }
+    )
+
+
 def test_sequential_stratified_split(sample_lazyframe):
     """
     Test sequential_stratified_split function
@@ -74,6 +103,40 @@ def test_sequential_stratified_split(sample_lazyframe):
     assert_frame_equal(test_labels, expected_test_labels, check_column_order=False, check_dtypes=False)
 
 
+def test_sequential_stratified_split_trial_boundary() -> None:
+    """
+    Test that the train split is moved forward to the start of the next TRIAL, for each group
+    """
+    lf = pl.LazyFrame(
+        {
+            "TRIAL": [0, 0, 0, 1, 1, 2, 2, 2, 2, 3],
+            "TIME": list(range(10)),
+            "ACTIVITY": ["A", "A", "A", "A", "A", "B", "B", "B", "B", "B"],
+            "Value": list(range(10)),
+        }
+    )
+
+    train_data, test_data, train_labels, test_labels = sequential_stratified_split(lf, train_size=0.5, gap=1)
+
+    assert train_data.collect()["Value"].to_list() == [0, 1, 2, 5, 6, 7, 8]
+    assert test_data.collect()["Value"].to_list() == [4]
+    assert train_labels.collect()["ACTIVITY"].to_list() == ["A", "A", "A", "B", "B", "B", "B"]
+    assert test_labels.collect()["ACTIVITY"].to_list() == ["A"]
+
+
+def test_sequential_split_indices(sample_lazyframe):
+    """
+    Test that the split row indices select the same rows as sequential_stratified_split
+    """
+    train_data, test_data, _, _ = sequential_stratified_split(sample_lazyframe, train_size=0.5, gap=1)
+    train_indices, test_indices, gap_indices = sequential_split_indices(sample_lazyframe, train_size=0.5, gap=1)
+
+    df = sample_lazyframe.collect()
+    assert_frame_equal(df[train_indices].select("Value"), train_data.collect())
+    assert_frame_equal(df[test_indices].select("Value"), test_data.collect())
+    assert sorted([*train_indices, *test_indices, *gap_indices]) == list(range(df.height))
+
+
 def test_sequential_stratified_split_gap(sample_lazyframe):
     """
     Test sequential_stratified_split gap parameter
@@ -170,6 +233,109 @@ def test_sliding_window_multi_trial() -> None:
     assert_frame_equal(result, expected_result, check_column_order=False, check_dtypes=False)
 
 
+def test_sliding_window_numpy_engine() -> None:
+    """
+    Test that the numpy sliding_window engine matches the polars engine
+    """
+    rng = np.random.default_rng(0)
+    trial_lengths = [50, 7, 31]
+    values = rng.normal(size=sum(trial_lengths)) * 100
+    values[[3, 20, 21, 22]] = None
+    df = pl.DataFrame(
+        {
+            "TRIAL": np.repeat([0, 1, 2], trial_lengths),
+            "TIME": np.concatenate([np.arange(length) for length in trial_lengths]),
+            "Value": values,
+            "Count": rng.integers(0, 100, size=sum(trial_lengths)),
+        }
+    ).with_columns(pl.col("Value").fill_nan(None))
+
+    stats = ["min", "max", "mean", "std", "first", "last"]
+    expected_result = sliding_window(df, ["Value", "Count"], 10, stats=stats)
+    result = sliding_window(df, ["Value", "Count"], 10, stats=stats, engine="numpy")
+
+    assert_frame_equal(result, expected_result)
+
+
+@pytest.mark.parametrize("engine", ["polars", "numpy"])
+def test_sliding_window_stride(engine) -> None:
+    """
+    Test that sliding_window with a stride keeps every nth full window of each trial
+    """
+    df = pl.DataFrame(
+        {
+            "TRIAL": [0] * 8 + [1] * 5,
+            "TIME": list(range(8)) + list(range(5)),
+            "Value": [10, 20, 30, 40, 50, 60, 70, 80, 1, 2, 3, 4, 5],
+        }
+    )
+
+    result = sliding_window(df, ["Value"], 3, stats=["max"], engine=engine, stride=2)
+
+    expected_result = pl.DataFrame(
+        {
+            "TRIAL": [0, 0, 0, 1, 1],
+            "TIME": [2, 4, 6, 2, 4],
+            "max_Value": [30, 50, 70, 3, 5],
+        }
+    )
+
+    assert_frame_equal(result, expected_result)
+
+
+@pytest.mark.parametrize("engine", ["polars", "numpy"])
+def test_sliding_window_precision(engine) -> None:
+    """
+    Test that sliding_window returns floating point statistics at the requested precision
+    """
+    df = pl.DataFrame(
+        {
+            "TRIAL": [0] * 6,
+            "TIME": list(range(6)),
+            "Value": pl.Series([1.0, 2.0, 4.0, 8.0, 16.0, 32.0], dtype=pl.Float64),
+            "Count": [1, 2, 3, 4, 5, 6],
+        }
+    )
+
+    result = sliding_window(df, ["Value", "Count"], 3, stats=["max", "mean"], engine=engine, precision="float32")
+
+    assert result.schema["max_Value"] == pl.Float32
+    assert result.schema["mean_Value"] == pl.Float32
+    assert result.schema["mean_Count"] == pl.Float32
+    assert result.schema["max_Count"] == pl.Int64
+    assert result["mean_Value"].to_list() == pytest.approx([7 / 3, 14 / 3, 28 / 3, 56 / 3])
+
+
+def test_feature_extraction_metadata(tmp_path) -> None:
+    """
+    Test that feature_extraction records the window, stride, stats and precision in the output file
+    """
+    df = pl.DataFrame(
+        {
+            "TRIAL": [0] * 10,
+            "TIME": list(range(10)),
+            "ACTIVITY": ["walk"] * 10,
+            "SPEED": [1.0] * 10,
+            "INCLINE": [0] * 10,
+            "Value": [float(value) for value in range(10)],
+        }
+    )
+    output_path = tmp_path / "features.parquet"
+
+    feature_extraction(df, output_path, period=4, stats=["mean"], validate_schema=False, stride=3, precision="float32")
+
+    assert read_feature_metadata(output_path) == {
+        "window": 4,
+        "stride": 3,
+        "stats": ["mean"],
+        "precision": "float32",
+    }
+    result = pl.read_parquet(output_path)
+    assert result["mean_Value"].to_list() == [1.5, 4.5, 7.5]
+    assert result.schema["mean_Value"] == pl.Float32
+    assert result.schema["SPEED"] == pl.Float64
+
+
 def test_sliding_window_time_reset_error() -> None:
     """
     Test sliding_window raises an error if time does not reset for new trial
@@ -217,3 +383,132 @@ def test_check_split_balance():
         expected_difference,
         check_row_order=False,
     )
+
+
+def test_feature_extraction_parallel(tmp_path) -> None:
+    """
+    Test that feature_extraction writes the same output, in the same order, with several workers
+    """
+    df = synthetic_trials(12)
+
+    feature_extraction(df, tmp_path / "serial.parquet", period=5, validate_schema=False)
+    feature_extraction(df, tmp_path / "parallel.parquet", period=5, validate_schema=False, n_workers=3)
+
+    assert_frame_equal(pl.read_parquet(tmp_path / "serial.parquet"), pl.read_parquet(tmp_path / "parallel.parquet"))
+
+
+def test_feature_extraction_lazy(tmp_path) -> None:
+    """
+    Test that a LazyFrame processed in parts within a memory budget gives the same output as a DataFrame
+    """
+    n_trials, trial_length = 6, 20
+    df = synthetic_trials(n_trials, trial_length)
+    df.write_parquet(tmp_path / "raw.parquet")
+
+    feature_extraction(df, tmp_path / "eager.parquet", period=5, validate_schema=False)
+    # A budget of roughly one trial per part
+    feature_extraction(
+        pl.scan_parquet(tmp_path / "raw.parquet"),
+        tmp_path / "lazy.parquet",
+        period=5,
+        validate_schema=False,
+        memory_budget=2 * 8 * 6 * 6 * trial_length,
+    )
+
+    assert pq.ParquetFile(tmp_path / "lazy.parquet").num_row_groups == n_trials
+    assert_frame_equal(pl.read_parquet(tmp_path / "eager.parquet"), pl.read_parquet(tmp_path / "lazy.parquet"))
+
+
+def test_standard_scaler() -> None:
+    """
+    Test that standard_scaler matches scikit-learn's StandardScaler, including constant and missing values
+    """
+    rng = np.random.default_rng(0)
+    X_train = pl.DataFrame(
+        {
+            "a": rng.normal(5, 2, size=100),
+            "b": np.full(100, 3.0),
+            "c": [None if i % 10 == 0 else float(i) for i in range(100)],
+        }
+    )
+    X_test = pl.DataFrame({"a": rng.normal(size=10), "b": np.zeros(10), "c": np.arange(10.0)})
+
+    scaled_train, scaled_test, scaler = standard_scaler(X_train.lazy(), X_test.lazy(), dtype=pl.Float32)
+
+    expected = StandardScaler().fit(X_train.to_numpy())
+    np.testing.assert_allclose(scaler.mean_, expected.mean_)
+    np.testing.assert_allclose(scaler.scale_, expected.scale_)
+    np.testing.assert_array_equal(scaler.n_samples_seen_, expected.n_samples_seen_)
+
+    assert scaled_test.dtypes == [pl.Float32] * 3
+    np.testing.assert_allclose(scaled_test.to_numpy(), expected.transform(X_test.to_numpy()), rtol=1e-6)
+    np.testing.assert_allclose(
+        scaled_train.to_numpy(), expected.transform(X_train.to_numpy()), rtol=1e-6, equal_nan=True
+    )
+
+    # The scaler can be applied to new data, as in predict.apply_model
+    np.testing.assert_allclose(scaler.transform(X_test), expected.transform(X_test.to_numpy()))
+
+
+def test_feature_extraction_partitioned(tmp_path) -> None:
+    """
+    Test that the trials of a partitioned dataset, processed in parts from their own files, give the same output
+    as a DataFrame, including trials missing a column
+    """
+    n_trials, trial_length = 6, 20
+    trials = []
+    for trial, df in enumerate(synthetic_trials(n_trials, trial_length, ["Value", "Other"]).partition_by("TRIAL")):
+        participant, activity = trial % 2 + 1, df["ACTIVITY"][0]
+        # A trial recorded without one of the sensors
+        if trial == 3:
+            df = df.drop("Other")
+        partition = tmp_path / "dataset" / f"participant={participant}" / f"activity={activity}"
+        partition.mkdir(parents=True, exist_ok=True)
+        df.write_parquet(partition / f"{trial:05d}.parquet")
+        trials.append(df.with_columns(pl.lit(participant).cast(pl.Int16).alias("PARTICIPANT")))
+
+    feature_extraction(pl.concat(trials, how="diagonal"), tmp_path / "eager.parquet", period=5, validate_schema=False)
+    # A budget of roughly one trial per part
+    feature_extraction(
+        scan_trials(tmp_path / "dataset"),
+        tmp_path / "partitioned.parquet",
+        period=5,
+        validate_schema=False,
+        memory_budget=2 * 8 * 8 * 6 * trial_length,
+    )
+
+    assert pq.ParquetFile(tmp_path / "partitioned.parquet").num_row_groups == n_trials
+    assert_frame_equal(pl.read_parquet(tmp_path / "eager.parquet"), pl.read_parquet(tmp_path / "partitioned.parquet"))
+
+
+def test_feature_extraction_schema_optional_participant(tmp_path, monkeypatch) -> None:
+    """
+    Test that data processed before PARTICIPANT was recorded still passes schema validation,
+    while a PARTICIPANT column of the wrong type does not
+    """
+    (tmp_path / "lisa").mkdir()
+    schema = {"TRIAL": "Int16", "TIME": "Int64", "mean_Value": "Float64"}
+    schema |= {"ACTIVITY": "String", "SPEED": "Float64", "INCLINE": "Int64", "PARTICIPANT": "Int16"}
+    with (tmp_path / "lisa" / "validation_schema.json").open("w") as f:
+        json.dump(schema, f)
+    monkeypatch.setattr(features, "PROJ_ROOT", tmp_path)
+
+    df = pl.DataFrame(
+        {
+            "TRIAL": pl.Series([0] * 6, dtype=pl.Int16),
+            "TIME": list(range(6)),
+            "ACTIVITY": ["walk"] * 6,
+            "SPEED": [1.0] * 6,
+            "INCLINE": [0] * 6,
+            "Value": [float(value) for value in range(6)],
+        }
+    )
+
+    feature_extraction(df, tmp_path / "legacy.parquet", period=3, stats=["mean"])
+    feature_extraction(
+        df.with_columns(PARTICIPANT=pl.lit(1, dtype=pl.Int16)), tmp_path / "current.parquet", period=3, stats=["mean"]
+    )
+    with pytest.raises(ValueError):
+        feature_extraction(
+            df.with_columns(PARTICIPANT=pl.lit(1, dtype=pl.Int64)), tmp_path / "wrong.parquet", period=3, stats=["mean"]
+        )
@@ -0,0 +1,98 @@
+import json
+import os
+
+import polars as pl
+import pytest
+
+from lisa.modeling import lgbm
+from lisa.modeling import multipredictor as mp
+
+
+def test_split_jobs() -> None:
+    """
+    Test dividing a core budget between concurrently trained models
+    """
+    assert mp._split_jobs(6, 3) == 2
+    assert mp._split_jobs(2, 3) == 1
+    assert mp._split_jobs(-1, 3) == max(1, (os.cpu_count() or 1) // 3)
+
+
+@pytest.mark.parametrize("model", ["LR", "RF"])
+def test_multipredictor(features_path, tmp_path, monkeypatch, model) -> None:
+    """
+    Test that the concurrently trained models are all scored, plotted and saved
+    """
+    monkeypatch.setattr(mp, "MODELS_DIR", tmp_path / "models")
+
+    mp.multipredictor(features_path, "mp_test", model, window=4, split=0.8, save=True, n_jobs=3)
+
+    output_dir = tmp_path / "models" / "mp_test"
+    with (output_dir / "output.json").open("r") as f:
+        output = json.load(f)
+    assert all(score is not None for score in output["score"].values())
+    assert output["score"]["activity"] > 0.5
+    for filename in ["confusion_matrix.png", "Speed_hist.png", "Incline_hist.png", "activity.pkl", "incline.pkl"]:
+        assert (output_dir / filename).exists()
+
+
+def test_multifamily_predictor(features_path, tmp_path, monkeypatch) -> None:
+    """
+    Test that families trained in parallel from a shared split match those trained one at a time
+    """
+    monkeypatch.setattr(mp, "MODELS_DIR", tmp_path / "models")
+
+    mp.multifamily_predictor(features_path, "parallel", ["LR", "RF"], window=4, split=0.8, n_jobs={"RF": 2})
+    for model in ["LR", "RF"]:
+        mp.multipredictor(features_path, f"{model}_serial", model, window=4, split=0.8, n_jobs=2)
+
+    for model in ["LR", "RF"]:
+        with (tmp_path / "models" / f"{model}_parallel" / "output.json").open("r") as f:
+            parallel = json.load(f)
+        with (tmp_path / "models" / f"{model}_serial" / "output.json").open("r") as f:
+            serial = json.load(f)
+        assert parallel["score"] == pytest.approx(serial["score"])
+        assert parallel["params"]["precision"] == serial["params"]["precision"]
+
+
+def test_multipredictor_lgbm_dataset_cache(features_path, tmp_path, monkeypatch) -> None:
+    """
+    Test that the binned LightGBM Dataset is saved alongside the features, and reused by later runs
+    """
+    monkeypatch.setattr(mp, "MODELS_DIR", tmp_path / "models")
+    params = {"window": 4, "split": 0.8, "n_jobs": 2}
+
+    mp.multipredictor(features_path, "first", "LGBM", save=True, **params)
+    (cache_file,) = (tmp_path / "features.parquet.lgbm").glob("*.bin")
+    modified = cache_file.stat().st_mtime_ns
+
+    mp.multipredictor(features_path, "second", "LGBM", **params)
+    assert cache_file.stat().st_mtime_ns == modified
+
+    outputs = []
+    for run_name in ["first", "second"]:
+        with (tmp_path / "models" / run_name / "output.json").open("r") as f:
+            outputs.append(json.load(f))
+    assert outputs[0]["score"] == pytest.approx(outputs[1]["score"])
+    assert outputs[0]["score"]["activity"] > 0.5
+    assert (tmp_path / "models" / "first" / "feature_importances_Speed.json").exists()
+
+
+def test_lgbm_dataset_cache_path_partitioned(tmp_path) -> None:
+    """
+    Test that re-writing a file in a nested partition of a dataset directory changes the cache path
+    """
+    dataset_dir = tmp_path / "dataset"
+    for participant, activity in [(1, "walk"), (2, "run")]:
+        partition = dataset_dir / f"participant={participant}" / f"activity={activity}"
+        partition.mkdir(parents=True)
+        pl.DataFrame({"max_accel_thigh_l.z": [1.0, 2.0]}).write_parquet(partition / "00000.parquet")
+    params = {"window": 4, "split": 0.8}
+
+    cache_path = lgbm.dataset_cache_path(dataset_dir, params)
+    assert cache_path.parent == tmp_path / "dataset.lgbm"
+    assert lgbm.dataset_cache_path(dataset_dir, params) == cache_path
+
+    pl.DataFrame({"max_accel_thigh_l.z": [1.0, 2.0, 3.0]}).write_parquet(
+        dataset_dir / "participant=2" / "activity=run" / "00000.parquet"
+    )
+    assert lgbm.dataset_cache_path(dataset_dir, params) != cache_path
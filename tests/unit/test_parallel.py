@@ -0,0 +1,29 @@
+import pytest
+
+from lisa.parallel import ordered_map
+
+
+@pytest.mark.parametrize("processes", [False, True])
+def test_ordered_map(processes) -> None:
+    """
+    Test that results are returned in order, with only a bounded number of items read ahead of the consumer
+    """
+    consumed = []
+
+    def items():
+        for item in range(-10, 10):
+            consumed.append(item)
+            yield item
+
+    results = ordered_map(pow, items(), [2] * 20, n_workers=2, processes=processes)
+
+    assert next(results) == 100
+    assert len(consumed) == 4
+    assert list(results) == [item**2 for item in range(-9, 10)]
+
+
+def test_ordered_map_serial() -> None:
+    """
+    Test that a single worker applies the function lazily in the calling thread
+    """
+    assert list(ordered_map(abs, [-1, 2, -3])) == [1, 2, 3]
@@ -0,0 +1,150 @@
+import joblib
+import numpy as np
+import polars as pl
+import pytest
+from sklearn import metrics
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.preprocessing import StandardScaler
+
+from lisa.modeling import predict
+
+
+@pytest.fixture
+def features(tmp_path):
+    rng = np.random.default_rng(0)
+    n_rows = 500
+    activity = rng.choice(["walk", "run", "jump"], size=n_rows)
+    speed = pl.Series([None if label == "jump" else 3.0 if label == "run" else 1.0 for label in activity])
+
+    features = pl.DataFrame(
+        {
+            "max_accel_thigh_l.z": (activity == "run") * 2.0 + rng.normal(size=n_rows),
+            "min_accel_thigh_l.z": (activity == "jump") * 2.0 + rng.normal(size=n_rows),
+            "mean_accel_thigh_l.z": rng.normal(size=n_rows),
+            "TRIAL": np.zeros(n_rows, dtype=np.int16),
+            "ACTIVITY": activity,
+            "SPEED": speed,
+        }
+    )
+    features.write_parquet(tmp_path / "features.parquet", row_group_size=100)
+
+    return features, tmp_path / "features.parquet"
+
+
+@pytest.mark.parametrize("feature", ["ACTIVITY", "SPEED"])
+def test_apply_model(features, tmp_path, monkeypatch, feature) -> None:
+    """
+    Test that the scores accumulated over batches match those of the full dataset
+    """
+    monkeypatch.setattr(predict, "MODELS_DIR", tmp_path / "models")
+    features, features_path = features
+    columns = ["min_accel_thigh_l.z", "max_accel_thigh_l.z"]
+
+    # Train on a subset of the features, in a different column order to the file
+    train = features.head(200).drop_nulls(feature)
+    model_class = RandomForestClassifier if feature == "ACTIVITY" else RandomForestRegressor
+    model = model_class(n_estimators=5, random_state=0).fit(train.select(columns), train[feature])
+    model_path = tmp_path / "models" / "run" / "model.pkl"
+    model_path.parent.mkdir(parents=True)
+    joblib.dump((model, columns), model_path)
+
+    predict.apply_model(features_path, feature, model_path, batch_size=64)
+
+    results = pl.read_csv(tmp_path / "models" / "validation" / "results.csv")
+    test = features.drop_nulls(feature)
+    assert results["score"][0] == pytest.approx(model.score(test.select(columns), test[feature]))
+    if feature == "SPEED":
+        rmse = np.sqrt(metrics.mean_squared_error(test[feature], model.predict(test.select(columns))))
+        assert results["rmse"][0] == pytest.approx(rmse)
+    else:
+        assert (tmp_path / "models" / "validation" / "run_cm.png").exists()
+
+
+@pytest.fixture
+def run_dir(features, tmp_path):
+    features, _ = features
+    columns = ["min_accel_thigh_l.z", "max_accel_thigh_l.z", "mean_accel_thigh_l.z"]
+    train = features.head(200)
+
+    scaler = StandardScaler().fit(train.select(columns))
+    X_train = scaler.transform(train.select(columns))
+    locomotion = train["SPEED"].is_not_null().to_numpy()
+
+    run_dir = tmp_path / "models" / "LR_run"
+    run_dir.mkdir(parents=True)
+    joblib.dump(scaler, run_dir / "scaler.pkl")
+    joblib.dump((LogisticRegression().fit(X_train, train["ACTIVITY"]), columns), run_dir / "activity.pkl")
+    for target in ["speed", "incline"]:
+        y = train["SPEED"].to_numpy()[locomotion] * (2 if target == "incline" else 1)
+        joblib.dump((LinearRegression().fit(X_train[locomotion], y), columns), run_dir / f"{target}.pkl")
+
+    return run_dir
+
+
+def test_apply_run(features, run_dir, tmp_path, monkeypatch) -> None:
+    """
+    Test that applying a run in one pass scores each target as applying its model alone does
+    """
+    monkeypatch.setattr(predict, "MODELS_DIR", tmp_path / "models")
+    features, features_path = features
+    pl.read_parquet(features_path).with_columns(INCLINE=pl.col("SPEED") * 2).write_parquet(features_path)
+
+    results = predict.apply_run(run_dir, features_path, batch_size=64)
+
+    for target in ["ACTIVITY", "SPEED", "INCLINE"]:
+        model_path = run_dir / f"{target.lower()}.pkl"
+        predict.apply_model(features_path, target, model_path, run_dir / "scaler.pkl", batch_size=64)
+
+    stored = pl.read_csv(tmp_path / "models" / "validation" / "results.csv")
+    assert stored.height == 6
+    assert results["score"].to_list() == pytest.approx(stored["score"].tail(3).to_list())
+    assert results["rmse"].to_list()[1:] == pytest.approx(stored["rmse"].tail(3).to_list()[1:])
+
+
+def test_apply_run_gated(features, run_dir, tmp_path, monkeypatch) -> None:
+    """
+    Test that gated regressors only predict rows whose predicted activity is locomotion
+    """
+    monkeypatch.setattr(predict, "MODELS_DIR", tmp_path / "models")
+    features, features_path = features
+    pl.read_parquet(features_path).with_columns(INCLINE=pl.col("SPEED") * 2).write_parquet(features_path)
+
+    predict.apply_run(
+        run_dir, features_path, gate_on_activity=True, batch_size=64, predictions_path=tmp_path / "predictions.parquet"
+    )
+
+    predictions = pl.read_parquet(tmp_path / "predictions.parquet")
+    assert predictions.columns == ["TRIAL", "ACTIVITY_PRED", "SPEED_PRED", "INCLINE_PRED"]
+    assert predictions.height == features.height
+    gated = predictions["ACTIVITY_PRED"] == "jump"
+    assert predictions.filter(gated)["SPEED_PRED"].null_count() == gated.sum()
+    assert predictions.filter(~gated)["INCLINE_PRED"].null_count() == 0
+
+
+def test_regression_results() -> None:
+    """
+    Test that the scores accumulated over batches match scikit-learn's, for a target with a large offset,
+    and are NaN when undefined
+    """
+    rng = np.random.default_rng(0)
+    y = 1e8 + rng.normal(size=1000)
+    y_pred = y + rng.normal(scale=0.5, size=1000)
+
+    moments = np.zeros(4)
+    for start in range(0, len(y), 64):
+        predict._accumulate_regression(moments, y[start : start + 64], y_pred[start : start + 64])
+    r2, rmse = predict._regression_results(moments)
+
+    assert r2 == pytest.approx(metrics.r2_score(y, y_pred))
+    assert rmse == pytest.approx(np.sqrt(metrics.mean_squared_error(y, y_pred)))
+
+    # No rows, i.e. when the gate removes every locomotion row
+    assert np.isnan(predict._regression_results(np.zeros(4))).all()
+
+    # Constant true values
+    moments = np.zeros(4)
+    predict._accumulate_regression(moments, np.full(10, 3.0), np.arange(10.0))
+    r2, rmse = predict._regression_results(moments)
+    assert np.isnan(r2)
+    assert rmse == pytest.approx(np.sqrt(np.mean((3.0 - np.arange(10.0)) ** 2)))
@@ -0,0 +1,116 @@
+import json
+
+import joblib
+import numpy as np
+import polars as pl
+import pytest
+from ezc3d import c3d
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from lisa.dataset import create_synthetic_c3d_file, process_c3d
+from lisa.modeling import realtime
+from lisa.windowing import rolling_statistics
+
+WINDOW = 200
+STATS = ["min", "max", "mean", "std", "rms", "range", "first", "last", "skew"]
+
+
+@pytest.fixture
+def c3d_path(tmp_path):
+    path = tmp_path / "P1_Walk_1_7ms.c3d"
+    create_synthetic_c3d_file(path)
+    return path
+
+
+@pytest.fixture
+def signals(c3d_path):
+    df = process_c3d(c3d(str(c3d_path)), c3d_path.name, ["walk", "jog", "run", "jump"], 0, None)
+    return df.select("accel_shank_l.x", "gyro_pelvis.z")
+
+
+@pytest.fixture
+def run_dir(tmp_path, signals):
+    """
+    A run with models trained on the offline features of the synthetic signals, as saved by multipredictor
+    """
+    results = rolling_statistics(signals.to_numpy(), WINDOW, STATS)
+    features = pl.DataFrame(
+        {
+            f"{stat}_{channel}": results[stat][:, index]
+            for stat in STATS
+            for index, channel in enumerate(signals.columns)
+        }
+    )
+    rng = np.random.default_rng(0)
+    activity = rng.choice(["walk", "jump"], size=features.height)
+    speed = rng.normal(size=features.height)
+
+    run_dir = tmp_path / "run"
+    run_dir.mkdir()
+    activity_model = RandomForestClassifier(n_estimators=5, n_jobs=2, random_state=0).fit(features, activity)
+    speed_model = RandomForestRegressor(n_estimators=5, n_jobs=2, random_state=0).fit(features, speed)
+    joblib.dump((activity_model, features.columns), run_dir / "activity.pkl")
+    joblib.dump((speed_model, features.columns), run_dir / "speed.pkl")
+    joblib.dump((speed_model, features.columns), run_dir / "incline.pkl")
+    with (run_dir / "output.json").open("w") as f:
+        json.dump({"params": {"window": WINDOW, "stride": 1}}, f)
+
+    return run_dir, features
+
+
+def test_streaming_features(run_dir, signals) -> None:
+    """
+    Test that the streamed features match the offline features at every prediction, however the samples arrive
+    """
+    run_dir, expected = run_dir
+    predictor = realtime.StreamingPredictor(run_dir, hop=150)
+    assert predictor.window == WINDOW
+    assert predictor.models["activity"].n_jobs == 1
+
+    rng = np.random.default_rng(1)
+    start = 0
+    while start < signals.height:
+        end = start + int(rng.integers(1, 3 * WINDOW))
+        n_samples = predictor.n_samples
+        predictions = predictor.push(signals[start:end])
+        start = end
+
+        due = [i for i in range(n_samples + 1, predictor.n_samples + 1) if i >= WINDOW and (i - WINDOW) % 150 == 0]
+        assert [prediction["sample"] for prediction in predictions] == due
+        if predictor.n_samples >= WINDOW:
+            # The window ending at the last sample
+            np.testing.assert_allclose(
+                predictor.features().to_numpy()[0], expected.row(predictor.n_samples - WINDOW), rtol=1e-9
+            )
+
+
+def test_streaming_predictions(run_dir, signals) -> None:
+    """
+    Test that the streamed predictions match the models applied to the offline features
+    """
+    run_dir, features = run_dir
+    predictor = realtime.StreamingPredictor(run_dir, hop=100, gate_on_activity=False)
+    predictions = pl.DataFrame(predictor.push(signals))
+
+    rows = predictions["sample"].to_numpy() - WINDOW
+    assert predictions.height == (signals.height - WINDOW) // 100 + 1
+    assert predictions["activity"].to_list() == predictor.models["activity"].predict(features[rows]).tolist()
+    np.testing.assert_allclose(predictions["speed"].to_numpy(), predictor.models["speed"].predict(features[rows]))
+    assert (predictions["latency"] > 0).all()
+
+    # Gated on activity, there is no speed or incline for the non-locomotion activity
+    gated = pl.DataFrame(realtime.StreamingPredictor(run_dir, hop=100).push(signals))
+    assert gated.filter(pl.col("activity") == "jump")["speed"].null_count() == (gated["activity"] == "jump").sum()
+    assert gated.filter(pl.col("activity") == "walk")["incline"].null_count() == 0
+
+
+def test_replay_c3d(run_dir, c3d_path) -> None:
+    """
+    Test replaying a c3d file at an accelerated speed
+    """
+    run_dir, _ = run_dir
+    predictions, percentiles = realtime.replay_c3d(c3d_path, run_dir, hop=500, speed_factor=20, chunk_size=50)
+
+    assert predictions.height == (10000 - WINDOW) // 500 + 1
+    assert list(percentiles) == ["p50", "p90", "p99"]
+    assert 0 < percentiles["p50"] <= percentiles["p90"] <= percentiles["p99"]
@@ -0,0 +1,87 @@
+import json
+
+import polars as pl
+import pytest
+
+from lisa.modeling import tuning
+
+
+def test_grid_candidates() -> None:
+    """
+    Test that lists and ranges are combined into every candidate
+    """
+    candidates = tuning.grid_candidates(
+        {"max_depth": [10, 20], "min_samples_leaf": {"low": 1, "high": 16, "log": True}}
+    )
+
+    assert len(candidates) == 6
+    assert {candidate["min_samples_leaf"] for candidate in candidates} == {1, 4, 16}
+
+
+def test_random_candidates() -> None:
+    """
+    Test that random candidates are reproducible, and within the search space
+    """
+    space = {"C": {"low": 0.01, "high": 100.0, "log": True}, "max_iter": [100, 1000]}
+
+    candidates = tuning.random_candidates(space, 10, seed=0)
+
+    assert candidates == tuning.random_candidates(space, 10, seed=0)
+    assert all(0.01 <= candidate["C"] <= 100 and candidate["max_iter"] in [100, 1000] for candidate in candidates)
+
+
+def test_halving_schedule() -> None:
+    """
+    Test that each rung keeps 1/eta of the candidates, on eta times as many rows, finishing on all the rows
+    """
+    assert tuning.halving_schedule(27, 3) == [(27, 1 / 27), (9, 1 / 9), (3, 1 / 3), (1, 1)]
+    assert tuning.halving_schedule(1, 3) == [(1, 1)]
+
+
+@pytest.mark.parametrize("n_workers", [1, 2])
+def test_search(features_path, tmp_path, monkeypatch, n_workers) -> None:
+    """
+    Test successive halving, with the best candidates saved in the multipredictor output structure
+    """
+    monkeypatch.setattr(tuning, "MODELS_DIR", tmp_path / "models")
+
+    results = tuning.search(
+        features_path, "search_test", "LR", "halving", n_candidates=9, window=4, split=0.8, n_workers=n_workers
+    )
+
+    # 9 candidates then 3 then 1 for activity; the LR regressors only have two candidates, so both continue
+    # until the last rung
+    assert results.filter(pl.col("target") == "activity").height == 13
+    assert results.filter(pl.col("target") == "speed").height == 5
+
+    with (tmp_path / "models" / "search_test" / "output.json").open("r") as f:
+        output = json.load(f)
+    assert all(score is not None for score in output["score"].values())
+    assert output["score"]["activity"] > 0.5
+    assert "C" in output["params"]["hyperparams"]["activity"]
+
+
+def test_search_resume(features_path, tmp_path, monkeypatch) -> None:
+    """
+    Test that a repeated search is resumed from its state, without evaluating any candidate again
+    """
+    monkeypatch.setattr(tuning, "MODELS_DIR", tmp_path / "models")
+    state_path = tmp_path / "models" / "search_test" / tuning.STATE_FILENAME
+
+    first = tuning.search(features_path, "search_test", "LR", "random", n_candidates=3, window=4)
+    n_evaluations = len(state_path.read_text().splitlines())
+
+    second = tuning.search(features_path, "search_test", "LR", "random", n_candidates=3, window=4)
+
+    assert len(state_path.read_text().splitlines()) == n_evaluations
+    assert first.equals(second)
+
+
+def test_search_missing_space(features_path, tmp_path, monkeypatch) -> None:
+    """
+    Test that a family without a search space raises an error
+    """
+    monkeypatch.setattr(tuning, "MODELS_DIR", tmp_path / "models")
+
+    with pytest.raises(ValueError):
+        tuning.search(features_path, "search_test", "SVM")
@@ -0,0 +1,104 @@
+import re
+
+import numpy as np
+import polars as pl
+import pytest
+from polars.testing import assert_frame_equal
+from scipy import stats as scipy_stats
+
+from lisa.config import IMU_PATTERN
+from lisa.features import sliding_window
+from lisa.windowing import WINDOW_STATS, register_statistic, rolling_statistics
+
+
+def test_rolling_statistics_moments() -> None:
+    """
+    Test the running and batched statistics against direct calculations on each window
+    """
+    values = np.random.default_rng(0).normal(size=(40, 2)) + 5
+    period = 8
+
+    result = rolling_statistics(values, period, ["rms", "range", "skew", "kurtosis", "sma"], stride=3)
+
+    windows = [values[start : start + period] for start in range(0, len(values) - period + 1, 3)]
+    np.testing.assert_allclose(result["rms"], [np.sqrt((window**2).mean(axis=0)) for window in windows])
+    np.testing.assert_allclose(result["range"], [np.ptp(window, axis=0) for window in windows])
+    np.testing.assert_allclose(result["skew"], [scipy_stats.skew(window) for window in windows])
+    np.testing.assert_allclose(result["kurtosis"], [scipy_stats.kurtosis(window) for window in windows])
+    np.testing.assert_allclose(result["sma"], [np.abs(window).mean(axis=0) for window in windows])
+
+
+def test_rolling_statistics_spectral() -> None:
+    """
+    Test the dominant frequency and band energies of a pure tone
+    """
+    sample_rate = 1000.0
+    time = np.arange(2000) / sample_rate
+    values = np.sin(2 * np.pi * 4 * time)[:, np.newaxis]
+
+    result = rolling_statistics(values, 1000, ["domfreq", "band3to6", "band12to25", "zcr"], 500, sample_rate)
+
+    np.testing.assert_allclose(result["domfreq"], 4.0)
+    assert (result["band3to6"] > 1000 * result["band12to25"]).all()
+    np.testing.assert_allclose(result["zcr"], 8 / 999, rtol=0.2)
+
+
+def test_rolling_statistics_spectrum_shared(monkeypatch) -> None:
+    """
+    Test that the spectral statistics of a batch of windows share a single FFT, with the same results
+    """
+    values = np.random.default_rng(0).normal(size=(3000, 2))
+    stats = ["domfreq", "band1to3", "band3to6", "band6to12", "band12to25"]
+    expected = {stat: rolling_statistics(values, 800, [stat], 100)[stat] for stat in stats}
+
+    rfft = np.fft.rfft
+    calls = []
+
+    def _counted_rfft(*args, **kwargs):
+        calls.append(1)
+        return rfft(*args, **kwargs)
+
+    monkeypatch.setattr(np.fft, "rfft", _counted_rfft)
+    result = rolling_statistics(values, 800, stats, 100)
+
+    assert len(calls) == 1
+    for stat in stats:
+        np.testing.assert_array_equal(result[stat], expected[stat])
+
+
+def test_register_statistic() -> None:
+    """
+    Test that a registered statistic can be selected in sliding_window, with names that match IMU_PATTERN
+    """
+
+    @register_statistic("median")
+    def _median(windows: np.ndarray, sample_rate: float) -> np.ndarray:
+        return np.nanmedian(windows, axis=-1)
+
+    df = pl.DataFrame(
+        {
+            "TRIAL": [0] * 5,
+            "TIME": list(range(5)),
+            "accel_thigh_l.z": [1.0, 5.0, 2.0, 4.0, 3.0],
+        }
+    )
+
+    try:
+        result = sliding_window(df, ["accel_thigh_l.z"], 3, stats=["median"], engine="numpy")
+    finally:
+        del WINDOW_STATS["median"]
+
+    assert result["median_accel_thigh_l.z"].to_list() == [2.0, 4.0, 3.0]
+    assert re.match(IMU_PATTERN, "median_accel_thigh_l.z").groups() == ("median", "accel", "thigh_l", "z")
+
+    with pytest.raises(ValueError):
+        register_statistic("zero_crossings")
+
+    with pytest.raises(ValueError):
+        sliding_window(df, ["accel_thigh_l.z"], 3, stats=["median"], engine="polars")
+
+    # Registered statistics are computed by the numpy engine, whichever engine is requested
+    assert_frame_equal(
+        sliding_window(df, ["accel_thigh_l.z"], 3, stats=["skew"], engine="polars"),
+        sliding_window(df, ["accel_thigh_l.z"], 3, stats=["skew"], engine="numpy"),
+    )